@@ -0,0 +1,132 @@
+"""
+동시 대화 처리량 벤치마크: 스레드 풀 + graph.invoke vs 이벤트 루프 하나 + graph.ainvoke.
+
+가짜 OpenAI 호환 서버(st_app/bench/fake_llm_server.py)를 별도 프로세스로 띄우고(클라이언트와 GIL을 나누지 않도록)
+대화 N개가 각각 --turns번 질문합니다. 대화 안의 턴은 순서대로, 대화끼리는 동시에 진행합니다.
+  - threads : 스레드 --threads개가 대화를 나눠 맡아 graph.invoke (스레드 하나가 한 번에 대화 하나)
+  - async   : 대화 N개를 asyncio.gather로 한꺼번에 graph.ainvoke
+리뷰 질문은 인덱스가 필요하므로 chat/subject_info 턴만 씁니다(답변 캐시는 끔).
+
+    python -m st_app.bench.concurrency_bench --conversations 1,10,50,200 --turns 2 --threads 8
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import multiprocessing as mp
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+
+TURNS = ["안녕?", "대표 메뉴 뭐야?", "심심해", "영업 시간 알려줘", "고마워!", "위치가 어디야?"]
+
+
+def _serve(port_queue, latency_ms: float, per_token_ms: float) -> None:
+    from st_app.bench.fake_llm_server import FakeLLMServer
+
+    server = FakeLLMServer(latency_ms=latency_ms, per_token_ms=per_token_ms)
+    port_queue.put(server.port)
+    server.httpd.serve_forever()
+
+
+def _state(user_input: str) -> Dict:
+    return {"history": [{"role": "user", "content": user_input}], "user_input": user_input,
+            "route": "router", "subject": None, "citations": [], "response": ""}
+
+
+def _summary(latencies: List[float], wall: float) -> Dict[str, float]:
+    samples = np.array(latencies) * 1000
+    return {"wall_s": wall, "turns_per_s": len(latencies) / wall,
+            "p50": float(np.percentile(samples, 50)), "p95": float(np.percentile(samples, 95))}
+
+
+def run_threads(graph, conversations: int, turns: int, threads: int) -> Dict[str, float]:
+    latencies: List[float] = []
+
+    def _conversation(c: int) -> None:
+        config = {"configurable": {"thread_id": uuid.uuid4().hex}}
+        for t in range(turns):
+            started = time.perf_counter()
+            result = graph.invoke(_state(TURNS[(c + t) % len(TURNS)]), config=config)
+            latencies.append(time.perf_counter() - started)
+            if not result.get("response"):
+                raise RuntimeError("빈 응답")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(_conversation, range(conversations)))
+    return _summary(latencies, time.perf_counter() - started)
+
+
+async def run_async(graph, conversations: int, turns: int) -> Dict[str, float]:
+    latencies: List[float] = []
+
+    async def _conversation(c: int) -> None:
+        config = {"configurable": {"thread_id": uuid.uuid4().hex}}
+        for t in range(turns):
+            started = time.perf_counter()
+            result = await graph.ainvoke(_state(TURNS[(c + t) % len(TURNS)]), config=config)
+            latencies.append(time.perf_counter() - started)
+            if not result.get("response"):
+                raise RuntimeError("빈 응답")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(_conversation(c) for c in range(conversations)))
+    return _summary(latencies, time.perf_counter() - started)
+
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="동시 대화 처리량 벤치마크 (invoke + 스레드 vs ainvoke)")
+    parser.add_argument("--conversations", type=str, default="1,10,50,200", help="동시 대화 수 목록")
+    parser.add_argument("--turns", type=int, default=2, help="대화당 턴 수")
+    parser.add_argument("--threads", type=int, default=8, help="threads 모드의 스레드 수")
+    parser.add_argument("--latency-ms", type=float, default=400.0, help="가짜 LLM 요청당 고정 지연")
+    parser.add_argument("--per-token-ms", type=float, default=5.0, help="가짜 LLM 출력 토큰당 지연")
+    parser.add_argument("--modes", type=str, default="threads,async")
+    return parser
+
+
+def main() -> None:
+    args = create_parser().parse_args()
+    levels = [int(n) for n in args.conversations.split(",") if n.strip()]
+    port_queue = mp.Queue()
+    server = mp.Process(target=_serve, args=(port_queue, args.latency_ms, args.per_token_ms), daemon=True)
+    server.start()
+    port = port_queue.get(timeout=30)
+
+    # 그래프의 모든 LLM 호출이 가짜 서버로 가도록 설정 (답변 캐시는 인덱스 로드가 필요하므로 끔)
+    for name in ("UPSTAGE_API_KEY", "UPSTAGE_BASE_URL"):
+        os.environ.pop(name, None)
+    os.environ.update({"OPENAI_API_KEY": "fake", "OPENAI_BASE_URL": f"http://127.0.0.1:{port}/v1",
+                       "ANSWER_CACHE_SIZE": "0"})
+    # 동시 대화 수만큼 연결을 열 수 있게 (클라이언트를 만들기 전에 설정)
+    os.environ.setdefault("HTTP_MAX_CONNECTIONS", str(max(levels)))
+    os.environ.setdefault("HTTP_MAX_KEEPALIVE", str(max(levels)))
+
+    from st_app.graph.router import build_graph
+
+    graph = build_graph()
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    # 공용 AsyncClient는 처음 쓴 이벤트 루프에 묶이므로 async 모드는 모두 이 루프 하나에서 실행합니다.
+    loop = asyncio.new_event_loop()
+    try:
+        print(f"{'mode':<8} {'convs':>5} {'wall(s)':>8} {'turns/s':>8} {'p50(ms)':>9} {'p95(ms)':>9}")
+        for conversations in levels:
+            for mode in modes:
+                if mode == "threads":
+                    r = run_threads(graph, conversations, args.turns, args.threads)
+                else:
+                    r = loop.run_until_complete(run_async(graph, conversations, args.turns))
+                print(f"{mode:<8} {conversations:>5} {r['wall_s']:>8.2f} {r['turns_per_s']:>8.1f} "
+                      f"{r['p50']:>9.1f} {r['p95']:>9.1f}")
+    finally:
+        loop.close()
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
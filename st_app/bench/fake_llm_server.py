@@ -0,0 +1,185 @@
+"""
+벤치마크용 가짜 OpenAI 호환 chat completions 서버.
+
+실제 API 대신 고정 지연(latency_ms) + 출력 토큰당 지연(per_token_ms)으로 응답해,
+호출 횟수/순서가 바뀌는 최적화의 종단 지연을 네트워크와 무관하게 재현합니다.
+per_input_token_ms를 주면 입력(모든 메시지) 토큰당 지연을 더해 프롬프트 길이에 따른 prefill 시간도 흉내 냅니다.
+  - 라우터 프롬프트("너는 사용자의 발화를")에는 라우팅 JSON을, 대화 요약 프롬프트("너는 대화 요약기다")에는 고정 요약을,
+    그 밖에는 고정 답변을 돌려줍니다.
+    라우트는 질문에 "리뷰"/"후기"가 있으면 rag_review, "메뉴"/"시간"/"위치"가 있으면 subject_info, 아니면 chat.
+  - "stream": true 요청에는 SSE(chat.completion.chunk)로 첫 조각을 latency_ms 뒤에, 이후 조각을 per_token_ms 간격으로 보냅니다.
+  - 요청 수는 server.calls에 셉니다.
+
+    python -m st_app.bench.fake_llm_server --port 8001   # 단독 실행
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from st_app.rag.context import estimate_tokens
+
+CHAT_ANSWER = "안녕하세요! 명동교자 리뷰와 정보에 대해 무엇이든 물어보세요. 메뉴, 영업시간, 리뷰 요약을 도와드릴 수 있어요."
+SUMMARY_ANSWER = "사용자는 명동교자의 메뉴와 리뷰를 물었고, 비서는 칼국수와 만두가 대표 메뉴이며 국물이 진하다는 평이 많다고 답했다."
+REVIEW_ANSWER = "리뷰를 보면 칼국수 국물이 진하고 만두가 맛있다는 평이 많습니다. 다만 대기 줄이 길다는 의견도 있어요."
+
+
+_PIECE_RE = re.compile(r"[가-힣]|[A-Za-z]{1,4}|\d{1,4}|\s+|.", re.DOTALL)
+
+
+def split_pieces(text: str) -> List[str]:
+    """스트리밍 조각(대략 토큰 하나)으로 나눕니다. 공백은 다음 조각에 붙입니다."""
+    pieces: List[str] = []
+    pending = ""
+    for piece in _PIECE_RE.findall(text):
+        if piece.isspace():
+            pending += piece
+            continue
+        pieces.append(pending + piece)
+        pending = ""
+    if pending:
+        pieces.append(pending)
+    return pieces
+
+
+def _route_of(user_text: str) -> str:
+    if any(w in user_text for w in ("리뷰", "후기")):
+        return "rag_review"
+    if any(w in user_text for w in ("메뉴", "시간", "위치")):
+        return "subject_info"
+    return "chat"
+
+
+def fake_reply(messages: List[Dict[str, str]]) -> str:
+    system = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+    user_text = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+    if system.startswith("너는 사용자의 발화를"):
+        # 라우터 프롬프트의 human 메시지 마지막 줄 근처에 실제 입력이 있습니다.
+        asked = user_text.split("사용자 입력:")[-1]
+        route = _route_of(asked)
+        data: Dict[str, Optional[str]] = {"route": route, "subject": None if route == "chat" else "명동교자"}
+        if '"answer"' in system:
+            data["answer"] = CHAT_ANSWER if route == "chat" else None
+        return json.dumps(data, ensure_ascii=False)
+    if system.startswith("너는 대화 요약기다"):
+        return SUMMARY_ANSWER
+    return REVIEW_ANSWER if "리뷰 컨텍스트" in user_text else CHAT_ANSWER
+
+
+class _Server(ThreadingHTTPServer):
+    # 동시 대화 수백 개가 한꺼번에 연결해도 SYN 재전송(1초) 없이 받도록 listen 큐를 늘립니다.
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+class FakeLLMServer:
+    def __init__(self, port: int = 0, latency_ms: float = 400.0, per_token_ms: float = 15.0,
+                 per_input_token_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.per_token_ms = per_token_ms
+        self.per_input_token_ms = per_input_token_ms
+        self.calls = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"   # keep-alive
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                with server._lock:
+                    server.calls += 1
+                messages = body.get("messages") or []
+                text = fake_reply(messages)
+                if server.per_input_token_ms:
+                    in_tokens = sum(estimate_tokens(str(m.get("content") or "")) for m in messages)
+                    time.sleep(server.per_input_token_ms * in_tokens / 1000)
+                if body.get("stream"):
+                    self._stream(body, text)
+                    return
+                out_tokens = estimate_tokens(text)
+                time.sleep((server.latency_ms + server.per_token_ms * out_tokens) / 1000)
+                payload = json.dumps({
+                    "id": f"chatcmpl-fake-{server.calls}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "fake"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                                 "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": out_tokens, "total_tokens": out_tokens},
+                }, ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _chunk(self, data: str) -> None:
+                raw = data.encode("utf-8")
+                self.wfile.write(f"{len(raw):x}\r\n".encode("ascii") + raw + b"\r\n")
+                self.wfile.flush()
+
+            def _stream(self, body: Dict, text: str) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                base = {"id": f"chatcmpl-fake-{server.calls}", "object": "chat.completion.chunk",
+                        "created": int(time.time()), "model": body.get("model", "fake")}
+                time.sleep(server.latency_ms / 1000)
+                for i, piece in enumerate(split_pieces(text)):
+                    if i:
+                        time.sleep(server.per_token_ms / 1000)
+                    delta = {"role": "assistant", "content": piece} if i == 0 else {"content": piece}
+                    event = dict(base, choices=[{"index": 0, "delta": delta, "finish_reason": None}])
+                    self._chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n")
+                done = dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+                self._chunk(f"data: {json.dumps(done, ensure_ascii=False)}\n\n")
+                self._chunk("data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+        self.httpd = _Server(("127.0.0.1", port), Handler)
+        self.port = self.httpd.server_address[1]
+        self.base_url = f"http://127.0.0.1:{self.port}/v1"
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "FakeLLMServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="벤치마크용 가짜 OpenAI 호환 서버")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=400.0, help="요청당 고정 지연")
+    parser.add_argument("--per-token-ms", type=float, default=15.0, help="출력 토큰당 지연")
+    parser.add_argument("--per-input-token-ms", type=float, default=0.0, help="입력 토큰당 지연")
+    return parser
+
+
+def main() -> None:
+    args = create_parser().parse_args()
+    server = FakeLLMServer(args.port, args.latency_ms, args.per_token_ms, args.per_input_token_ms)
+    print(f"가짜 LLM 서버: {server.base_url} (Ctrl+C로 종료)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
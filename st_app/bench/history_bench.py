@@ -0,0 +1,89 @@
+"""
+긴 대화에서 이력 압축(st_app/graph/history.py)의 프롬프트 토큰 수와 턴 지연 벤치마크.
+
+가짜 OpenAI 호환 서버(st_app/bench/fake_llm_server.py)로 그래프 전체(build_graph)를 한 대화에서 --turns번 실행합니다.
+화면처럼 매 턴 지금까지의 메시지 전체를 history로 넘기고, 서버는 입력 토큰당 --per-input-token-ms만큼 더 기다립니다.
+  - full    : 압축 없음 (예산 무제한, 요약 끔) — 이전 동작
+  - compact : 최근 HISTORY_KEEP_TURNS 턴 원문 + 롤링 요약, HISTORY_TOKEN_BUDGET 안으로
+리뷰 질문은 인덱스가 필요하므로 chat/subject_info 턴만 씁니다(답변 캐시는 끔).
+
+    python -m st_app.bench.history_bench --turns 40 --budget 600 --keep-turns 3
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import time
+import uuid
+from typing import Dict, List
+
+import numpy as np
+
+from st_app.bench.fake_llm_server import FakeLLMServer
+
+TURNS = ["안녕? 명동교자 처음 가보려고 해", "대표 메뉴 뭐야?", "칼국수 양은 많은 편이야?", "영업 시간 알려줘",
+         "주말에는 사람이 많겠지?", "위치가 어디야?", "고마워, 같이 갈 친구가 매운 걸 못 먹어", "메뉴 가격대는?"]
+
+
+def run_mode(compact: bool, turns: int, tail: int, budget: int, stale_turns: int) -> Dict[str, float]:
+    from st_app.graph.history import HISTORY_TOKENS, get_history_manager
+    from st_app.graph.router import build_graph
+
+    os.environ["HISTORY_TOKEN_BUDGET"] = str(budget) if compact else "1000000000"
+    os.environ["HISTORY_SUMMARY_STALE_TURNS"] = str(stale_turns) if compact else "off"
+    HISTORY_TOKENS.reset()
+    graph = build_graph()
+    config = {"configurable": {"thread_id": uuid.uuid4().hex}}
+    messages: List[Dict[str, str]] = []
+    latencies: List[float] = []
+    for t in range(turns):
+        user_input = TURNS[t % len(TURNS)]
+        messages.append({"role": "user", "content": user_input})
+        state = {"history": list(messages), "user_input": user_input,
+                 "route": "router", "subject": None, "citations": [], "response": ""}
+        started = time.perf_counter()
+        result = graph.invoke(state, config=config)
+        latencies.append(time.perf_counter() - started)
+        messages.append({"role": "assistant", "content": result.get("response") or ""})
+    tokens = HISTORY_TOKENS.snapshot()
+    last = np.array(latencies[-tail:]) * 1000
+    return {"full": tokens["full"]["max"], "sent": tokens["sent"]["max"], "sent_mean": tokens["sent"]["mean"],
+            "p50": float(np.percentile(last, 50)), "total_s": sum(latencies),
+            "refreshes": get_history_manager().stats()["refreshes"]}
+
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="대화 이력 압축(롤링 요약 + 토큰 예산) 벤치마크")
+    parser.add_argument("--turns", type=int, default=40, help="대화 턴 수")
+    parser.add_argument("--tail", type=int, default=10, help="p50을 잴 마지막 턴 수")
+    parser.add_argument("--budget", type=int, default=600, help="compact 모드의 HISTORY_TOKEN_BUDGET")
+    parser.add_argument("--keep-turns", type=int, default=3, help="compact 모드의 HISTORY_KEEP_TURNS")
+    parser.add_argument("--stale-turns", type=int, default=2, help="compact 모드의 HISTORY_SUMMARY_STALE_TURNS")
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="가짜 LLM 요청당 고정 지연")
+    parser.add_argument("--per-token-ms", type=float, default=2.0, help="가짜 LLM 출력 토큰당 지연")
+    parser.add_argument("--per-input-token-ms", type=float, default=0.5, help="가짜 LLM 입력 토큰당 지연")
+    return parser
+
+
+def main() -> None:
+    args = create_parser().parse_args()
+    server = FakeLLMServer(latency_ms=args.latency_ms, per_token_ms=args.per_token_ms,
+                           per_input_token_ms=args.per_input_token_ms).start()
+    for name in ("UPSTAGE_API_KEY", "UPSTAGE_BASE_URL"):
+        os.environ.pop(name, None)
+    os.environ.update({"OPENAI_API_KEY": "fake", "OPENAI_BASE_URL": server.base_url, "ANSWER_CACHE_SIZE": "0",
+                       "HISTORY_KEEP_TURNS": str(args.keep_turns)})
+    try:
+        print(f"{'mode':<8} {'full_tok':>8} {'sent_max':>8} {'sent_avg':>8} {'p50_tail(ms)':>12} "
+              f"{'total(s)':>8} {'summaries':>9}")
+        for compact in (False, True):
+            r = run_mode(compact, args.turns, args.tail, args.budget, args.stale_turns)
+            print(f"{'compact' if compact else 'full':<8} {r['full']:>8.0f} {r['sent']:>8.0f} {r['sent_mean']:>8.0f} "
+                  f"{r['p50']:>12.1f} {r['total_s']:>8.2f} {r['refreshes']:>9}")
+        print(f"LLM 요청 수(요약 포함): {server.calls}")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
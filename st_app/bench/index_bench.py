@@ -0,0 +1,135 @@
+"""
+FAISS 인덱스 종류별(Flat / IVF-Flat / HNSW / IVF-PQ) recall@k · QPS · 메모리 벤치마크.
+
+저장된 인덱스(st_app/db/faiss_index/index.faiss)의 실제 임베딩과 합성 벡터 두 가지 데이터셋에서
+Flat(전수 검색) 결과를 정답으로 두고 nprobe / efSearch 값을 바꿔가며 측정합니다.
+
+    python -m st_app.bench.index_bench --synthetic-n 100000 --dim 256
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from st_app.rag.index_factory import INDEX_TYPES, apply_search_params, create_index, index_memory_bytes
+
+INDEX_DIR = os.path.join("st_app", "db", "faiss_index")
+
+
+def load_saved_vectors(index_dir: str) -> Optional[np.ndarray]:
+    path = os.path.join(index_dir, "index.faiss")
+    if not os.path.exists(path):
+        print(f"'{path}'가 없어 저장된 임베딩 벤치마크는 건너뜁니다.")
+        return None
+    index = faiss.read_index(path)
+    try:
+        ivf = faiss.extract_index_ivf(index)
+        ivf.make_direct_map()
+    except RuntimeError:
+        pass
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def make_synthetic(n: int, dim: int, clusters: int = 100, seed: int = 0) -> np.ndarray:
+    # 실제 문장 임베딩처럼 군집 구조를 갖도록 가우시안 혼합으로 생성
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    return (centers[labels] + 0.5 * rng.standard_normal((n, dim))).astype(np.float32)
+
+
+def make_queries(base: np.ndarray, nq: int, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    picks = base[rng.integers(0, len(base), size=nq)]
+    scale = float(np.std(base)) * 0.3
+    return (picks + scale * rng.standard_normal(picks.shape)).astype(np.float32)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    hits = sum(len(np.intersect1d(f[f >= 0], t)) for f, t in zip(found, truth))
+    return hits / (len(truth) * k)
+
+
+def _measure(index: faiss.Index, queries: np.ndarray, k: int, single: int) -> Tuple[np.ndarray, float, float]:
+    started = time.perf_counter()
+    _, ids = index.search(queries, k)
+    qps = len(queries) / (time.perf_counter() - started)
+    # 실서비스처럼 한 건씩 검색할 때의 지연
+    started = time.perf_counter()
+    for q in queries[:single]:
+        index.search(q[None, :], k)
+    latency_ms = (time.perf_counter() - started) / max(single, 1) * 1000
+    return ids, qps, latency_ms
+
+
+def run(name: str, base: np.ndarray, queries: np.ndarray, k: int, types: List[str],
+        nprobes: List[int], ef_searches: List[int], single: int) -> None:
+    n, dim = base.shape
+    k = min(k, n)
+    print(f"\n=== {name}: n={n:,}, dim={dim}, queries={len(queries)}, k={k} ===")
+    flat = faiss.IndexFlatL2(dim)
+    flat.add(base)
+    _, truth = flat.search(queries, k)
+
+    print(f"{'type':<9} {'param':<14} {'build(s)':>8} {'recall@k':>9} {'QPS':>10} {'ms/query':>9} {'memory(MB)':>11}")
+    for index_type in types:
+        started = time.perf_counter()
+        index, params = create_index(index_type, base)
+        index.add(base)
+        build_s = time.perf_counter() - started
+        memory_mb = index_memory_bytes(index) / 1e6
+
+        if index_type in ("ivf_flat", "ivf_pq"):
+            sweep: List[Dict[str, int]] = [{"nprobe": p} for p in nprobes if p <= params["nlist"]]
+        elif index_type == "hnsw":
+            sweep = [{"ef_search": ef} for ef in ef_searches]
+        else:
+            sweep = [{}]
+        for search_params in sweep:
+            apply_search_params(index, search_params.get("nprobe"), search_params.get("ef_search"))
+            ids, qps, latency_ms = _measure(index, queries, k, single)
+            label = ",".join(f"{key}={val}" for key, val in search_params.items()) or "-"
+            print(f"{index_type:<9} {label:<14} {build_s:>8.2f} {recall_at_k(ids, truth):>9.3f} "
+                  f"{qps:>10,.0f} {latency_ms:>9.3f} {memory_mb:>11.1f}")
+
+
+def _int_list(text: str) -> List[int]:
+    return [int(x) for x in text.split(",") if x.strip()]
+
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="FAISS 인덱스 종류별 recall/QPS/메모리 벤치마크")
+    parser.add_argument("--index-dir", type=str, default=INDEX_DIR, help="실제 임베딩을 읽어올 인덱스 디렉터리")
+    parser.add_argument("--synthetic-n", type=int, default=100_000, help="합성 벡터 수 (0이면 생략)")
+    parser.add_argument("--dim", type=int, default=256, help="합성 벡터 차원")
+    parser.add_argument("--queries", type=int, default=1000, help="쿼리 수")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--types", type=str, default=",".join(INDEX_TYPES), help="비교할 인덱스 종류(쉼표 구분)")
+    parser.add_argument("--nprobe", type=str, default="1,4,16,64", help="IVF nprobe 후보(쉼표 구분)")
+    parser.add_argument("--ef-search", type=str, default="16,64,256", help="HNSW efSearch 후보(쉼표 구분)")
+    parser.add_argument("--single", type=int, default=200, help="단건 지연 측정에 쓸 쿼리 수")
+    return parser
+
+
+def main() -> None:
+    args = create_parser().parse_args()
+    types = [t for t in args.types.split(",") if t in INDEX_TYPES]
+    nprobes, ef_searches = _int_list(args.nprobe), _int_list(args.ef_search)
+
+    saved = load_saved_vectors(args.index_dir)
+    if saved is not None and len(saved):
+        run("저장된 리뷰 임베딩", saved, make_queries(saved, args.queries), args.k, types,
+            nprobes, ef_searches, args.single)
+    if args.synthetic_n > 0:
+        base = make_synthetic(args.synthetic_n, args.dim)
+        run("합성 벡터", base, make_queries(base, args.queries), args.k, types, nprobes, ef_searches, args.single)
+
+
+if __name__ == "__main__":
+    main()
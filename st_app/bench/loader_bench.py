@@ -0,0 +1,145 @@
+"""
+리뷰 CSV 로더 벤치마크: 기존 iterrows 구현 vs 청크 단위 스트리밍 로더.
+
+합성 CSV(카카오맵 스키마)를 만든 뒤 각 구현을 별도 프로세스에서 실행해
+처리 속도(rows/sec)와 최대 메모리(peak RSS)를 비교합니다.
+
+여기서 재는 메모리는 로더만 돌렸을 때의 값입니다. 실제 빌드(build_index)는 근접 중복 제거(기본 켬)가
+전체 문서 목록을 한 번 모으고, 임베딩 뒤 FAISS 문서 저장소도 모든 문서를 들고 있으므로
+최대 메모리는 여전히 문서 수에 비례합니다. 빌드에서 줄어드는 것은 DataFrame 전체 로드와 iterrows 비용입니다.
+
+    python -m st_app.bench.loader_bench --rows 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from st_app.rag.embedder import iter_documents_from_csvs
+
+
+def _legacy_create_documents(csv_paths: list[str]) -> list:
+    """비교 기준: 변경 전 create_documents_from_csvs (전체 로드 + iterrows)."""
+    from langchain.docstore.document import Document
+
+    documents = []
+    column_map = {"diningcode": "text", "googlemap": "content", "kakaomap": "review"}
+    for csv_path in csv_paths:
+        file_name = os.path.basename(csv_path)
+        review_column = next((col for name, col in column_map.items() if name in file_name), None)
+        if not review_column:
+            continue
+        df = pd.read_csv(csv_path)
+        for index, row in df.iterrows():
+            review_text = row.get(review_column)
+            if pd.isna(review_text):
+                continue
+            cleaned_text = str(review_text).strip()
+            if not cleaned_text:
+                continue
+            metadata = {
+                "source": file_name,
+                "row_index": index,
+                "rating": row.get("rating", 0.0),
+                "date": row.get("date", "N/A"),
+                "user": row.get("user", "N/A"),
+            }
+            documents.append(Document(page_content=cleaned_text, metadata=metadata))
+    return documents
+
+
+def make_synthetic_csv(path: str, rows: int, seed: int = 0) -> None:
+    rng = np.random.default_rng(seed)
+    words = np.array(["칼국수", "만두", "김치", "웨이팅", "국물", "면발", "친절", "불친절", "짜다", "맛있어요",
+                      "명동", "비빔국수", "콩국수", "마늘", "재방문", "가격", "위생", "빠르다"])
+    lengths = rng.integers(3, 25, size=rows)
+    picks = rng.integers(0, len(words), size=int(lengths.sum()))
+    bounds = np.concatenate([[0], np.cumsum(lengths)])
+    reviews = [" ".join(words[picks[bounds[i]:bounds[i + 1]]]) for i in range(rows)]
+    # 결측/빈 리뷰도 일부 섞어 실제 데이터와 비슷하게 만듭니다.
+    blank = rng.random(rows) < 0.01
+    df = pd.DataFrame({
+        "date": pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 2000, size=rows), unit="D"),
+        "star": rng.integers(1, 6, size=rows).astype(float),
+        "review": np.where(blank, "", reviews),
+        "dow": rng.integers(0, 7, size=rows),
+        "tokens": "['칼국수', '만두']",
+    })
+    df["date"] = df["date"].dt.strftime("%Y-%m-%d")
+    df.to_csv(path, index=False)
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss는 exec 이전(부모 프로세스) 값을 물려받을 수 있어, Linux에서는 VmHWM을 우선 사용합니다.
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_variant(variant: str, csv_path: str) -> dict:
+    started = time.perf_counter()
+    if variant == "legacy":
+        count = len(_legacy_create_documents([csv_path]))
+    else:
+        # 스트리밍 로더는 문서를 모아두지 않고 바로 다음 단계로 넘긴다고 가정합니다.
+        count = sum(1 for _ in iter_documents_from_csvs([csv_path]))
+    elapsed = time.perf_counter() - started
+    peak_mb = _peak_rss_mb()
+    return {"variant": variant, "docs": count, "seconds": elapsed,
+            "rows_per_sec": count / max(elapsed, 1e-9), "peak_rss_mb": peak_mb}
+
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="리뷰 CSV 로더 벤치마크")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="합성 CSV 행 수. 기본값: 1,000,000")
+    parser.add_argument("--csv", type=str, default=None, help="이미 만들어 둔 CSV 경로(파일명에 kakaomap 포함)")
+    parser.add_argument("--variant", choices=["legacy", "streaming"], default=None,
+                        help="(내부용) 지정한 구현 하나만 실행하고 결과를 JSON으로 출력")
+    return parser
+
+
+def main() -> None:
+    args = create_parser().parse_args()
+    if args.variant:
+        print(json.dumps(_run_variant(args.variant, args.csv)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = args.csv or os.path.join(tmp, "preprocessed_reviews_kakaomap.csv")
+        if not args.csv:
+            print(f"합성 CSV {args.rows:,}행 생성 중...")
+            make_synthetic_csv(csv_path, args.rows)
+
+        results = []
+        for variant in ("legacy", "streaming"):
+            # 최대 메모리를 독립적으로 재기 위해 구현마다 새 프로세스에서 실행
+            proc = subprocess.run(
+                [sys.executable, "-m", "st_app.bench.loader_bench", "--variant", variant, "--csv", csv_path],
+                capture_output=True, text=True, check=True,
+            )
+            results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    print(f"{'variant':<10} {'docs':>10} {'seconds':>9} {'rows/sec':>12} {'peak RSS(MB)':>13}")
+    for r in results:
+        print(f"{r['variant']:<10} {r['docs']:>10,} {r['seconds']:>9.2f} {r['rows_per_sec']:>12,.0f} {r['peak_rss_mb']:>13.1f}")
+    legacy, streaming = results
+    print(f"속도 {streaming['rows_per_sec'] / max(legacy['rows_per_sec'], 1e-9):.1f}배, "
+          f"최대 메모리 {streaming['peak_rss_mb'] / max(legacy['peak_rss_mb'], 1e-9):.2f}배")
+
+
+if __name__ == "__main__":
+    main()
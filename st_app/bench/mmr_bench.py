@@ -0,0 +1,90 @@
+"""
+MMR 다양성 재정렬 단계 지연 벤치마크.
+
+후보 fetch_k개(기본 100)에서 k개를 고르는 데 걸리는 시간을 측정합니다.
+  - mmr      : mmr_select만 (유사도 행렬 곱 + k번의 벡터 갱신)
+  - +recon   : FAISS 인덱스에서 후보 벡터를 꺼내는 시간까지 포함 (retrieve_reviews에서의 실제 비용)
+  - naive    : 후보 쌍마다 유사도를 다시 계산하는 파이썬 루프 구현 (비교용)
+
+    python -m st_app.bench.mmr_bench --fetch-k 100 -k 5 --dims 4096,512
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Callable, List
+
+import faiss
+import numpy as np
+
+from st_app.rag.index_factory import reconstruct_positions
+from st_app.rag.mmr import DEFAULT_MMR_LAMBDA, mmr_select
+
+
+def naive_mmr(query: np.ndarray, candidates: np.ndarray, k: int, lambda_mult: float) -> List[int]:
+    def cos(a: np.ndarray, b: np.ndarray) -> float:
+        return float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b) + 1e-12))
+
+    selected: List[int] = []
+    remaining = list(range(len(candidates)))
+    while remaining and len(selected) < k:
+        best = max(remaining, key=lambda i: lambda_mult * cos(query, candidates[i]) - (1 - lambda_mult) * max(
+            (cos(candidates[i], candidates[j]) for j in selected), default=0.0))
+        selected.append(best)
+        remaining.remove(best)
+    return selected
+
+
+def _time(fn: Callable[[], object], repeat: int) -> np.ndarray:
+    fn()  # 워밍업
+    samples = np.empty(repeat)
+    for i in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples[i] = time.perf_counter() - started
+    return samples * 1000
+
+
+def run(dim: int, n: int, fetch_k: int, k: int, lambda_mult: float, repeat: int) -> None:
+    rng = np.random.default_rng(0)
+    base = rng.standard_normal((n, dim)).astype(np.float32)
+    index = faiss.IndexFlatL2(dim)
+    index.add(base)
+    query = base[0] + 0.1 * rng.standard_normal(dim).astype(np.float32)
+    positions = np.sort(rng.choice(n, size=fetch_k, replace=False)).astype(np.int64)
+    candidates = reconstruct_positions(index, positions)
+
+    fast = mmr_select(query, candidates, k, lambda_mult)
+    slow = naive_mmr(query, candidates, k, lambda_mult)
+    same = "일치" if fast == slow else f"불일치 {fast} vs {slow}"
+
+    rows = [
+        ("mmr", _time(lambda: mmr_select(query, candidates, k, lambda_mult), repeat)),
+        ("+recon", _time(lambda: mmr_select(query, reconstruct_positions(index, positions), k, lambda_mult), repeat)),
+        ("naive", _time(lambda: naive_mmr(query, candidates, k, lambda_mult), max(1, repeat // 20))),
+    ]
+    print(f"\n=== dim={dim}, fetch_k={fetch_k}, k={k}, λ={lambda_mult} (naive 결과와 {same}) ===")
+    print(f"{'variant':<8} {'mean(ms)':>9} {'p50(ms)':>9} {'p95(ms)':>9}")
+    for name, samples in rows:
+        print(f"{name:<8} {samples.mean():>9.3f} {np.percentile(samples, 50):>9.3f} {np.percentile(samples, 95):>9.3f}")
+
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="MMR 재정렬 단계 지연 벤치마크")
+    parser.add_argument("--fetch-k", type=int, default=100, help="MMR 후보 수")
+    parser.add_argument("-k", type=int, default=5, help="고를 문서 수")
+    parser.add_argument("--dims", type=str, default="4096,512", help="벡터 차원(쉼표 구분). solar 임베딩은 4096")
+    parser.add_argument("--n", type=int, default=10_000, help="인덱스 벡터 수")
+    parser.add_argument("--lambda-mult", type=float, default=DEFAULT_MMR_LAMBDA)
+    parser.add_argument("--repeat", type=int, default=1000)
+    return parser
+
+
+def main() -> None:
+    args = create_parser().parse_args()
+    for dim in [int(d) for d in args.dims.split(",") if d.strip()]:
+        run(dim, args.n, args.fetch_k, args.k, args.lambda_mult, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
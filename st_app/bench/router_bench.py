@@ -0,0 +1,88 @@
+"""
+chat 턴 종단 지연 벤치마크: 라우터 호출 + chat 노드 호출(두 번) vs 라우터가 답변까지 만드는 한 번 호출.
+
+가짜 OpenAI 호환 서버(st_app/bench/fake_llm_server.py)를 띄워 그래프 전체(build_graph)를 실행합니다.
+  - two-call : ROUTER_COMBINED=false, 규칙 분류기 끔 → 라우터 LLM + chat 노드 LLM
+  - combined : ROUTER_COMBINED=true,  규칙 분류기 끔 → 라우터 LLM 한 번이 답변까지
+  - rules    : ROUTER_COMBINED=true,  규칙 분류기 켬 → 인사 등은 규칙으로 라우팅 후 chat 노드 한 번
+
+    python -m st_app.bench.router_bench --turns 20 --latency-ms 400 --per-token-ms 15
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import time
+import uuid
+from typing import Dict, List
+
+import numpy as np
+
+from st_app.bench.fake_llm_server import FakeLLMServer
+
+CHAT_TURNS = ["안녕?", "오늘 기분 어때?", "고마워!", "너는 누구야?", "심심해", "좋은 하루 보내", "ㅎㅎ 재밌다", "잘 자"]
+
+MODES: Dict[str, Dict[str, str]] = {
+    "two-call": {"ROUTER_COMBINED": "false", "INTENT_THRESHOLD": "off"},
+    "combined": {"ROUTER_COMBINED": "true", "INTENT_THRESHOLD": "off"},
+    "rules": {"ROUTER_COMBINED": "true", "INTENT_THRESHOLD": ""},
+}
+
+
+def run_mode(server: FakeLLMServer, mode: str, turns: int) -> Dict[str, float]:
+    from st_app.graph.router import build_graph
+
+    os.environ.update(MODES[mode])
+    graph = build_graph()
+    config = {"configurable": {"thread_id": uuid.uuid4().hex}}
+    latencies: List[float] = []
+    routes: List[str] = []
+    calls_before = server.calls
+    for i in range(turns):
+        user_input = CHAT_TURNS[i % len(CHAT_TURNS)]
+        state = {"history": [{"role": "user", "content": user_input}], "user_input": user_input,
+                 "route": "router", "subject": None, "citations": [], "response": ""}
+        started = time.perf_counter()
+        result = graph.invoke(state, config=config)
+        latencies.append(time.perf_counter() - started)
+        routes.append(str(result.get("route")))
+        if not result.get("response"):
+            raise RuntimeError(f"{mode}: 빈 응답 ({user_input})")
+    samples = np.array(latencies) * 1000
+    return {
+        "mean": float(samples.mean()),
+        "p50": float(np.percentile(samples, 50)),
+        "p95": float(np.percentile(samples, 95)),
+        "calls_per_turn": (server.calls - calls_before) / turns,
+        "chat_routes": routes.count("chat") / turns,
+    }
+
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="chat 턴 라우팅 방식별 종단 지연 벤치마크")
+    parser.add_argument("--turns", type=int, default=16, help="모드별 chat 턴 수")
+    parser.add_argument("--latency-ms", type=float, default=400.0, help="가짜 LLM 요청당 고정 지연")
+    parser.add_argument("--per-token-ms", type=float, default=15.0, help="가짜 LLM 출력 토큰당 지연")
+    parser.add_argument("--modes", type=str, default="two-call,combined,rules")
+    return parser
+
+
+def main() -> None:
+    args = create_parser().parse_args()
+    server = FakeLLMServer(latency_ms=args.latency_ms, per_token_ms=args.per_token_ms).start()
+    # 그래프의 모든 LLM 호출이 가짜 서버로 가도록 설정 (답변 캐시는 인덱스 로드가 필요하므로 끔)
+    for name in ("UPSTAGE_API_KEY", "UPSTAGE_BASE_URL"):
+        os.environ.pop(name, None)
+    os.environ.update({"OPENAI_API_KEY": "fake", "OPENAI_BASE_URL": server.base_url, "ANSWER_CACHE_SIZE": "0"})
+    try:
+        print(f"{'mode':<9} {'mean(ms)':>9} {'p50(ms)':>9} {'p95(ms)':>9} {'LLM calls/turn':>15} {'chat%':>6}")
+        for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+            r = run_mode(server, mode, args.turns)
+            print(f"{mode:<9} {r['mean']:>9.1f} {r['p50']:>9.1f} {r['p95']:>9.1f} "
+                  f"{r['calls_per_turn']:>15.2f} {r['chat_routes'] * 100:>5.0f}%")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
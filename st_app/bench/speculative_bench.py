@@ -0,0 +1,120 @@
+"""
+라우터 LLM과 동시에 리뷰를 미리 검색(SPECULATIVE_RETRIEVAL)할 때의 종단 지연과 낭비 벤치마크.
+
+가짜 OpenAI 호환 서버(st_app/bench/fake_llm_server.py)로 그래프 전체(build_graph)를 실행합니다.
+리뷰 인덱스는 database/의 CSV를 로컬 해시 임베딩으로 메모리에 만들고, 질문 임베딩에는
+--embed-latency-ms만큼 지연을 넣어 임베딩 API 호출을 흉내 냅니다(쿼리 캐시 없음 = 매번 새 질문).
+라우터가 항상 LLM을 부르도록 규칙 분류기는 끕니다(INTENT_THRESHOLD=off).
+
+    python -m st_app.bench.speculative_bench --turns 20 --review-share 0.5 --embed-latency-ms 150
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import glob
+import os
+import time
+import uuid
+from typing import Dict, List
+
+import numpy as np
+
+from st_app.bench.fake_llm_server import FakeLLMServer
+from st_app.rag.local_embedder import LocalHashEmbeddings
+
+REVIEW_TURNS = ["칼국수 국물 리뷰 어때?", "만두 후기 알려줘", "직원 친절하다는 리뷰 있어?", "웨이팅 후기 어때?"]
+CHAT_TURNS = ["오늘 기분 어때?", "너는 누구야?", "심심해", "좋은 하루 보내"]
+
+
+class SlowQueryEmbeddings(LocalHashEmbeddings):
+    """질문 임베딩에 고정 지연을 넣은 로컬 임베딩 (원격 임베딩 API 대용)."""
+
+    def __init__(self, latency_ms: float, **kwargs):
+        super().__init__(**kwargs)
+        self.latency_ms = latency_ms
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency_ms / 1000)
+        return super().embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await asyncio.sleep(self.latency_ms / 1000)
+        return LocalHashEmbeddings.embed_query(self, text)
+
+
+def build_store(embed_latency_ms: float):
+    from langchain_community.vectorstores import FAISS
+
+    from st_app.rag.embedder import iter_documents_from_csvs
+
+    csv_dir = os.path.join(os.path.dirname(__file__), "..", "..", "database")
+    documents = list(iter_documents_from_csvs(sorted(glob.glob(os.path.join(csv_dir, "preprocessed_reviews_*.csv")))))
+    embeddings = SlowQueryEmbeddings(embed_latency_ms)
+    texts = [d.page_content for d in documents]
+    return FAISS.from_embeddings(list(zip(texts, embeddings.embed_documents(texts))), embeddings,
+                                 metadatas=[d.metadata for d in documents])
+
+
+def run_mode(enabled: bool, turns: int, review_share: float) -> Dict[str, Dict[str, float]]:
+    from st_app.graph.router import build_graph
+
+    os.environ["SPECULATIVE_RETRIEVAL"] = "true" if enabled else "false"
+    graph = build_graph()
+    config = {"configurable": {"thread_id": uuid.uuid4().hex}}
+    latencies: Dict[str, List[float]] = {}
+    reviews = int(round(turns * review_share))
+    plan = [REVIEW_TURNS[i % len(REVIEW_TURNS)] for i in range(reviews)] + \
+           [CHAT_TURNS[i % len(CHAT_TURNS)] for i in range(turns - reviews)]
+    for user_input in plan:
+        state = {"history": [{"role": "user", "content": user_input}], "user_input": user_input,
+                 "route": "router", "subject": None, "citations": [], "response": ""}
+        started = time.perf_counter()
+        result = graph.invoke(state, config=config)
+        latencies.setdefault(str(result.get("route")), []).append(time.perf_counter() - started)
+    return {route: {"n": len(samples), "p50": float(np.percentile(np.array(samples) * 1000, 50))}
+            for route, samples in sorted(latencies.items())}
+
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="미리 검색(SPECULATIVE_RETRIEVAL) 종단 지연/낭비 벤치마크")
+    parser.add_argument("--turns", type=int, default=16, help="모드별 턴 수")
+    parser.add_argument("--review-share", type=float, default=0.5, help="리뷰 질문 비율 (나머지는 잡담)")
+    parser.add_argument("--embed-latency-ms", type=float, default=150.0, help="질문 임베딩 API 지연")
+    parser.add_argument("--latency-ms", type=float, default=400.0, help="가짜 LLM 요청당 고정 지연")
+    parser.add_argument("--per-token-ms", type=float, default=5.0, help="가짜 LLM 출력 토큰당 지연")
+    return parser
+
+
+def main() -> None:
+    args = create_parser().parse_args()
+    server = FakeLLMServer(latency_ms=args.latency_ms, per_token_ms=args.per_token_ms).start()
+    for name in ("UPSTAGE_API_KEY", "UPSTAGE_BASE_URL"):
+        os.environ.pop(name, None)
+    os.environ.update({"OPENAI_API_KEY": "fake", "OPENAI_BASE_URL": server.base_url, "ANSWER_CACHE_SIZE": "0",
+                       "INTENT_THRESHOLD": "off", "STORE_RELOAD_INTERVAL": "off"})
+
+    from st_app.graph.speculative import SPECULATION_STATS, speculation_stats
+    from st_app.rag.store_manager import get_store_manager
+
+    store = build_store(args.embed_latency_ms)
+    stores = get_store_manager()
+    stores.loader = lambda _index_dir: store
+    stores.reload()
+    try:
+        print(f"{'speculative':<12} {'route':<11} {'n':>3} {'p50(ms)':>9}")
+        for enabled in (False, True):
+            SPECULATION_STATS.reset()
+            for route, r in run_mode(enabled, args.turns, args.review_share).items():
+                print(f"{str(enabled).lower():<12} {route:<11} {r['n']:>3} {r['p50']:>9.1f}")
+        stats = speculation_stats()
+        print(f"미리 검색 {stats['speculated']}회, 낭비율 {stats['waste_rate'] * 100:.0f}%, "
+              f"숨긴 검색 시간 {stats['saved_ms']:.0f} ms, 버린 검색 시간 {stats['wasted_ms']:.0f} ms")
+        for route, s in stats["by_route"].items():
+            print(f"  {route}: {s}")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+스트리밍 실행의 첫 토큰 지연(TTFT) vs 전체 지연 벤치마크.
+
+가짜 OpenAI 호환 서버(st_app/bench/fake_llm_server.py)를 띄워 그래프 전체(build_graph)를
+graph.invoke(응답 전체가 끝나야 화면에 보임)와 stream_turn(토큰이 오는 대로 보임)으로 실행합니다.
+invoke의 "첫 토큰"은 전체 지연과 같습니다. 리뷰 질문은 인덱스가 필요하므로 chat/subject_info 턴만 씁니다.
+
+    python -m st_app.bench.stream_bench --turns 16 --latency-ms 400 --per-token-ms 15
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import time
+import uuid
+from typing import Dict, List
+
+import numpy as np
+
+from st_app.bench.fake_llm_server import FakeLLMServer
+
+TURNS = ["안녕?", "대표 메뉴 뭐야?", "고마워!", "영업 시간 알려줘", "심심해", "위치가 어디야?"]
+
+
+def run_mode(mode: str, turns: int) -> Dict[str, Dict[str, float]]:
+    from st_app.graph.router import build_graph
+    from st_app.graph.streaming import stream_turn
+
+    graph = build_graph()
+    config = {"configurable": {"thread_id": uuid.uuid4().hex}}
+    ttft: Dict[str, List[float]] = {}
+    total: Dict[str, List[float]] = {}
+    for i in range(turns):
+        user_input = TURNS[i % len(TURNS)]
+        state = {"history": [{"role": "user", "content": user_input}], "user_input": user_input,
+                 "route": "router", "subject": None, "citations": [], "response": ""}
+        started = time.perf_counter()
+        first = None
+        if mode == "invoke":
+            result = graph.invoke(state, config=config)
+        else:
+            for kind, payload in stream_turn(graph, state, config=config):
+                if kind == "token" and first is None:
+                    first = time.perf_counter()
+                elif kind == "final":
+                    result = payload
+        finished = time.perf_counter()
+        if not result.get("response"):
+            raise RuntimeError(f"{mode}: 빈 응답 ({user_input})")
+        route = str(result.get("route"))
+        ttft.setdefault(route, []).append((first or finished) - started)
+        total.setdefault(route, []).append(finished - started)
+    return {route: {"ttft_p50": float(np.percentile(np.array(ttft[route]) * 1000, 50)),
+                    "total_p50": float(np.percentile(np.array(total[route]) * 1000, 50)),
+                    "n": len(total[route])}
+            for route in sorted(total)}
+
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="스트리밍 첫 토큰 지연(TTFT) 벤치마크")
+    parser.add_argument("--turns", type=int, default=12, help="모드별 턴 수")
+    parser.add_argument("--latency-ms", type=float, default=400.0, help="가짜 LLM 첫 토큰까지의 지연")
+    parser.add_argument("--per-token-ms", type=float, default=15.0, help="가짜 LLM 출력 토큰당 지연")
+    return parser
+
+
+def main() -> None:
+    args = create_parser().parse_args()
+    server = FakeLLMServer(latency_ms=args.latency_ms, per_token_ms=args.per_token_ms).start()
+    # 그래프의 모든 LLM 호출이 가짜 서버로 가도록 설정 (답변 캐시는 인덱스 로드가 필요하므로 끔)
+    for name in ("UPSTAGE_API_KEY", "UPSTAGE_BASE_URL"):
+        os.environ.pop(name, None)
+    os.environ.update({"OPENAI_API_KEY": "fake", "OPENAI_BASE_URL": server.base_url, "ANSWER_CACHE_SIZE": "0"})
+    try:
+        print(f"{'mode':<7} {'route':<13} {'n':>3} {'TTFT p50(ms)':>13} {'total p50(ms)':>14}")
+        for mode in ("invoke", "stream"):
+            for route, r in run_mode(mode, args.turns).items():
+                print(f"{mode:<7} {route:<13} {r['n']:>3} {r['ttft_p50']:>13.1f} {r['total_p50']:>14.1f}")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from langgraph.config import get_config
+
+from st_app.rag.context import estimate_tokens
+from st_app.rag.llm import get_llm
+from st_app.rag.prompt import HISTORY_SUMMARY_PROMPT
+from st_app.utils.metrics import ValueRecorder
+from st_app.utils.state import GraphState, Message
+
+# 라우터/chat 프롬프트에 넣는 대화 이력 압축 설정
+#   HISTORY_KEEP_TURNS          : 원문 그대로 두는 최근 턴 수 (1턴 = 사용자 + 비서 메시지, 기본 4)
+#   HISTORY_TOKEN_BUDGET        : 요약 + 원문 이력에 쓸 최대 토큰 수(추정치, 기본 1200). 넘치면 오래된 메시지부터 뺍니다.
+#   HISTORY_SUMMARY_TOKENS      : 요약 길이 상한 (기본 300, 예산의 절반을 넘지 않음)
+#   HISTORY_SUMMARY_STALE_TURNS : 요약에 접히지 않은 오래된 턴이 이만큼 쌓이면 백그라운드에서 요약을 갱신 (기본 2, off면 요약 안 함)
+#   HISTORY_MAX_CONVERSATIONS   : 요약을 보관할 대화(thread_id) 수. 넘치면 가장 오래 쓰지 않은 대화부터 버림 (기본 1024)
+DEFAULT_KEEP_TURNS = 4
+DEFAULT_TOKEN_BUDGET = 1200
+DEFAULT_SUMMARY_TOKENS = 300
+DEFAULT_STALE_TURNS = 2
+DEFAULT_MAX_CONVERSATIONS = 1024
+SUMMARY_WORKERS = 2
+MESSAGE_OVERHEAD_TOKENS = 4   # 메시지마다 붙는 역할/구분자 토큰(추정)
+
+# 턴별 full(전체 이력) / sent(프롬프트에 넣는 요약 + 원문 이력) 토큰 수
+HISTORY_TOKENS = ValueRecorder()
+
+_ROLE_NAMES = {"user": "사용자", "assistant": "비서", "system": "시스템"}
+
+
+def keep_turns() -> int:
+    return max(0, int(os.getenv("HISTORY_KEEP_TURNS") or DEFAULT_KEEP_TURNS))
+
+
+def history_token_budget() -> int:
+    return max(0, int(os.getenv("HISTORY_TOKEN_BUDGET") or DEFAULT_TOKEN_BUDGET))
+
+
+def summary_token_limit() -> int:
+    limit = int(os.getenv("HISTORY_SUMMARY_TOKENS") or DEFAULT_SUMMARY_TOKENS)
+    return max(0, min(limit, history_token_budget() // 2))
+
+
+def summary_stale_turns() -> Optional[int]:
+    """None이면 요약을 만들지 않고 예산만큼 최근 메시지만 보냅니다."""
+    raw = (os.getenv("HISTORY_SUMMARY_STALE_TURNS") or str(DEFAULT_STALE_TURNS)).strip().lower()
+    if raw in ("off", "none", "false", "0"):
+        return None
+    return max(1, int(raw))
+
+
+def message_tokens(content: str) -> int:
+    return estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+
+def truncate_to_tokens(text: str, limit: int) -> str:
+    """추정 토큰 수가 limit 이하가 되도록 뒤를 자릅니다 (잘랐으면 끝에 …)."""
+    if estimate_tokens(text) <= limit:
+        return text
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid]) + 1 <= limit:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo].rstrip() + "…" if lo else ""
+
+
+def _messages(state: GraphState) -> List[Message]:
+    return [m for m in state.get("history", []) if m.get("content")]
+
+
+def _fingerprint(messages: List[Message]) -> str:
+    """요약이 덮는 앞부분 이력의 지문. 화면에서 대화를 지우거나 바꾸면 달라져 이전 요약을 버립니다."""
+    digest = hashlib.sha1()
+    for m in messages:
+        digest.update(f"{m.get('role')}\x00{m.get('content')}\x01".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _verbatim_count(messages: List[Message]) -> int:
+    """원문으로 남길 최근 메시지 수. 끝의 사용자 메시지(이번 질문)는 턴 수에 넣지 않습니다."""
+    current = 1 if messages and messages[-1].get("role") == "user" else 0
+    return keep_turns() * 2 + current
+
+
+def _conversation_id() -> Optional[str]:
+    try:
+        config = get_config()
+    except RuntimeError:   # 그래프 밖에서 호출
+        return None
+    thread_id = (config.get("configurable") or {}).get("thread_id")
+    return str(thread_id) if thread_id else None
+
+
+def summarize_with_llm(previous: str, messages: List[Message]) -> str:
+    """기존 요약과 새로 접을 메시지를 LLM으로 하나의 요약으로 합칩니다."""
+    limit = summary_token_limit()
+    transcript = "\n".join(
+        f"{_ROLE_NAMES.get(m.get('role'), m.get('role'))}: {truncate_to_tokens(m['content'], limit)}"
+        for m in messages
+    )
+    response = get_llm(temperature=0.0).invoke([
+        SystemMessage(content=HISTORY_SUMMARY_PROMPT.format(max_tokens=limit)),
+        HumanMessage(content=f"기존 요약: {previous or '(없음)'}\n\n새 대화:\n{transcript}"),
+    ])
+    return str(getattr(response, "content", response)).strip()
+
+
+class HistoryManager:
+    """
+    대화(thread_id)별 롤링 요약을 들고 라우터/chat 프롬프트용 이력을 토큰 예산 안으로 줄입니다.
+      - 최근 HISTORY_KEEP_TURNS 턴은 원문 그대로, 그보다 오래된 턴은 요약 하나로 접습니다.
+      - 접히지 않은 오래된 턴이 HISTORY_SUMMARY_STALE_TURNS 이상이면 스레드에서 요약을 갱신합니다.
+        갱신을 기다리지 않으므로 그동안은 이전 요약 + 접히지 않은 원문을 예산만큼 보냅니다.
+    prepare()가 턴마다 state["history_summary"]/state["history_folded"]를 채우고, history_messages(state)가 프롬프트용 이력을 만듭니다.
+    """
+
+    def __init__(self, summarizer: Optional[Callable[[str, List[Message]], str]] = None,
+                 max_conversations: Optional[int] = None):
+        self.summarizer = summarizer or summarize_with_llm
+        self.max_conversations = max(1, int(max_conversations or os.getenv("HISTORY_MAX_CONVERSATIONS")
+                                            or DEFAULT_MAX_CONVERSATIONS))
+        self._lock = threading.Lock()
+        self._summaries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._refreshing: Set[str] = set()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.refreshes = 0
+        self.failures = 0
+        self.discarded = 0
+
+    def _lookup(self, conversation_id: Optional[str], messages: List[Message]) -> Optional[Dict[str, Any]]:
+        if conversation_id is None:
+            return None
+        with self._lock:
+            entry = self._summaries.get(conversation_id)
+            if entry is None:
+                return None
+            folded = entry["folded"]
+            if folded <= len(messages) and entry["fingerprint"] == _fingerprint(messages[:folded]):
+                self._summaries.move_to_end(conversation_id)
+                return entry
+            del self._summaries[conversation_id]
+            self.discarded += 1
+            return None
+
+    def prepare(self, state: GraphState, conversation_id: Optional[str] = None) -> None:
+        """이번 턴에 쓸 요약을 state에 채우고, 요약이 낡았으면 백그라운드 갱신을 시작합니다."""
+        if conversation_id is None:
+            conversation_id = _conversation_id()
+        messages = _messages(state)
+        entry = self._lookup(conversation_id, messages)
+        state["history_summary"] = entry["summary"] if entry else ""
+        state["history_folded"] = entry["folded"] if entry else 0
+
+        stale = summary_stale_turns()
+        older_end = max(0, len(messages) - _verbatim_count(messages))
+        if conversation_id and stale is not None and older_end - state["history_folded"] >= stale * 2:
+            self._schedule(conversation_id, messages[:older_end], state["history_summary"], state["history_folded"])
+
+        HISTORY_TOKENS.record("full", sum(message_tokens(m["content"]) for m in messages))
+        HISTORY_TOKENS.record("sent", sum(message_tokens(content) for _, content in history_messages(state)))
+
+    def _schedule(self, conversation_id: str, messages: List[Message], previous: str, folded: int) -> None:
+        with self._lock:
+            if conversation_id in self._refreshing:
+                return
+            self._refreshing.add(conversation_id)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=SUMMARY_WORKERS, thread_name_prefix="history")
+            executor = self._executor
+        executor.submit(self._refresh, conversation_id, messages, previous, folded)
+
+    def _refresh(self, conversation_id: str, messages: List[Message], previous: str, folded: int) -> None:
+        try:
+            summary = truncate_to_tokens(self.summarizer(previous, messages[folded:]), summary_token_limit())
+            with self._lock:
+                self._summaries[conversation_id] = {"summary": summary, "folded": len(messages),
+                                                    "fingerprint": _fingerprint(messages)}
+                self._summaries.move_to_end(conversation_id)
+                while len(self._summaries) > self.max_conversations:
+                    self._summaries.popitem(last=False)
+                self.refreshes += 1
+        except Exception as e:
+            print(f"대화 요약 갱신 실패, 이전 요약을 유지합니다: {e}")
+            with self._lock:
+                self.failures += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(conversation_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"conversations": len(self._summaries), "refreshing": len(self._refreshing),
+                    "refreshes": self.refreshes, "failures": self.failures, "discarded": self.discarded}
+
+
+def history_messages(state: GraphState) -> List[Tuple[str, str]]:
+    """
+    라우터/chat 프롬프트에 넣을 (role, content) 목록: [요약(system)] + 최근 원문 메시지.
+    요약이 덮은 앞부분은 빼고, 남은 메시지를 최신부터 HISTORY_TOKEN_BUDGET이 찰 때까지 담습니다.
+    """
+    messages = _messages(state)
+    budget = history_token_budget()
+    summary = truncate_to_tokens(state.get("history_summary") or "", summary_token_limit())
+    folded = (state.get("history_folded") or 0) if summary else 0
+
+    head: List[Tuple[str, str]] = []
+    used = 0
+    if summary:
+        head.append(("system", f"이전 대화 요약: {summary}"))
+        used += message_tokens(head[0][1])
+    recent: List[Tuple[str, str]] = []
+    for m in reversed(messages[folded:]):
+        cost = message_tokens(m["content"])
+        if used + cost > budget:
+            break
+        recent.append((m["role"], m["content"]))
+        used += cost
+    return head + recent[::-1]
+
+
+_manager: Optional[HistoryManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_history_manager() -> HistoryManager:
+    """프로세스 공용 대화 이력 관리자."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = HistoryManager()
+        return _manager
+
+
+def history_stats() -> Dict[str, Any]:
+    """턴별 이력 토큰 수(full/sent 평균)와 요약 갱신 횟수."""
+    tokens = {name: round(v["mean"], 1) for name, v in HISTORY_TOKENS.snapshot().items()}
+    return dict(get_history_manager().stats(), tokens=tokens)
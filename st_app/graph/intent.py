@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import math
+import os
+import random
+import re
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from st_app.rag.filters import parse_review_filters
+
+# 라우터 LLM 앞단의 규칙 기반 의도 분류기
+#   INTENT_THRESHOLD   : 이 확신도 이상이면 LLM 라우터 없이 결정 ("off"면 항상 LLM)
+#   INTENT_SHADOW_RATE : 규칙으로 결정한 요청 중 이 비율만큼 LLM 라우터도 호출해 일치율을 잽니다 (기본 0)
+DEFAULT_INTENT_THRESHOLD = 0.85
+# 규칙만으로 결정하려면 이긴 라우트에 서로 다른 근거(맞은 규칙, 리뷰 필터)가 이만큼 있어야 합니다.
+# 가중치가 큰 규칙 하나("몇 시"가 "몇 시간"에 맞는 경우 등)만으로는 LLM 라우터를 건너뛰지 않습니다.
+MIN_FAST_SIGNALS = 2
+ROUTES = ("chat", "subject_info", "rag_review")
+
+# (라우트, 가중치, 패턴). 같은 라우트의 여러 규칙이 맞으면 가중치를 더합니다.
+_RULES: List[Tuple[str, float, "re.Pattern[str]"]] = [(route, weight, re.compile(pattern, re.IGNORECASE)) for route, weight, pattern in [
+    # 인사/감사/잡담
+    # 인사말은 토큰 경계에서 끝나야 함 ("하이디라오", "하이볼"은 인사가 아님)
+    ("chat", 3.0, r"^\s*(안녕(하세요|하십니까|히)?|하이|헬로|hi|hello|ㅎㅇ|반가워요?|반갑(습니다|네요|다)?)(?=\s|[!?.~,]|$)"),
+    # 메시지 전체가 인사/감사말뿐이면 두 번째 근거 ("안녕?", "고마워요!")
+    ("chat", 1.0, r"^\s*((안녕(하세요|하십니까|히)?|하이|헬로|hi|hello|hey|there|ㅎㅇ|반가워요?|반갑(습니다|네요|다)?"
+                  r"|고마워요?|고맙습니다|감사(합니다|해요)?|땡큐|thx|thanks?)[\s!?.~,^ㅎㅋ]*)+$"),
+    ("chat", 3.0, r"(고마워|고맙|감사(합니다|해요)?|땡큐|thx|thank)"),
+    ("chat", 2.0, r"(잘\s*(가|자|있어)|바이|bye|또\s*봐)"),
+    ("chat", 1.5, r"(ㅋㅋ|ㅎㅎ|ㅠㅠ|ㅜㅜ)"),
+    ("chat", 2.0, r"(뭐\s*해|심심|기분|날씨|너는\s*누구|넌\s*누구|이름이\s*뭐)"),
+    # 대상 자체 정보 (메뉴/위치/시간/가격/시설)
+    # "몇 시간 기다려?"의 "몇 시", "오픈런"의 "오픈"은 영업 시간 질문이 아님
+    ("subject_info", 3.0, r"(영업\s*시간|몇\s*시(?!\s*간)|오픈(?!\s*런)|마감|라스트\s*오더|브레이크\s*타임|휴무|쉬는\s*날)"),
+    ("subject_info", 3.0, r"(위치|어디에?\s*(있|야|예요|에요)|주소|가는\s*(법|길)|찾아가|몇\s*번\s*출구|역에서)"),
+    ("subject_info", 2.5, r"(대표\s*메뉴|메뉴\s*(뭐|가|는|판|알려)|뭐\s*팔|시그니처)"),
+    ("subject_info", 2.0, r"(가격|얼마|몇\s*원|가격대)"),
+    ("subject_info", 2.5, r"(주차|예약|포장|배달|전화\s*번호|연락처|카드\s*(돼|되|결제)|좌석)"),
+    # 리뷰 기반 질문
+    ("rag_review", 3.0, r"(리뷰|후기|평점|별점|댓글|평가|평이|반응)"),
+    ("rag_review", 2.0, r"(다는|라는)\s*(사람|말|얘기|평|의견|글|게|거|분)"),
+    ("rag_review", 2.0, r"(사람들|손님들|다들|대부분|많이들)"),
+    ("rag_review", 1.5, r"(불만|칭찬|단점|장점|호불호|아쉬운\s*점|좋았던\s*점)"),
+    ("rag_review", 1.0, r"(맛있|맛없|짜|싱거|달|매워|맵|느끼|친절|불친절|위생|깨끗|더럽|양이|면발|국물|웨이팅|줄이)"),
+]]
+
+
+def _softmax(scores: Sequence[float]) -> List[float]:
+    top = max(scores)
+    exps = [math.exp(s - top) for s in scores]
+    total = sum(exps)
+    return [e / total for e in exps]
+
+
+class IntentClassifier:
+    """
+    키워드/정규식 규칙의 가중치 합을 라우트별 점수로 보고 softmax로 확신도를 계산합니다.
+    질문에서 리뷰 필터(출처/별점/기간)가 뽑히면 rag_review에 가중치를 더합니다.
+    아무 규칙도 맞지 않으면 세 라우트가 같은 점수라 확신도는 1/3이 되어 LLM 라우터로 넘어갑니다.
+    decide()는 확신도가 임계값 이상이고 근거가 min_signals개 이상일 때만 규칙으로 결정합니다.
+    """
+
+    def __init__(self, rules: Sequence[Tuple[str, float, "re.Pattern[str]"]] = _RULES, filter_weight: float = 2.5,
+                 min_signals: int = MIN_FAST_SIGNALS):
+        self.rules = list(rules)
+        self.filter_weight = filter_weight
+        self.min_signals = min_signals
+
+    def _evaluate(self, text: str) -> Tuple[Dict[str, float], Dict[str, int]]:
+        raw = {route: 0.0 for route in ROUTES}
+        signals = {route: 0 for route in ROUTES}
+        text = text or ""
+        for route, weight, pattern in self.rules:
+            if pattern.search(text):
+                raw[route] += weight
+                signals[route] += 1
+        if parse_review_filters(text):
+            raw["rag_review"] += self.filter_weight
+            signals["rag_review"] += 1
+        return raw, signals
+
+    def scores(self, text: str) -> Dict[str, float]:
+        return self._evaluate(text)[0]
+
+    def _classify(self, text: str) -> Tuple[str, float, Dict[str, float], int]:
+        raw, signals = self._evaluate(text)
+        probs = dict(zip(ROUTES, _softmax([raw[r] for r in ROUTES])))
+        route = max(ROUTES, key=lambda r: (probs[r], -ROUTES.index(r)))
+        return route, probs[route], probs, signals[route]
+
+    def classify(self, text: str) -> Tuple[str, float, Dict[str, float]]:
+        """(가장 그럴듯한 라우트, 확신도 0~1, 라우트별 확률)"""
+        route, confidence, probs, _ = self._classify(text)
+        return route, confidence, probs
+
+    def decide(self, text: str, threshold: Optional[float]) -> Tuple[str, float, bool, Dict[str, float]]:
+        """(예측 라우트, 확신도, 규칙으로 결정할지, 라우트별 확률). threshold가 None이면 항상 LLM."""
+        route, confidence, probs, signals = self._classify(text)
+        fast = threshold is not None and confidence >= threshold and signals >= self.min_signals
+        return route, confidence, fast, probs
+
+
+class IntentStats:
+    """
+    규칙 분류기 결정/LLM 폴백 횟수와, LLM 결과가 있는 요청에서의 규칙 예측 일치율(확신도 구간별)을 모읍니다.
+    LLM 결과는 폴백 요청과 그림자(shadow) 요청에서 얻습니다. 구간별 일치율을 보고 INTENT_THRESHOLD를 조정합니다.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.fast: Dict[str, int] = {route: 0 for route in ROUTES}
+        self.fallback = 0
+        self.shadow = 0
+        self._buckets: Dict[int, List[int]] = {}   # 확신도 구간(0~9) → [일치 수, 전체 수]
+
+    def record_fast(self, route: str) -> None:
+        with self._lock:
+            self.fast[route] = self.fast.get(route, 0) + 1
+
+    def record_llm(self, predicted: str, confidence: float, llm_route: str, shadow: bool = False) -> None:
+        with self._lock:
+            if shadow:
+                self.shadow += 1
+            else:
+                self.fallback += 1
+            bucket = self._buckets.setdefault(min(int(confidence * 10), 9), [0, 0])
+            bucket[0] += int(predicted == llm_route)
+            bucket[1] += 1
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            fast = sum(self.fast.values())
+            total = fast + self.fallback
+            agree = sum(b[0] for b in self._buckets.values())
+            labelled = sum(b[1] for b in self._buckets.values())
+            return {
+                "fast_path": fast,
+                "fallback": self.fallback,
+                "shadow": self.shadow,
+                "fast_rate": (fast / total) if total else 0.0,
+                "fast_by_route": dict(self.fast),
+                "agreement": (agree / labelled) if labelled else None,
+                "agreement_by_confidence": {
+                    f"{b / 10:.1f}-{(b + 1) / 10:.1f}": {"n": n, "agreement": a / n}
+                    for b, (a, n) in sorted(self._buckets.items())
+                },
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.fast = {route: 0 for route in ROUTES}
+            self.fallback = 0
+            self.shadow = 0
+            self._buckets.clear()
+
+
+INTENT_CLASSIFIER = IntentClassifier()
+INTENT_STATS = IntentStats()
+
+
+def intent_threshold() -> Optional[float]:
+    value = (os.getenv("INTENT_THRESHOLD") or "").strip().lower()
+    if value in ("off", "false", "no"):
+        return None
+    return float(value) if value else DEFAULT_INTENT_THRESHOLD
+
+
+def shadow_sample() -> bool:
+    rate = float(os.getenv("INTENT_SHADOW_RATE") or 0.0)
+    return rate > 0 and random.random() < rate
+
+
+def intent_stats() -> Dict[str, object]:
+    """규칙 결정 수/LLM 폴백 수/일치율(확신도 구간별)."""
+    return INTENT_STATS.snapshot()
@@ -4,6 +4,7 @@ from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, BaseMessage
 from langchain_core.runnables import RunnableLambda
 
+from st_app.graph.history import history_messages
 from st_app.rag.llm import get_llm
 from st_app.rag.prompt import CHAT_SYSTEM_PROMPT
 from st_app.utils.state import GraphState
@@ -18,35 +19,45 @@ def chat_node() -> RunnableLambda:
     llm = get_llm()
     chain = prompt | llm
 
+    def _to_messages(state: GraphState) -> list[BaseMessage]:
+        # 요약(system) + 토큰 예산 안의 최근 원문 이력
+        msgs = []
+        for role, content in history_messages(state):
+            if role == "user":
+                msgs.append(HumanMessage(content=content))
+            elif role == "assistant":
+                msgs.append(AIMessage(content=content))
+            elif role == "system":
+                msgs.append(SystemMessage(content=content))
+        return msgs
+
+    def _finish(state: GraphState, response: Any) -> GraphState:
+        text = response.content if hasattr(response, "content") else str(response)
+        state["response"] = text
+        state["route"] = "chat"
+        state["last_node"] = "chat"
+        return state
+
     def _invoke(state: GraphState) -> GraphState:
         # 이전 노드가 이미 응답을 생성했으면 그대로 전달
         if state.get("response"):
             # route/last_node 보존
             return state
-        def _to_messages() -> list[BaseMessage]:
-            msgs = []
-            for m in state.get("history", []):
-                role = m.get("role")
-                content = m.get("content", "")
-                if not content:
-                    continue
-                if role == "user":
-                    msgs.append(HumanMessage(content=content))
-                elif role == "assistant":
-                    msgs.append(AIMessage(content=content))
-                elif role == "system":
-                    msgs.append(SystemMessage(content=content))
-            return msgs
-
         response = chain.invoke({
-            "history": _to_messages(),
+            "history": _to_messages(state),
             "user_input": state.get("user_input", ""),
         })
-        text = response.content if hasattr(response, "content") else str(response)
-        state["response"] = text
-        state["route"] = "chat"
-        state["last_node"] = "chat"
-        return state
+        return _finish(state, response)
+
+    # 그래프를 ainvoke/astream으로 실행할 때 쓰는 비동기 버전 (LLM 응답을 기다리는 동안 이벤트 루프를 양보)
+    async def _ainvoke(state: GraphState) -> GraphState:
+        if state.get("response"):
+            return state
+        response = await chain.ainvoke({
+            "history": _to_messages(state),
+            "user_input": state.get("user_input", ""),
+        })
+        return _finish(state, response)
 
-    return RunnableLambda(_invoke)
+    return RunnableLambda(_invoke, afunc=_ainvoke)
 
@@ -1,16 +1,23 @@
 import os
-from typing import Dict
+from typing import Dict, Optional
 
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableLambda
+from langgraph.config import get_stream_writer
 
 from st_app.rag.prompt import RAG_REVIEW_PROMPT
 from st_app.rag.llm import get_llm
-from st_app.rag.retriever import _load_store, retrieve_reviews
+from st_app.rag.context import pack_context, record_prompt_tokens
+from st_app.rag.store_manager import get_store_manager
+from st_app.rag.answer_cache import aremember_answer, remember_answer
+from st_app.graph.speculative import aretrieve_for_review, retrieve_for_review, take_prefetched
 from st_app.utils.state import GraphState
 
 INDEX_DIR = os.path.join("st_app", "db", "faiss_index")
-_STORE = _load_store(INDEX_DIR)   # ← 여기서 로드 (Upstage 미니 임베더 사용)
+# 인덱스는 첫 질문 때 로드하고, 다시 만들어지면(meta.json 변경) 재시작 없이 새 인덱스로 바꿉니다.
+_STORES = get_store_manager(INDEX_DIR)
+# 근거 없을 때도 부드럽게 응답
+NO_CONTEXT_REPLY = "회수된 리뷰에서 관련 근거를 찾지 못했어요. 다른 표현으로 다시 물어봐 주실래요?"
 
 def rag_review_node() -> RunnableLambda:
     prompt = ChatPromptTemplate.from_messages([
@@ -18,45 +25,75 @@ def rag_review_node() -> RunnableLambda:
         ("human", "사용자 질문: {user_input}\n\n리뷰 컨텍스트:\n{context}"),
     ])
     llm = get_llm(temperature=0.2)  # 살짝 낮게
-    chain = prompt | llm
+
+    def _reply(state: GraphState, text: str, citations: list) -> GraphState:
+        state["response"] = text
+        state["citations"] = citations
+        state["route"] = "rag_review"
+        state["last_node"] = "rag_review"
+        return state
+
+    def _guard(state: GraphState, store) -> Optional[GraphState]:
+        # 인덱스/질문 가드
+        if not state.get("user_input", "").strip():
+            return _reply(state, "질문이 비어 있어요. 어떤 점이 궁금한지 말씀해 주세요!", [])
+        if store is None:
+            return _reply(state, "지금은 리뷰 인덱스를 불러오지 못했어요. 인덱스를 먼저 생성한 뒤 다시 시도해 주세요.", [])
+        return None
+
+    def _pack(passages, citations):
+        # 순위 순으로 겹치는 문장을 빼며 토큰 예산(CONTEXT_TOKEN_BUDGET)만큼 채움
+        context, citations, token_stats = pack_context(passages, citations)
+        # 스트리밍 실행(st_app/graph/streaming.py)이면 생성 전에 인용부터 화면에 보냄 (invoke에서는 아무 일도 안 함)
+        get_stream_writer()({"citations": citations})
+        return context, citations, token_stats
 
     def _invoke(state: GraphState) -> GraphState:
         query = state.get("user_input", "").strip()
+        store = _STORES.get()   # 이 질문은 끝까지 같은 버전의 인덱스로 처리
+        guarded = _guard(state, store)
+        if guarded is not None:
+            return guarded
 
-        # 인덱스/질문 가드
-        if not query:
-            state["response"] = "질문이 비어 있어요. 어떤 점이 궁금한지 말씀해 주세요!"
-            state["citations"] = []
-            state["route"] = "rag_review"
-            state["last_node"] = "rag_review"
-            return state
-
-        if _STORE is None:
-            state["response"] = "지금은 리뷰 인덱스를 불러오지 못했어요. 인덱스를 먼저 생성한 뒤 다시 시도해 주세요."
-            state["citations"] = []
-            state["route"] = "rag_review"
-            state["last_node"] = "rag_review"
-            return state
-
-        # 검색
-        context, citations = retrieve_reviews(_STORE, query, k=5)
-
-        # 근거 없을 때도 부드럽게 응답
+        # 검색 ("최근 카카오맵 1점 리뷰"처럼 출처/별점/기간 조건이 있으면 검색 단계에서 거름)
+        # 라우터가 LLM 호출과 동시에 미리 검색해 두었으면(SPECULATIVE_RETRIEVAL) 그 결과를 씀
+        prefetched = take_prefetched(state, query, _STORES.signature)
+        passages, citations = prefetched or retrieve_for_review(store, query)
+        context, citations, token_stats = _pack(passages, citations)
         if not context.strip():
-            state["response"] = "회수된 리뷰에서 관련 근거를 찾지 못했어요. 다른 표현으로 다시 물어봐 주실래요?"
-            state["citations"] = []
-            state["route"] = "rag_review"
-            state["last_node"] = "rag_review"
-            return state
-
-        # 생성
-        response = chain.invoke({"user_input": query, "context": context})
+            return _reply(state, NO_CONTEXT_REPLY, [])
+
+        # 생성 (프롬프트 토큰 수를 요청마다 기록)
+        prompt_value = prompt.invoke({"user_input": query, "context": context})
+        response = llm.invoke(prompt_value)
+        record_prompt_tokens(token_stats, prompt_value.to_string(), response)
         text = response.content if hasattr(response, "content") else str(response)
 
-        state["response"] = text
-        state["citations"] = citations
-        state["route"] = "rag_review"
-        state["last_node"] = "rag_review"
+        _reply(state, text, citations)
+        remember_answer(store, _STORES.signature, state)
+        return state
+
+    # 그래프를 ainvoke/astream으로 실행할 때 쓰는 비동기 버전: 임베딩/LLM 응답을 기다리는 동안 이벤트 루프를 양보
+    async def _ainvoke(state: GraphState) -> GraphState:
+        query = state.get("user_input", "").strip()
+        store = await _STORES.aget()
+        guarded = _guard(state, store)
+        if guarded is not None:
+            return guarded
+
+        prefetched = take_prefetched(state, query, _STORES.signature)
+        passages, citations = prefetched or await aretrieve_for_review(store, query)
+        context, citations, token_stats = _pack(passages, citations)
+        if not context.strip():
+            return _reply(state, NO_CONTEXT_REPLY, [])
+
+        prompt_value = prompt.invoke({"user_input": query, "context": context})
+        response = await llm.ainvoke(prompt_value)
+        record_prompt_tokens(token_stats, prompt_value.to_string(), response)
+        text = response.content if hasattr(response, "content") else str(response)
+
+        _reply(state, text, citations)
+        await aremember_answer(store, _STORES.signature, state)
         return state
 
-    return RunnableLambda(_invoke)
+    return RunnableLambda(_invoke, afunc=_ainvoke)
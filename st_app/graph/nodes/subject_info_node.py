@@ -1,26 +1,14 @@
-import json
-import os
-from typing import Dict
-
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableLambda
 
 from st_app.rag.llm import get_llm
 from st_app.rag.prompt import SUBJECT_INFO_PROMPT
+from st_app.rag.answer_cache import aremember_answer, remember_answer
+from st_app.rag.store_manager import get_store_manager
+from st_app.graph.subject_registry import get_subject_registry
 from st_app.utils.state import GraphState
 
 
-SUBJECT_DB_PATH = os.path.join("st_app", "db", "subject_information", "subjects.json")
-
-
-def _load_subjects() -> Dict[str, Dict]:
-    if not os.path.exists(SUBJECT_DB_PATH):
-        return {}
-    with open(SUBJECT_DB_PATH, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return data if isinstance(data, dict) else {}
-
-
 def subject_info_node() -> RunnableLambda:
     prompt = ChatPromptTemplate.from_messages([
         ("system", SUBJECT_INFO_PROMPT),
@@ -29,24 +17,35 @@ def subject_info_node() -> RunnableLambda:
     llm = get_llm()
     chain = prompt | llm
 
-    subjects = _load_subjects()
+    subjects = get_subject_registry()   # subjects.json이 바뀌면 재시작 없이 반영
 
-    def _invoke(state: GraphState) -> GraphState:
+    def _inputs(state: GraphState) -> dict:
         subject = state.get("subject")
-        if subject and subject in subjects:
-            enrich = subjects[subject]
-        else:
-            enrich = {}
-        response = chain.invoke({
+        return {
             "subject": subject or "(미상)",
             "user_input": state.get("user_input", ""),
-            "info": enrich,
-        })
+            "info": subjects.info(subject),
+        }
+
+    def _finish(state: GraphState, response) -> GraphState:
         text = response.content if hasattr(response, "content") else str(response)
         state["response"] = text
         state["route"] = "subject_info"
         state["last_node"] = "subject_info"
         return state
 
-    return RunnableLambda(_invoke)
+    def _invoke(state: GraphState) -> GraphState:
+        state = _finish(state, chain.invoke(_inputs(state)))
+        # 질문 임베딩은 리뷰 인덱스의 쿼리 임베더를 씁니다 (인덱스가 없으면 캐시하지 않음).
+        stores = get_store_manager()
+        remember_answer(stores.get(), stores.signature, state)
+        return state
+
+    async def _ainvoke(state: GraphState) -> GraphState:
+        state = _finish(state, await chain.ainvoke(_inputs(state)))
+        stores = get_store_manager()
+        await aremember_answer(await stores.aget(), stores.signature, state)
+        return state
+
+    return RunnableLambda(_invoke, afunc=_ainvoke)
 
@@ -3,23 +3,50 @@ from __future__ import annotations
 import os
 import json
 import re
+import time
 from typing import Literal, List
 
 from langgraph.graph import END, StateGraph
 from langgraph.checkpoint.memory import MemorySaver
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
 
 from st_app.rag.llm import get_llm
-from st_app.rag.prompt import ROUTER_SYSTEM_PROMPT
+from st_app.rag.prompt import ROUTER_COMBINED_PROMPT, ROUTER_SYSTEM_PROMPT
+from st_app.rag.answer_cache import (
+    CACHEABLE_ROUTES, aembed_for_cache, answer_cache_threshold, cache_filter_key, cache_terms_key, embed_for_cache,
+    get_answer_cache,
+)
+from st_app.rag.store_manager import get_store_manager
 from st_app.utils.state import GraphState
+from st_app.graph.history import get_history_manager, history_messages
+from st_app.graph.intent import INTENT_CLASSIFIER, INTENT_STATS, intent_threshold, shadow_sample
+from st_app.graph.subject_registry import get_subject_registry
+from st_app.graph.speculative import SPECULATION_STATS, Prefetch, speculative_enabled, speculative_min_prob
 from st_app.graph.nodes.chat_node import chat_node
 from st_app.graph.nodes.subject_info_node import subject_info_node
 from st_app.graph.nodes.rag_review_node import rag_review_node
 
 
-def _router_decision_fn(state: GraphState) -> Literal["chat", "subject_info", "rag_review"]:
+def router_combined() -> bool:
+    """ROUTER_COMBINED(기본 켬): chat 라우트면 라우터 호출이 최종 답변까지 만들어 chat 노드 호출을 생략합니다."""
+    return (os.getenv("ROUTER_COMBINED") or "true").lower() not in ("0", "false", "no", "off")
+
+
+def _parse_router_json(text: str) -> dict:
+    # 코드 블록(```json)이나 앞뒤 설명이 붙어도 첫 JSON 객체만 읽고, answer 안의 줄바꿈을 허용합니다.
+    start, end = text.find("{"), text.rfind("}")
+    data = json.loads(text[start:end + 1] if 0 <= start < end else text.strip(), strict=False)
+    if not isinstance(data, dict):
+        raise ValueError("JSON 객체가 아닙니다.")
+    return data
+
+
+def _router_call(state: GraphState, candidates_list: List[str], combined: bool):
+    """라우터 LLM 체인과 입력. 동기/비동기 라우팅이 같이 씁니다."""
     prompt = ChatPromptTemplate.from_messages([
-        ("system", ROUTER_SYSTEM_PROMPT),  # ← prompt.py에서 JSON 한 줄로 강제된 버전 사용
+        # ← prompt.py에서 JSON 한 줄로 강제된 버전 사용
+        ("system", ROUTER_COMBINED_PROMPT if combined else ROUTER_SYSTEM_PROMPT),
         ("human",
          "가능한 subject 후보: {candidates}\n"
          "대화 이력: {history}\n\n"
@@ -28,24 +55,43 @@ def _router_decision_fn(state: GraphState) -> Literal["chat", "subject_info", "r
     ])
     llm = get_llm(temperature=0.0)
     chain = prompt | llm
-
-    candidates_list: List[str] = _load_candidate_subjects()
-    response = chain.invoke({
-        "history": [(m["role"], m["content"]) for m in state.get("history", []) if m.get("content")],
+    inputs = {
+        "history": history_messages(state),
         "user_input": state.get("user_input", ""),
         "candidates": ", ".join(candidates_list) if candidates_list else "(없음)",
-    })
+    }
+    return chain, inputs
+
+
+def _llm_route(state: GraphState, candidates_list: List[str],
+               combined: bool = False) -> tuple[str, str | None, str | None]:
+    """(route, subject, answer). answer는 combined 모드에서 route가 chat일 때만 채워집니다."""
+    chain, inputs = _router_call(state, candidates_list, combined)
+    return _parse_route(chain.invoke(inputs), combined)
+
+
+async def _allm_route(state: GraphState, candidates_list: List[str],
+                      combined: bool = False) -> tuple[str, str | None, str | None]:
+    """_llm_route의 비동기 버전."""
+    chain, inputs = _router_call(state, candidates_list, combined)
+    return _parse_route(await chain.ainvoke(inputs), combined)
+
+
+def _parse_route(response, combined: bool) -> tuple[str, str | None, str | None]:
     text = response.content if hasattr(response, "content") else str(response)
 
     # JSON 안전 파싱
     route = "chat"
     subject = None
+    answer = None
     try:
-        data = json.loads(text.strip())
+        data = _parse_router_json(text)
         route = data.get("route", "chat")
         subject = data.get("subject")
         if isinstance(subject, str):
             subject = subject.strip() or None
+        if combined and isinstance(data.get("answer"), str):
+            answer = data["answer"].strip() or None
     except Exception:
         # 혹시 모델이 JSON을 깨뜨리면 기존 정규식으로 백업
         m = re.search(r'"route"\s*:\s*"([a-z_]+)"', text)
@@ -55,10 +101,42 @@ def _router_decision_fn(state: GraphState) -> Literal["chat", "subject_info", "r
         if m2:
             subject = m2.group(1).strip()
 
-    # 라우트/서브젝트 보정
+    # 라우트 보정
     if route not in {"chat", "subject_info", "rag_review"}:
         route = "chat"
+    return route, subject, (answer if route == "chat" else None)
+
+
+def _fast_route(user_input: str) -> tuple[str, float, bool, dict]:
+    """
+    규칙 분류기가 확신하면 LLM 라우터 호출 없이 결정 ("안녕?" 등). 확신이 없을 때만 LLM으로 넘깁니다.
+    (예측 라우트, 확신도, 규칙으로 결정했는지, 라우트별 확률)
+    """
+    predicted, confidence, fast, probs = INTENT_CLASSIFIER.decide(user_input, intent_threshold())
+    if fast:
+        INTENT_STATS.record_fast(predicted)
+    return predicted, confidence, fast, probs
+
+
+def _should_prefetch(state: GraphState, probs: dict) -> bool:
+    """SPECULATIVE_RETRIEVAL이 켜져 있고 rag_review일 가능성이 MIN_PROB 이상이면 라우터 LLM과 동시에 검색합니다."""
+    if not speculative_enabled() or not state.get("user_input", "").strip():
+        return False
+    if probs.get("rag_review", 0.0) < speculative_min_prob():
+        SPECULATION_STATS.record_skipped()
+        return False
+    return True
 
+
+def _apply_decision(state: GraphState, route: str, subject: str | None, answer: str | None,
+                    candidates_list: List[str]) -> Literal["chat", "subject_info", "rag_review"]:
+    if answer:
+        # 라우팅과 같은 호출에서 chat 답변까지 받았으므로 chat 노드를 건너뜁니다.
+        state["response"] = answer
+        state["last_node"] = "chat"
+
+    # 서브젝트 보정 (LLM이 "명동교자 본점"처럼 별칭으로 답해도 등록된 이름으로)
+    subject = get_subject_registry().canonical_name(subject) or subject
     if not subject:
         guessed = _guess_subject(state.get("user_input", ""), candidates_list)
         subject = guessed or state.get("subject") or None
@@ -70,37 +148,110 @@ def _router_decision_fn(state: GraphState) -> Literal["chat", "subject_info", "r
     return route  # type: ignore[return-value]
 
 
+def _router_decision_fn(state: GraphState) -> Literal["chat", "subject_info", "rag_review"]:
+    candidates_list: List[str] = _load_candidate_subjects()
+    predicted, confidence, fast, probs = _fast_route(state.get("user_input", ""))
+    subject = answer = None
+    if fast:
+        route = predicted
+        if shadow_sample():
+            llm_route, _, _ = _llm_route(state, candidates_list)
+            INTENT_STATS.record_llm(predicted, confidence, llm_route, shadow=True)
+    else:
+        # rag_review가 될 수도 있으면 라우터 LLM을 기다리는 동안 검색을 미리 실행
+        prefetch = None
+        if _should_prefetch(state, probs):
+            stores = get_store_manager()
+            store = stores.get()
+            if store is not None:
+                prefetch = Prefetch.start(store, state.get("user_input", "").strip(), stores.signature)
+        route, subject, answer = _llm_route(state, candidates_list, combined=router_combined())
+        INTENT_STATS.record_llm(predicted, confidence, route)
+        if prefetch is not None:
+            prefetch.settle(state, route)
+    return _apply_decision(state, route, subject, answer, candidates_list)
+
+
+async def _arouter_decision_fn(state: GraphState) -> Literal["chat", "subject_info", "rag_review"]:
+    """_router_decision_fn의 비동기 버전."""
+    candidates_list: List[str] = _load_candidate_subjects()
+    predicted, confidence, fast, probs = _fast_route(state.get("user_input", ""))
+    subject = answer = None
+    if fast:
+        route = predicted
+        if shadow_sample():
+            llm_route, _, _ = await _allm_route(state, candidates_list)
+            INTENT_STATS.record_llm(predicted, confidence, llm_route, shadow=True)
+    else:
+        prefetch = None
+        if _should_prefetch(state, probs):
+            stores = get_store_manager()
+            store = await stores.aget()
+            if store is not None:
+                prefetch = Prefetch.astart(store, state.get("user_input", "").strip(), stores.signature)
+        route, subject, answer = await _allm_route(state, candidates_list, combined=router_combined())
+        INTENT_STATS.record_llm(predicted, confidence, route)
+        if prefetch is not None:
+            await prefetch.asettle(state, route)
+    return _apply_decision(state, route, subject, answer, candidates_list)
+
+
+def _start_turn(state: GraphState) -> None:
+    """턴 시작 시 이전 턴의 응답/인용을 지우고, 대상이 하나뿐이면 기본 대상으로 채웁니다."""
+    state["started_at"] = time.perf_counter()
+    state["cache_hit"] = False
+    state["response"] = ""
+    state["citations"] = []
+    state["prefetched"] = None
+    # 오래된 턴은 롤링 요약으로 접어 라우터/chat 프롬프트의 이력을 토큰 예산 안으로 유지
+    get_history_manager().prepare(state)
+    cands = _load_candidate_subjects()
+    if not state.get("subject"):
+        if len(cands) == 1:
+            state["subject"] = cands[0]
+
+
+def _wants_answer_cache(state: GraphState):
+    """
+    라우트가 rag_review/subject_info로 정해졌을 때만 답변 캐시를 봅니다.
+    캐시 조회에는 인덱스 로드와 질문 임베딩이 필요하므로, 잡담("안녕?")은 규칙 분류기 빠른 경로 그대로 둡니다.
+    """
+    if state.get("response") or state.get("route") not in CACHEABLE_ROUTES:
+        return None
+    return get_answer_cache()
+
+
+def _apply_cache_hit(state: GraphState, cache, store, vector, version) -> bool:
+    """정해진 라우트·대상·리뷰 필터·내용어가 같은 비슷한 질문의 응답이 있으면 state에 채우고 True."""
+    if vector is None:
+        return False
+    user_input = state.get("user_input", "")
+    hit = cache.lookup(vector, state.get("subject"), routes=(state["route"],), version=version,
+                       filters=cache_filter_key(user_input), terms=cache_terms_key(store, user_input),
+                       threshold=answer_cache_threshold(store))
+    if hit is None:
+        return False
+    state["response"] = hit["response"]
+    state["citations"] = hit["citations"]
+    state["last_node"] = hit["route"]
+    state["cache_hit"] = True
+    state["prefetched"] = None
+    return True
 
-SUBJECT_DB_PATH = os.path.join("st_app", "db", "subject_information", "subjects.json")
 
 def _guess_subject(user_input: str, candidates: List[str]) -> str | None:
-    ui = (user_input or "").lower()
-    aliases = {
-        "명동교자": "명동교자 본점",
-        "교자": "명동교자 본점",
-    }
-    for k, v in aliases.items():
-        if k in ui and v in candidates:
-            return v
-    for c in candidates:
-        if c.lower() in ui or c.replace(" ", "").lower() in ui:
-            return c
+    # 이름/공백 제거 이름/별칭을 한 번에 찾는 매처로 입력 길이에 비례하는 시간에 찾습니다.
+    guessed = get_subject_registry().resolve(user_input)
+    if guessed:
+        return guessed
     if len(candidates) == 1:
         return candidates[0]
     return None
 
 
 def _load_candidate_subjects() -> List[str]:
-    if not os.path.exists(SUBJECT_DB_PATH):
-        return []
-    try:
-        with open(SUBJECT_DB_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        if isinstance(data, dict):
-            return list(data.keys())
-    except Exception:
-        return []
-    return []
+    # subjects.json은 레지스트리가 한 번 읽어 두고 파일이 바뀔 때만 다시 읽습니다.
+    return get_subject_registry().names()
 
 
 def build_graph():
@@ -111,20 +262,40 @@ def build_graph():
     workflow.add_node("subject_info", subject_info_node())
     workflow.add_node("rag_review", rag_review_node())
 
-    # 라우터 가상 노드: 상태 그대로 통과시키는 더미 구현
+    # 라우터 노드: 규칙 분류기 → LLM 라우터 순으로 라우트를 정해 state["route"]에 기록하고,
+    # rag_review/subject_info면 시맨틱 답변 캐시를 확인합니다.
+    # (조건부 엣지 함수에서 바꾼 state는 저장되지 않으므로 결정은 노드 안에서 합니다)
     def router_node(state: GraphState) -> GraphState:
-        if not state.get("subject"):
-            cands = _load_candidate_subjects()
-            if len(cands) == 1:
-                state["subject"] = cands[0]
+        _start_turn(state)
+        state["route"] = _router_decision_fn(state)
+        # 캐시 적중이면 검색·생성 노드를 모두 건너뜀
+        cache = _wants_answer_cache(state)
+        if cache is not None:
+            stores = get_store_manager()
+            store = stores.get()
+            vector = embed_for_cache(store, state.get("user_input", ""))
+            _apply_cache_hit(state, cache, store, vector, stores.signature)
         return state
 
+    # ainvoke/astream용: 임베딩/LLM 응답을 기다리는 동안 이벤트 루프를 양보합니다.
+    async def arouter_node(state: GraphState) -> GraphState:
+        _start_turn(state)
+        state["route"] = await _arouter_decision_fn(state)
+        cache = _wants_answer_cache(state)
+        if cache is not None:
+            stores = get_store_manager()
+            store = await stores.aget()
+            vector = await aembed_for_cache(store, state.get("user_input", ""))
+            _apply_cache_hit(state, cache, store, vector, stores.signature)
+        return state
 
-    workflow.add_node("router", router_node)
+    workflow.add_node("router", RunnableLambda(router_node, afunc=arouter_node))
 
-    # router 에서 LLM 라우팅으로 분기
+    # router가 정한 라우트로 분기. 캐시 적중/라우터가 답변까지 만든 경우는 바로 종료
     def _route_selector(state: GraphState):
-        return _router_decision_fn(state)
+        if state.get("response"):
+            return "done"
+        return state.get("route") or "chat"
 
     workflow.add_conditional_edges(
         "router",
@@ -133,6 +304,7 @@ def build_graph():
             "chat": "chat",
             "subject_info": "subject_info",
             "rag_review": "rag_review",
+            "done": END,
         },
     )
 
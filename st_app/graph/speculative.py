@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from st_app.rag.filters import parse_review_filters
+from st_app.rag.retriever import aretrieve_review_passages, retrieve_review_passages
+
+# 라우터 LLM과 동시에 리뷰 검색을 미리 실행하는 옵션 (rag_review 턴의 임계 경로에서 임베딩+검색 시간을 뺌)
+#   SPECULATIVE_RETRIEVAL          : 켜면 라우터가 LLM을 부를 때 검색을 함께 시작 (기본 끔)
+#   SPECULATIVE_RETRIEVAL_MIN_PROB : 규칙 분류기의 rag_review 확률이 이 값 이상일 때만 시작 (기본 0.2)
+#                                    아무 규칙도 맞지 않으면 1/3, chat 규칙만 맞으면 0.1 정도라 잡담에는 시작하지 않습니다.
+#   SPECULATIVE_WORKERS            : 동기 실행(invoke)에서 미리 검색을 돌릴 스레드 수 (기본 4)
+DEFAULT_SPECULATIVE_MIN_PROB = 0.2
+DEFAULT_SPECULATIVE_WORKERS = 4
+REVIEW_TOP_K = 5   # rag_review 노드가 컨텍스트로 쓰는 리뷰 수
+
+
+def retrieve_for_review(store, query: str) -> Tuple[List[str], List[Dict]]:
+    """rag_review 노드와 같은 조건(질문에서 뽑은 필터, k)으로 검색합니다. 미리 검색한 결과를 그대로 쓰기 위해 한곳에 둡니다."""
+    return retrieve_review_passages(store, query, k=REVIEW_TOP_K, filters=parse_review_filters(query))
+
+
+async def aretrieve_for_review(store, query: str) -> Tuple[List[str], List[Dict]]:
+    return await aretrieve_review_passages(store, query, k=REVIEW_TOP_K, filters=parse_review_filters(query))
+
+
+def speculative_enabled() -> bool:
+    return (os.getenv("SPECULATIVE_RETRIEVAL") or "false").lower() in ("1", "true", "yes", "on")
+
+
+def speculative_min_prob() -> float:
+    return float(os.getenv("SPECULATIVE_RETRIEVAL_MIN_PROB") or DEFAULT_SPECULATIVE_MIN_PROB)
+
+
+class SpeculationStats:
+    """
+    라우터가 최종적으로 고른 라우트별로 미리 검색한 횟수와 그 결과를 셉니다.
+      rag_review : used(결과 사용), saved_ms(라우터 LLM 뒤에 숨긴 검색 시간), waited_ms(라우터 결정 뒤 더 기다린 시간)
+      그 밖      : wasted(버린 검색 수), wasted_ms(버린 검색에 쓴 시간)
+    chat/subject_info 비율이 높아 wasted가 크면 SPECULATIVE_RETRIEVAL을 끄거나 MIN_PROB를 올립니다.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[str, Dict[str, float]] = {}
+        self.skipped = 0   # 켜져 있지만 MIN_PROB 미만이라 시작하지 않은 LLM 라우팅 수
+
+    def _route(self, route: str) -> Dict[str, float]:
+        return self._routes.setdefault(route, {"speculated": 0, "used": 0, "wasted": 0, "failed": 0,
+                                               "saved_ms": 0.0, "waited_ms": 0.0, "wasted_ms": 0.0})
+
+    def record_used(self, elapsed: float, waited: float) -> None:
+        with self._lock:
+            stats = self._route("rag_review")
+            stats["speculated"] += 1
+            stats["used"] += 1
+            stats["saved_ms"] += max(0.0, elapsed - waited) * 1000
+            stats["waited_ms"] += waited * 1000
+
+    def record_wasted(self, route: str, elapsed: float, failed: bool = False) -> None:
+        with self._lock:
+            stats = self._route(route)
+            stats["speculated"] += 1
+            stats["failed" if failed else "wasted"] += 1
+            stats["wasted_ms"] += elapsed * 1000
+
+    def record_skipped(self) -> None:
+        with self._lock:
+            self.skipped += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            routes = {route: dict(stats) for route, stats in self._routes.items()}
+            skipped = self.skipped
+        speculated = sum(s["speculated"] for s in routes.values())
+        wasted = sum(s["wasted"] + s["failed"] for s in routes.values())
+        return {
+            "speculated": speculated,
+            "skipped": skipped,
+            "waste_rate": (wasted / speculated) if speculated else 0.0,
+            "wasted_ms": sum(s["wasted_ms"] for s in routes.values()),
+            "saved_ms": sum(s["saved_ms"] for s in routes.values()),
+            "by_route": routes,
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._routes.clear()
+            self.skipped = 0
+
+
+SPECULATION_STATS = SpeculationStats()
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = int(os.getenv("SPECULATIVE_WORKERS") or DEFAULT_SPECULATIVE_WORKERS)
+            _executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="speculative")
+        return _executor
+
+
+def _timed(store, query: str) -> Tuple[List[str], List[Dict], float]:
+    started = time.perf_counter()
+    passages, citations = retrieve_for_review(store, query)
+    return passages, citations, time.perf_counter() - started
+
+
+async def _atimed(store, query: str) -> Tuple[List[str], List[Dict], float]:
+    started = time.perf_counter()
+    passages, citations = await aretrieve_for_review(store, query)
+    return passages, citations, time.perf_counter() - started
+
+
+class Prefetch:
+    """
+    진행 중인 미리 검색 하나. 라우터가 라우트를 정하면 settle/asettle로 결과를 state["prefetched"]에 넘기거나 버립니다.
+    동기 실행은 스레드 풀의 Future, 비동기 실행은 asyncio.Task를 씁니다.
+    """
+
+    def __init__(self, query: str, version: Any, job):
+        self.query = query
+        self.version = version
+        self.job = job
+        self.started = time.perf_counter()
+
+    @classmethod
+    def start(cls, store, query: str, version: Any) -> "Prefetch":
+        return cls(query, version, _get_executor().submit(_timed, store, query))
+
+    @classmethod
+    def astart(cls, store, query: str, version: Any) -> "Prefetch":
+        return cls(query, version, asyncio.ensure_future(_atimed(store, query)))
+
+    def _hand_over(self, state: Dict[str, Any], result, decided_at: float) -> None:
+        passages, citations, elapsed = result
+        SPECULATION_STATS.record_used(elapsed, time.perf_counter() - decided_at)
+        state["prefetched"] = {"query": self.query, "version": self.version,
+                               "passages": passages, "citations": citations}
+
+    def _discard(self, route: str) -> None:
+        job = self.job
+        if job.cancel():
+            # 아직 시작하지 않았거나(스레드 풀) 임베딩을 기다리던 중(asyncio)이면 여기서 멈춥니다.
+            SPECULATION_STATS.record_wasted(route, time.perf_counter() - self.started)
+            return
+
+        def _done(finished) -> None:
+            failed = finished.cancelled() or finished.exception() is not None
+            elapsed = time.perf_counter() - self.started if failed else finished.result()[2]
+            SPECULATION_STATS.record_wasted(route, elapsed, failed=failed)
+
+        job.add_done_callback(_done)
+
+    def settle(self, state: Dict[str, Any], route: str) -> None:
+        """라우트가 rag_review면 검색이 끝나길 기다려 넘기고, 아니면 버립니다 (동기)."""
+        if route != "rag_review":
+            self._discard(route)
+            return
+        decided_at = time.perf_counter()
+        try:
+            result = self.job.result()
+        except Exception as e:
+            print(f"미리 검색 실패, rag_review 노드에서 다시 검색합니다: {e}")
+            SPECULATION_STATS.record_wasted(route, time.perf_counter() - self.started, failed=True)
+            return
+        self._hand_over(state, result, decided_at)
+
+    async def asettle(self, state: Dict[str, Any], route: str) -> None:
+        """settle의 비동기 버전."""
+        if route != "rag_review":
+            self._discard(route)
+            return
+        decided_at = time.perf_counter()
+        try:
+            result = await self.job
+        except Exception as e:
+            print(f"미리 검색 실패, rag_review 노드에서 다시 검색합니다: {e}")
+            SPECULATION_STATS.record_wasted(route, time.perf_counter() - self.started, failed=True)
+            return
+        self._hand_over(state, result, decided_at)
+
+
+def take_prefetched(state: Dict[str, Any], query: str, version: Any) -> Optional[Tuple[List[str], List[Dict]]]:
+    """라우터가 미리 검색한 결과가 같은 질문·같은 인덱스 버전이면 (리뷰 본문, 인용)을 꺼냅니다. 한 번 쓰면 비웁니다."""
+    prefetched = state.get("prefetched")
+    state["prefetched"] = None
+    if not prefetched or prefetched.get("query") != query or prefetched.get("version") != version:
+        return None
+    return prefetched["passages"], prefetched["citations"]
+
+
+def speculation_stats() -> Dict[str, Any]:
+    """라우트별 미리 검색 사용/낭비 횟수와 시간(ms)."""
+    return SPECULATION_STATS.snapshot()
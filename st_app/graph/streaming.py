@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import re
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Tuple
+
+from st_app.utils.metrics import LatencyRecorder
+from st_app.utils.state import GraphState
+
+# 답변 토큰을 UI로 흘려보낼 노드. 라우터는 combined 모드의 JSON "answer" 값만 흘려보냅니다.
+STREAM_NODES = ("chat", "subject_info", "rag_review")
+
+# 턴별 지연: ttft(첫 토큰까지), total(최종 상태까지). "ttft.<route>"/"total.<route>"는 라우트별, 캐시 적중은 route=cache
+RESPONSE_LATENCY = LatencyRecorder()
+
+_ANSWER_KEY_RE = re.compile(r'"answer"\s*:\s*"')
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class AnswerFieldExtractor:
+    """
+    라우터 LLM이 조각으로 내보내는 JSON 한 줄에서 "answer" 문자열 값만 디코딩해 돌려줍니다.
+    answer가 null이거나 아직 나오지 않았으면 빈 문자열. 이스케이프(\\n, \\uXXXX 등)가 조각 경계에 걸리면 다음 조각까지 기다립니다.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos: Optional[int] = None   # answer 값에서 아직 디코딩하지 않은 위치
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        if self.done or not chunk:
+            return ""
+        self._buffer += chunk
+        if self._pos is None:
+            match = _ANSWER_KEY_RE.search(self._buffer)
+            if match is None:
+                return ""
+            self._pos = match.end()
+
+        out = []
+        buf, i = self._buffer, self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if ch == '"':
+                self.done = True
+                i += 1
+                break
+            if ch != "\\":
+                out.append(ch)
+                i += 1
+                continue
+            if i + 1 >= len(buf):
+                break
+            code = buf[i + 1]
+            if code == "u":
+                if i + 6 > len(buf):
+                    break
+                try:
+                    out.append(chr(int(buf[i + 2:i + 6], 16)))
+                except ValueError:
+                    pass
+                i += 6
+            else:
+                out.append(_ESCAPES.get(code, code))
+                i += 2
+        self._pos = i
+        return "".join(out)
+
+
+def _chunk_text(chunk: Any) -> str:
+    content = getattr(chunk, "content", "")
+    if isinstance(content, str):
+        return content
+    # 일부 공급자는 [{"type": "text", "text": ...}] 형태로 줍니다.
+    return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+
+
+class _TurnEvents:
+    """graph.stream/astream 이벤트 하나를 UI 이벤트로 바꾸고 첫 토큰 시각을 기록합니다 (stream_turn/astream_turn 공용)."""
+
+    STREAM_MODE = ["messages", "custom", "values"]
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token: Optional[float] = None
+        self.final: Dict[str, Any] = {}
+        self.sent_citations = False
+        self.extractors: Dict[str, AnswerFieldExtractor] = {}   # 라우터 LLM 호출(메시지 id)별
+
+    def handle(self, mode: str, payload: Any) -> Optional[Tuple[str, Any]]:
+        if mode == "messages":
+            chunk, metadata = payload
+            node = (metadata or {}).get("langgraph_node")
+            text = _chunk_text(chunk)
+            if node == "router":
+                text = self.extractors.setdefault(str(getattr(chunk, "id", "")), AnswerFieldExtractor()).feed(text)
+            elif node not in STREAM_NODES:
+                return None
+            if text:
+                if self.first_token is None:
+                    self.first_token = time.perf_counter()
+                return "token", text
+        elif mode == "custom":
+            if isinstance(payload, dict) and "citations" in payload:
+                self.sent_citations = True
+                return "citations", payload["citations"]
+        elif mode == "values":
+            self.final = payload
+        return None
+
+    def finish(self) -> Iterator[Tuple[str, Any]]:
+        final = self.final
+        if self.first_token is None and final.get("response"):
+            self.first_token = time.perf_counter()
+            yield "token", final["response"]
+        if not self.sent_citations and final.get("citations"):
+            yield "citations", final["citations"]
+
+        finished = time.perf_counter()
+        route = "cache" if final.get("cache_hit") else str(final.get("route") or "unknown")
+        ttft = (self.first_token or finished) - self.started
+        for name, seconds in (("ttft", ttft), ("total", finished - self.started)):
+            RESPONSE_LATENCY.record(name, seconds)
+            RESPONSE_LATENCY.record(f"{name}.{route}", seconds)
+        yield "final", final
+
+
+def stream_turn(graph, state: GraphState, config: Optional[Dict] = None) -> Iterator[Tuple[str, Any]]:
+    """
+    그래프를 스트리밍 모드로 실행하며 이벤트를 내보냅니다.
+      ("token", str)       : 답변 조각 (chat/subject_info/rag_review 노드, combined 라우터의 answer)
+      ("citations", list)  : 리뷰 검색·컨텍스트 조립이 끝난 즉시의 인용 목록 (생성 전)
+      ("final", state)     : 최종 상태. 화면의 답변은 이 state["response"]로 확정합니다.
+    캐시 적중이나 안내 문구처럼 LLM 없이 만든 응답은 마지막에 토큰 하나로 내보냅니다.
+    첫 토큰까지의 시간과 전체 시간을 RESPONSE_LATENCY에 따로 기록합니다.
+    """
+    events = _TurnEvents()
+    for mode, payload in graph.stream(state, config=config, stream_mode=events.STREAM_MODE):
+        event = events.handle(mode, payload)
+        if event is not None:
+            yield event
+    yield from events.finish()
+
+
+async def astream_turn(graph, state: GraphState, config: Optional[Dict] = None) -> AsyncIterator[Tuple[str, Any]]:
+    """stream_turn의 비동기 버전(graph.astream). 한 이벤트 루프에서 여러 대화를 동시에 스트리밍할 때 씁니다."""
+    events = _TurnEvents()
+    async for mode, payload in graph.astream(state, config=config, stream_mode=events.STREAM_MODE):
+        event = events.handle(mode, payload)
+        if event is not None:
+            yield event
+    for event in events.finish():
+        yield event
+
+
+def response_latency_metrics() -> Dict[str, Dict[str, float]]:
+    """턴별 첫 토큰 지연(ttft)과 전체 지연(total), 라우트별 분해."""
+    return RESPONSE_LATENCY.snapshot()
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import unicodedata
+from collections import deque
+from typing import Dict, List, Optional, Set, Tuple
+
+SUBJECT_DB_PATH = os.path.join("st_app", "db", "subject_information", "subjects.json")
+
+
+def normalize_subject_text(text: str) -> str:
+    """매칭용 정규화: NFC + 소문자 + 공백 제거 ("명동 교자" == "명동교자")."""
+    return "".join(unicodedata.normalize("NFC", str(text or "")).lower().split())
+
+
+class AhoCorasick:
+    """
+    여러 패턴을 한 번에 찾는 Aho-Corasick 오토마톤. 입력 길이에 비례하는 시간으로
+    모든 패턴의 등장 위치를 찾습니다(패턴 수와 무관). 패턴마다 값(대상 이름 집합)을 붙입니다.
+    """
+
+    def __init__(self, patterns: Dict[str, Set[str]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._values: List[Optional[Tuple[int, Set[str]]]] = [None]   # (패턴 길이, 값)
+        self._out: List[int] = [0]   # 자신 또는 접미사 중 패턴이 끝나는 가장 가까운 노드 (0이면 없음)
+        for pattern, values in patterns.items():
+            if pattern:
+                self._add(pattern, values)
+        self._link()
+
+    def _add(self, pattern: str, values: Set[str]) -> None:
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._values.append(None)
+                self._out.append(0)
+                self._goto[node][ch] = nxt
+            node = nxt
+        self._values[node] = (len(pattern), set(values))
+
+    def _link(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            fail = self._fail[node]
+            self._out[node] = node if self._values[node] is not None else self._out[fail]
+            for ch, child in self._goto[node].items():
+                f = fail
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                queue.append(child)
+
+    def find_all(self, text: str) -> List[Tuple[int, int, Set[str]]]:
+        """(시작, 끝, 값) 목록. 위치는 text 기준입니다."""
+        matches: List[Tuple[int, int, Set[str]]] = []
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            out = self._out[node]
+            while out:
+                length, values = self._values[out]  # type: ignore[misc]
+                matches.append((i + 1 - length, i + 1, values))
+                out = self._out[self._fail[out]]
+        return matches
+
+
+class SubjectSnapshot:
+    """subjects.json 한 버전: 대상 정보와, 이름/공백 제거 이름/별칭(JSON의 "aliases")으로 만든 매처."""
+
+    def __init__(self, data: Dict[str, Dict], mtime_ns: int = 0):
+        self.data = data
+        self.names: List[str] = list(data.keys())
+        self.mtime_ns = mtime_ns
+        patterns: Dict[str, Set[str]] = {}
+        for name, info in data.items():
+            aliases = info.get("aliases") if isinstance(info, dict) else None
+            for surface in [name] + [str(a) for a in (aliases or [])]:
+                key = normalize_subject_text(surface)
+                if key:
+                    patterns.setdefault(key, set()).add(name)
+        self.canonical: Dict[str, Set[str]] = patterns
+        self.matcher = AhoCorasick(patterns)
+
+    def resolve(self, text: str) -> Optional[str]:
+        """
+        text에 등장하는 대상 중 가장 긴 표기로 찾은 대상 하나. 여러 대상에 걸친 별칭만 맞으면 None.
+        예: "명동 교자 칼국수 어때?" → "명동교자"
+        """
+        best: Optional[Tuple[int, str]] = None
+        for start, end, values in self.matcher.find_all(normalize_subject_text(text)):
+            if len(values) != 1:
+                continue
+            if best is None or end - start > best[0]:
+                best = (end - start, next(iter(values)))
+        return best[1] if best else None
+
+    def canonical_name(self, subject: Optional[str]) -> Optional[str]:
+        """LLM이 돌려준 대상 이름("명동교자 본점" 등)을 등록된 이름으로 바꿉니다. 모르는 이름이면 None."""
+        if not subject:
+            return None
+        exact = self.canonical.get(normalize_subject_text(subject))
+        if exact and len(exact) == 1:
+            return next(iter(exact))
+        return self.resolve(subject)
+
+
+class SubjectRegistry:
+    """
+    subjects.json을 한 번 읽어 프로세스 전체가 공유합니다. 호출 때마다 mtime만 확인하고,
+    파일이 바뀌었으면 새 스냅샷을 만들어 참조 하나만 교체합니다(읽는 쪽은 잠금 없이 이전/새 스냅샷 중 하나를 봄).
+    """
+
+    def __init__(self, path: str = SUBJECT_DB_PATH):
+        self.path = path
+        self._snapshot = SubjectSnapshot({}, mtime_ns=-1)
+        self._lock = threading.Lock()
+
+    def _mtime_ns(self) -> int:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def snapshot(self) -> SubjectSnapshot:
+        mtime = self._mtime_ns()
+        if mtime != self._snapshot.mtime_ns:
+            with self._lock:
+                if mtime != self._snapshot.mtime_ns:
+                    self._snapshot = SubjectSnapshot(self._read(), mtime)
+        return self._snapshot
+
+    def _read(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"'{self.path}'를 읽지 못했습니다: {e}")
+            return dict(self._snapshot.data)   # 저장 중인 파일 등 — 이전 내용을 유지
+        return data if isinstance(data, dict) else {}
+
+    def names(self) -> List[str]:
+        return self.snapshot().names
+
+    def info(self, name: Optional[str]) -> Dict:
+        return self.snapshot().data.get(name or "", {}) if name else {}
+
+    def resolve(self, text: str) -> Optional[str]:
+        return self.snapshot().resolve(text)
+
+    def canonical_name(self, subject: Optional[str]) -> Optional[str]:
+        return self.snapshot().canonical_name(subject)
+
+
+_registry: Optional[SubjectRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_subject_registry() -> SubjectRegistry:
+    """프로세스 공용 대상 레지스트리 (st_app/db/subject_information/subjects.json)."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = SubjectRegistry()
+        return _registry
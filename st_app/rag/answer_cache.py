@@ -0,0 +1,293 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from st_app.rag.filters import parse_review_filters
+
+# 질문 임베딩 기준 시맨틱 답변 캐시 (rag_review / subject_info 응답)
+#   ANSWER_CACHE_SIZE      : 최대 항목 수 (0이면 끔)
+#   ANSWER_CACHE_THRESHOLD : 같은 질문으로 볼 코사인 유사도 하한 (지정하면 제공자별 기본값 대신 모든 인덱스에 적용)
+#   ANSWER_CACHE_TTL       : 항목 유지 시간(초)
+DEFAULT_ANSWER_CACHE_SIZE = 512
+DEFAULT_ANSWER_CACHE_THRESHOLD = 0.92
+DEFAULT_ANSWER_CACHE_TTL = 60 * 60
+CACHEABLE_ROUTES = ("rag_review", "subject_info")
+# 인덱스의 임베딩 제공자(meta.json의 embedding_provider)별 기본 임계값. 기록이 없는 예전 인덱스는 upstage.
+# 로컬 해시 임베딩(문자 n-gram)은 글자가 겹치면 뜻이 반대여도 가깝게 나오므로("친절"/"불친절" 질문이 0.93)
+# 거의 같은 문장만 같은 질문으로 봅니다.
+ANSWER_CACHE_THRESHOLDS = {"upstage": DEFAULT_ANSWER_CACHE_THRESHOLD, "local": 0.97}
+
+Namespace = Tuple[str, str, str, str]   # (route, subject, filters, terms)
+
+
+def answer_cache_threshold(store) -> float:
+    """store를 만든 임베딩 제공자에 맞는 임계값. ANSWER_CACHE_THRESHOLD가 있으면 그 값."""
+    if os.getenv("ANSWER_CACHE_THRESHOLD"):
+        return float(os.environ["ANSWER_CACHE_THRESHOLD"])
+    provider = (getattr(store, "meta", None) or {}).get("embedding_provider") or "upstage"
+    return ANSWER_CACHE_THRESHOLDS.get(provider, DEFAULT_ANSWER_CACHE_THRESHOLD)
+
+
+def cache_filter_key(query: str) -> str:
+    """
+    질문에서 뽑은 리뷰 필터(출처/별점/기간)를 정규화한 문자열. 필터가 없으면 빈 문자열.
+    "카카오맵 1점 리뷰"와 "카카오맵 5점 리뷰"처럼 임베딩은 가깝지만 조건이 다른 질문이 서로의 답을 받지 않게 키에 넣습니다.
+    """
+    flt = dict(parse_review_filters(query))
+    if not flt:
+        return ""
+    if flt.get("sources"):
+        flt["sources"] = sorted(flt["sources"])
+    return json.dumps(flt, sort_keys=True, ensure_ascii=False)
+
+
+def cache_terms_key(store, query: str) -> str:
+    """
+    질문의 내용어(인덱스 BM25 어휘에 있는 단어)를 정렬해 이은 문자열. BM25 색인이 없으면 빈 문자열.
+    "친절하다는 리뷰"와 "불친절하다는 리뷰"처럼 임베딩은 가깝지만 묻는 내용이 다른 질문을 다른 네임스페이스로 나눕니다.
+    """
+    bm25 = getattr(store, "bm25", None)
+    if bm25 is None:
+        return ""
+    return " ".join(sorted(bm25.tokenize_query(query or "")))
+
+
+class SemanticAnswerCache:
+    """
+    (라우트, 대상, 리뷰 필터, 내용어)별로 질문 벡터와 응답/인용을 보관하고, 새 질문 벡터와 코사인 유사도가
+    threshold 이상인 가장 가까운 항목을 돌려줍니다. 항목 수가 적어 네임스페이스별 행렬 곱 한 번으로 찾습니다.
+    항목은 ttl_seconds가 지나면 만료되고, 인덱스 버전(version)이 바뀌면 전부 비웁니다.
+    적중 시 절약한 시간 = 원래 응답에 걸린 시간 − 조회 시간 으로 누적합니다.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_ANSWER_CACHE_SIZE,
+                 threshold: float = DEFAULT_ANSWER_CACHE_THRESHOLD,
+                 ttl_seconds: float = DEFAULT_ANSWER_CACHE_TTL):
+        self.max_entries = max(1, int(max_entries))
+        self.threshold = float(threshold)
+        self.ttl_seconds = float(ttl_seconds)
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._matrices: Dict[Namespace, Tuple[List[int], np.ndarray]] = {}
+        self._version: Any = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def _unit(vector: Sequence[float]) -> np.ndarray:
+        vec = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm > 0 else vec
+
+    def _check_version(self, version: Any) -> None:
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._matrices.clear()
+            self._version = version
+
+    def _matrix(self, namespace: Namespace) -> Tuple[List[int], np.ndarray]:
+        cached = self._matrices.get(namespace)
+        if cached is None:
+            ids = [i for i, e in self._entries.items() if e["namespace"] == namespace]
+            vectors = np.stack([self._entries[i]["vector"] for i in ids]) if ids else np.zeros((0, 0), np.float32)
+            cached = self._matrices[namespace] = (ids, vectors)
+        return cached
+
+    def _drop(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        self._matrices.pop(entry["namespace"], None)
+
+    def lookup(self, vector: Sequence[float], subject: Optional[str], routes: Sequence[str] = CACHEABLE_ROUTES,
+               version: Any = None, filters: str = "", terms: str = "",
+               threshold: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        routes 중 (라우트, subject, filters, terms) 항목에서 가장 가까운 것을 찾습니다.
+        filters는 cache_filter_key(질문), terms는 cache_terms_key(store, 질문), threshold는 answer_cache_threshold(store)
+        (None이면 self.threshold). 적중하면 {"route", "subject", "response", "citations", "similarity", "saved_ms"}, 아니면 None.
+        """
+        started = time.perf_counter()
+        threshold = self.threshold if threshold is None else float(threshold)
+        query = self._unit(vector)
+        now = time.monotonic()
+        with self._lock:
+            self._check_version(version)
+            best: Optional[Tuple[float, int]] = None
+            for route in routes:
+                ids, vectors = self._matrix((route, subject or "", filters, terms))
+                if not ids or vectors.shape[1] != len(query):
+                    continue
+                sims = vectors @ query
+                for j in np.argsort(-sims):
+                    if sims[j] < threshold:
+                        break
+                    entry = self._entries[ids[j]]
+                    if entry["expires_at"] < now:
+                        continue
+                    if best is None or sims[j] > best[0]:
+                        best = (float(sims[j]), ids[j])
+                    break
+            # 만료 항목은 조회 때 정리
+            stale = [i for i, e in self._entries.items() if e["expires_at"] < now]
+            for i in stale:
+                self._drop(i)
+            self.expired += len(stale)
+            if best is None:
+                self.misses += 1
+                return None
+            entry = self._entries[best[1]]
+            self._entries.move_to_end(best[1])
+            saved = max(0.0, entry["elapsed"] - (time.perf_counter() - started))
+            self.hits += 1
+            self.saved_seconds += saved
+            route, subject = entry["namespace"][:2]
+            return {
+                "route": route,
+                "subject": subject or None,
+                "response": entry["response"],
+                "citations": [dict(c) for c in entry["citations"]],
+                "similarity": best[0],
+                "saved_ms": saved * 1000,
+            }
+
+    def store(self, vector: Sequence[float], route: str, subject: Optional[str], response: str,
+              citations: Sequence[Dict[str, Any]], elapsed: float, version: Any = None, filters: str = "",
+              terms: str = "") -> None:
+        """elapsed는 캐시 없이 이 응답을 만드는 데 걸린 시간(초, 라우팅 포함)."""
+        if route not in CACHEABLE_ROUTES or not response:
+            return
+        with self._lock:
+            self._check_version(version)
+            namespace = (route, subject or "", filters, terms)
+            self._entries[self._next_id] = {
+                "namespace": namespace,
+                "vector": self._unit(vector),
+                "response": response,
+                "citations": [dict(c) for c in citations],
+                "elapsed": float(elapsed),
+                "expires_at": time.monotonic() + self.ttl_seconds,
+            }
+            self._next_id += 1
+            self._matrices.pop(namespace, None)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "saved_ms": self.saved_seconds * 1000,
+                "avg_saved_ms": (self.saved_seconds * 1000 / self.hits) if self.hits else 0.0,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._matrices.clear()
+
+
+_cache: Optional[SemanticAnswerCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> Optional[SemanticAnswerCache]:
+    """환경변수 설정으로 만든 프로세스 공용 답변 캐시. ANSWER_CACHE_SIZE=0이면 None."""
+    global _cache
+    size = int(os.getenv("ANSWER_CACHE_SIZE") or DEFAULT_ANSWER_CACHE_SIZE)
+    if size <= 0:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = SemanticAnswerCache(
+                max_entries=size,
+                threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD") or DEFAULT_ANSWER_CACHE_THRESHOLD),
+                ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL") or DEFAULT_ANSWER_CACHE_TTL),
+            )
+        return _cache
+
+
+def embed_for_cache(store, query: str) -> Optional[List[float]]:
+    """
+    인덱스와 같은 쿼리 임베더로 질문을 임베딩합니다(쿼리 캐시를 거치므로 이후 검색에서 다시 호출되지 않음).
+    스토어가 없거나 임베딩에 실패하면 None — 캐시 없이 진행합니다.
+    """
+    emb = getattr(store, "embedding_function", None)
+    if emb is None or not (query or "").strip():
+        return None
+    try:
+        return emb.embed_query(query) if hasattr(emb, "embed_query") else emb(query)
+    except Exception as e:
+        print(f"답변 캐시용 질문 임베딩 실패: {e}")
+        return None
+
+
+async def aembed_for_cache(store, query: str) -> Optional[List[float]]:
+    """embed_for_cache의 비동기 버전."""
+    emb = getattr(store, "embedding_function", None)
+    if emb is None or not (query or "").strip():
+        return None
+    try:
+        if hasattr(emb, "aembed_query"):
+            return await emb.aembed_query(query)
+        return await asyncio.to_thread(embed_for_cache, store, query)
+    except Exception as e:
+        print(f"답변 캐시용 질문 임베딩 실패: {e}")
+        return None
+
+
+def answer_cache_stats() -> Dict[str, float]:
+    """답변 캐시 적중률과 절약한 지연(ms). 캐시를 끄면 빈 dict."""
+    cache = get_answer_cache()
+    return cache.stats() if cache is not None else {}
+
+
+def remember_answer(store, version: Any, state: Dict[str, Any]) -> None:
+    """노드가 만든 응답(state의 route/subject/response/citations)을 캐시에 넣습니다. 캐시 적중으로 만든 응답은 넣지 않습니다."""
+    cache = get_answer_cache()
+    if cache is None or state.get("cache_hit"):
+        return
+    vector = embed_for_cache(store, state.get("user_input", ""))
+    if vector is not None:
+        _store_answer(cache, store, vector, version, state)
+
+
+async def aremember_answer(store, version: Any, state: Dict[str, Any]) -> None:
+    """remember_answer의 비동기 버전."""
+    cache = get_answer_cache()
+    if cache is None or state.get("cache_hit"):
+        return
+    vector = await aembed_for_cache(store, state.get("user_input", ""))
+    if vector is not None:
+        _store_answer(cache, store, vector, version, state)
+
+
+def _store_answer(cache: SemanticAnswerCache, store, vector: Sequence[float], version: Any,
+                  state: Dict[str, Any]) -> None:
+    started = state.get("started_at")
+    elapsed = (time.perf_counter() - started) if started else 0.0
+    cache.store(vector, state.get("route", ""), state.get("subject"), state.get("response", ""),
+                state.get("citations") or [], elapsed, version,
+                filters=cache_filter_key(state.get("user_input", "")),
+                terms=cache_terms_key(store, state.get("user_input", "")))
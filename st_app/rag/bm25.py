@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import os
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from st_app.rag.embed_cache import normalize_text
+
+BM25_FILE = "bm25.npz"
+DEFAULT_K1 = 1.5
+DEFAULT_B = 0.75
+MAX_QUERY_TERM_LENGTH = 10
+
+_SPLIT_RE = re.compile(r"[\s\W_]+", re.UNICODE)
+
+
+class BM25Index:
+    """
+    리뷰 명사 토큰(Okt, CSV tokens 컬럼) 위의 BM25 역색인. 문서 번호는 FAISS 인덱스 위치와 같습니다.
+    포스팅마다 BM25 가중치를 미리 계산해 두므로, 검색은 질의어 포스팅을 더하기만 하면 됩니다.
+    """
+
+    def __init__(self, terms: Sequence[str], term_offsets: np.ndarray, post_docs: np.ndarray,
+                 post_weights: np.ndarray, n_docs: int):
+        self.terms = list(terms)
+        self.term_ids: Dict[str, int] = {t: i for i, t in enumerate(self.terms)}
+        self.term_offsets = term_offsets
+        self.post_docs = post_docs
+        self.post_weights = post_weights
+        self.n_docs = int(n_docs)
+        self.max_term_length = min(MAX_QUERY_TERM_LENGTH, max((len(t) for t in self.terms), default=1))
+
+    @classmethod
+    def build(cls, token_lists: Sequence[Sequence[str]], k1: float = DEFAULT_K1, b: float = DEFAULT_B) -> "BM25Index":
+        n_docs = len(token_lists)
+        vocab: Dict[str, int] = {}
+        rows, cols, tfs = [], [], []
+        lengths = np.zeros(n_docs, dtype=np.float32)
+        for doc, tokens in enumerate(token_lists):
+            lengths[doc] = len(tokens)
+            counts: Dict[int, int] = {}
+            for token in tokens:
+                term = vocab.setdefault(token, len(vocab))
+                counts[term] = counts.get(term, 0) + 1
+            for term, tf in counts.items():
+                rows.append(term)
+                cols.append(doc)
+                tfs.append(tf)
+
+        terms = sorted(vocab, key=vocab.get)
+        term_of_post = np.array(rows, dtype=np.int64)
+        order = np.argsort(term_of_post, kind="stable")
+        post_docs = np.array(cols, dtype=np.int32)[order]
+        tf = np.array(tfs, dtype=np.float32)[order]
+        df = np.bincount(term_of_post, minlength=len(terms))
+        term_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(df, out=term_offsets[1:])
+
+        avgdl = float(lengths.mean()) if n_docs and lengths.mean() > 0 else 1.0
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        post_idf = np.repeat(idf, df)
+        norm = k1 * (1 - b + b * lengths[post_docs] / avgdl)
+        post_weights = (post_idf * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+        return cls(terms, term_offsets, post_docs, post_weights, n_docs)
+
+    def save(self, directory: str) -> None:
+        path = os.path.join(directory, BM25_FILE)
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, terms=np.array(self.terms, dtype=str), term_offsets=self.term_offsets,
+                     post_docs=self.post_docs, post_weights=self.post_weights, n_docs=np.int64(self.n_docs))
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["BM25Index"]:
+        path = os.path.join(directory, BM25_FILE)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return cls(data["terms"].tolist(), data["term_offsets"], data["post_docs"],
+                       data["post_weights"], int(data["n_docs"]))
+
+    def tokenize_query(self, query: str) -> List[str]:
+        """
+        질의에서 어휘에 있는 단어를 가장 긴 것부터 찾아냅니다 (질의 시점에는 형태소 분석기를 쓰지 않음).
+        예: "콩국수 맛있어?" → ["콩국수", ...]
+        """
+        found: List[str] = []
+        for chunk in _SPLIT_RE.split(normalize_text(query).lower()):
+            i = 0
+            while i < len(chunk):
+                for length in range(min(self.max_term_length, len(chunk) - i), 0, -1):
+                    term = chunk[i:i + length]
+                    if term in self.term_ids:
+                        if term not in found:
+                            found.append(term)
+                        i += length
+                        break
+                else:
+                    i += 1
+        return found
+
+    def search(self, query: str, k: int, allowed: Optional[np.ndarray] = None,
+               excluded: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        BM25 상위 k개 (문서 위치, 점수). 점수가 0인 문서는 포함하지 않습니다.
+        allowed가 주어지면 그 위치 안에서만, excluded 위치는 빼고 순위를 매깁니다.
+        """
+        term_ids = [self.term_ids[t] for t in self.tokenize_query(query)]
+        if not term_ids or self.n_docs == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        spans = [slice(self.term_offsets[t], self.term_offsets[t + 1]) for t in term_ids]
+        docs = np.concatenate([self.post_docs[s] for s in spans])
+        weights = np.concatenate([self.post_weights[s] for s in spans])
+        scores = np.bincount(docs, weights=weights, minlength=self.n_docs)
+        if excluded is not None and len(excluded):
+            scores[excluded] = 0.0
+        if allowed is not None:
+            candidates = allowed[scores[allowed] > 0]
+        else:
+            candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        order = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return order, scores[order].astype(np.float32)
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import os
+import shutil
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_CHECKPOINT_DIR = os.path.join("st_app", "db", ".build_checkpoint")
+DEFAULT_CHUNK_SIZE = 512
+
+
+class BuildCheckpoint:
+    """
+    인덱스 빌드 중 청크 단위로 임베딩 결과를 디스크에 저장합니다.
+    청크 파일에는 문서 ID 목록이 함께 기록되어, 재개 시 ID가 일치하는 청크만 재사용합니다.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CHECKPOINT_DIR, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.directory = directory
+        self.chunk_size = max(1, int(chunk_size))
+
+    def _path(self, chunk_no: int) -> str:
+        return os.path.join(self.directory, f"chunk_{chunk_no:05d}.npz")
+
+    def load(self, chunk_no: int, ids: Sequence[str]) -> Optional[List[List[float]]]:
+        path = self._path(chunk_no)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if list(data["ids"]) != list(ids):
+                    return None
+                return data["vectors"].tolist()
+        except Exception as e:
+            print(f"체크포인트 '{path}'를 읽지 못해 다시 임베딩합니다: {e}")
+            return None
+
+    def save(self, chunk_no: int, ids: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(chunk_no)
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, ids=np.asarray(list(ids), dtype=str), vectors=np.asarray(vectors, dtype=np.float32))
+        # 쓰기 도중 중단되어도 반쯤 쓰인 파일이 남지 않도록 교체는 원자적으로 수행
+        os.replace(tmp_path, path)
+
+    def completed_chunks(self) -> int:
+        if not os.path.isdir(self.directory):
+            return 0
+        return sum(1 for name in os.listdir(self.directory) if name.startswith("chunk_") and name.endswith(".npz")
+                   and not name.endswith(".tmp.npz"))
+
+    def clear(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import math
+import os
+import re
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from st_app.rag.dedup import _shingles
+from st_app.utils.metrics import ValueRecorder
+
+# RAG 프롬프트용 컨텍스트 조립 설정
+#   CONTEXT_TOKEN_BUDGET     : 리뷰 컨텍스트에 쓸 최대 토큰 수(추정치)
+#   CONTEXT_SENTENCE_OVERLAP : 이미 넣은 문장에 이 비율 이상 포함되는 문장은 중복으로 보고 뺌
+DEFAULT_CONTEXT_TOKEN_BUDGET = 512
+DEFAULT_SENTENCE_OVERLAP = 0.8
+MIN_SENTENCE_CHARS = 2
+
+# 요청별 토큰 수: context_raw(조립 전), context(조립 후), prompt(프롬프트 전체 추정), prompt_actual(API 응답 usage)
+PROMPT_TOKENS = ValueRecorder()
+
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?~…])\s+|\n+")
+_MORE_RE = re.compile(r"\s*(?:\.{2,}|…)\s*더보기\s*$")   # 수집 시 잘린 리뷰 끝의 "... 더보기"
+_HANGUL_RE = re.compile(r"[ㄱ-ㆎ가-힣]")
+_WORD_RE = re.compile(r"[A-Za-z]+|\d+")
+_SYMBOL_RE = re.compile(r"[^\sA-Za-z\dㄱ-ㆎ가-힣]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    토크나이저 없이 토큰 수를 보수적으로 추정합니다.
+    한글 음절 1개 = 1토큰, 영문/숫자는 4글자당 1토큰, 그 밖의 기호는 1개 = 1토큰.
+    Solar/GPT 계열 토크나이저의 실제 값보다 약간 크게 나오므로 예산을 넘기지 않습니다.
+    """
+    if not text:
+        return 0
+    words = sum(math.ceil(len(w) / 4) for w in _WORD_RE.findall(text))
+    return len(_HANGUL_RE.findall(text)) + words + len(_SYMBOL_RE.findall(text))
+
+
+def split_sentences(text: str) -> List[str]:
+    text = _MORE_RE.sub("", text or "")
+    return [s.strip() for s in _SENTENCE_SPLIT_RE.split(text) if s and s.strip()]
+
+
+def context_token_budget() -> int:
+    return int(os.getenv("CONTEXT_TOKEN_BUDGET") or DEFAULT_CONTEXT_TOKEN_BUDGET)
+
+
+def pack_context(passages: Sequence[str], citations: Sequence[Dict], budget: Optional[int] = None,
+                 overlap: Optional[float] = None) -> Tuple[str, List[Dict], Dict[str, int]]:
+    """
+    검색 순위대로 정렬된 리뷰(passages, citations는 같은 순서)를 토큰 예산 안의 컨텍스트로 조립합니다.
+      1) 리뷰를 문장으로 나누고, 이미 넣은 문장들에 overlap 이상 포함되는(문자 3-gram 기준) 문장은 뺍니다.
+         서로 다른 리뷰가 같은 말을 반복하는 경우("줄이 길어요" 등)를 한 번만 남깁니다.
+      2) 순위가 높은 리뷰부터 문장 단위로 예산이 남는 만큼 채웁니다. 넘치는 문장은 건너뛰고 다음 문장을 봅니다.
+      3) 문장이 하나도 들어가지 못한 리뷰는 인용에서도 뺍니다.
+    반환: (컨텍스트, 남은 인용, {"context_raw", "context", "sentences", "dropped_redundant", "dropped_budget"})
+    """
+    budget = context_token_budget() if budget is None else int(budget)
+    overlap = float(os.getenv("CONTEXT_SENTENCE_OVERLAP") or DEFAULT_SENTENCE_OVERLAP) if overlap is None else overlap
+    seen: Set[int] = set()
+    used = 0
+    blocks: List[str] = []
+    kept: List[Dict] = []
+    stats = {"context_raw": estimate_tokens("\n\n".join(passages)), "context": 0, "sentences": 0,
+             "dropped_redundant": 0, "dropped_budget": 0}
+
+    for passage, citation in zip(passages, citations):
+        sentences: List[str] = []
+        for sentence in split_sentences(passage):
+            grams = set(_shingles(sentence).tolist())
+            if len(sentence) < MIN_SENTENCE_CHARS or (grams and len(grams & seen) / len(grams) >= overlap):
+                stats["dropped_redundant"] += 1
+                continue
+            # 블록 구분("\n\n")과 문장 사이 공백 몫으로 1토큰을 더 잡습니다.
+            cost = estimate_tokens(sentence) + 1
+            if used + cost > budget:
+                stats["dropped_budget"] += 1
+                continue
+            used += cost
+            seen |= grams
+            sentences.append(sentence)
+        if sentences:
+            blocks.append(" ".join(sentences))
+            kept.append(citation)
+            stats["sentences"] += len(sentences)
+
+    context = "\n\n".join(blocks)
+    stats["context"] = estimate_tokens(context)
+    return context, kept, stats
+
+
+def record_prompt_tokens(stats: Dict[str, int], prompt_text: str, response=None) -> int:
+    """요청 하나의 토큰 수를 PROMPT_TOKENS에 기록하고 프롬프트 추정 토큰 수를 돌려줍니다."""
+    prompt_tokens = estimate_tokens(prompt_text)
+    PROMPT_TOKENS.record("context_raw", stats.get("context_raw", 0))
+    PROMPT_TOKENS.record("context", stats.get("context", 0))
+    PROMPT_TOKENS.record("prompt", prompt_tokens)
+    usage = getattr(response, "usage_metadata", None) or {}
+    if usage.get("input_tokens"):
+        PROMPT_TOKENS.record("prompt_actual", usage["input_tokens"])
+    return prompt_tokens
+
+
+def prompt_token_metrics() -> Dict[str, Dict[str, float]]:
+    """요청별 토큰 수 통계(context_raw/context/prompt/prompt_actual)."""
+    return PROMPT_TOKENS.snapshot()
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from st_app.rag.embed_cache import normalize_text
+
+DEFAULT_THRESHOLD = 0.8     # 이 값 이상의 자카드 유사도(문자 3-gram)를 중복으로 간주
+DEFAULT_NUM_PERM = 128      # MinHash 해시 함수 수
+DEFAULT_BANDS = 32          # LSH 밴드 수 (밴드당 4행 → 유사도 0.8 쌍을 99% 이상 후보로 잡음)
+SHINGLE_SIZE = 3
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_STRIP_RE = re.compile(r"[\s\W_]+", re.UNICODE)
+
+
+def _shingles(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    # 공백/문장부호 차이는 무시하고 문자 n-gram으로 비교
+    compact = _STRIP_RE.sub("", normalize_text(text).lower())
+    if len(compact) <= size:
+        grams = {compact}
+    else:
+        grams = {compact[i:i + size] for i in range(len(compact) - size + 1)}
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        # a·x + b (mod 2^61-1) 형태의 유니버설 해시. x < 2^32, a,b < 2^29 이므로 uint64에서 넘치지 않음
+        self.a = rng.integers(1, 1 << 29, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 29, size=num_perm, dtype=np.uint64)
+
+    def signature(self, shingles: np.ndarray) -> np.ndarray:
+        hashed = (np.outer(self.a, shingles) + self.b[:, None]) % _MERSENNE_PRIME & _MAX_HASH
+        return hashed.min(axis=1).astype(np.uint32)
+
+
+def _find(parent: List[int], i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def near_duplicate_clusters(texts: Sequence[str], threshold: float = DEFAULT_THRESHOLD,
+                            num_perm: int = DEFAULT_NUM_PERM, bands: int = DEFAULT_BANDS) -> List[List[int]]:
+    """
+    MinHash + LSH로 후보 쌍을 고른 뒤 실제 자카드 유사도로 확인해 근접 중복 군집(위치 목록)을 돌려줍니다.
+    중복이 없는 문서도 크기 1인 군집으로 포함됩니다.
+    """
+    if num_perm % bands != 0:
+        raise ValueError(f"num_perm({num_perm})은 bands({bands})로 나누어떨어져야 합니다.")
+    hasher = MinHasher(num_perm)
+    shingle_sets = [_shingles(t) for t in texts]
+    signatures = np.stack([hasher.signature(s) for s in shingle_sets]) if texts else np.zeros((0, num_perm), np.uint32)
+
+    rows = num_perm // bands
+    parent = list(range(len(texts)))
+    checked: Set[Tuple[int, int]] = set()
+    exact: Dict[int, Set[int]] = {}
+    for band in range(bands):
+        buckets: Dict[bytes, List[int]] = defaultdict(list)
+        block = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        for i in range(len(texts)):
+            buckets[block[i].tobytes()].append(i)
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            first = members[0]
+            for other in members[1:]:
+                ra, rb = _find(parent, first), _find(parent, other)
+                if ra == rb or (first, other) in checked:
+                    continue
+                checked.add((first, other))
+                sa = exact.setdefault(first, set(shingle_sets[first].tolist()))
+                sb = exact.setdefault(other, set(shingle_sets[other].tolist()))
+                if len(sa & sb) / max(len(sa | sb), 1) >= threshold:
+                    parent[rb] = ra
+
+    clusters: Dict[int, List[int]] = defaultdict(list)
+    for i in range(len(texts)):
+        clusters[_find(parent, i)].append(i)
+    return sorted(clusters.values(), key=lambda c: c[0])
+
+
+def dedup_documents(documents: Iterable[Document], threshold: float = DEFAULT_THRESHOLD
+                    ) -> Tuple[List[Document], Dict[str, int]]:
+    """
+    출처(diningcode/googlemap/kakaomap)를 가로질러 근접 중복 리뷰를 하나로 합칩니다.
+    군집마다 가장 긴 리뷰를 대표로 남기고, 메타데이터에 합쳐진 출처 목록(sources)과
+    흡수된 리뷰 ID(duplicate_ids)를 기록합니다. 대표 선택은 결정적이므로 증분 갱신 시 ID가 유지됩니다.
+    """
+    docs = list(documents)
+    clusters = near_duplicate_clusters([d.page_content for d in docs], threshold=threshold)
+    kept: List[Document] = []
+    for members in clusters:
+        rep_pos = max(members, key=lambda i: (len(docs[i].page_content), -i))
+        rep = docs[rep_pos]
+        if len(members) > 1:
+            metadata = dict(rep.metadata)
+            metadata["sources"] = sorted({str(docs[i].metadata.get("source", "")) for i in members})
+            metadata["duplicate_ids"] = [str(docs[i].metadata.get("id", "")) for i in members if i != rep_pos]
+            rep = Document(id=rep.id, page_content=rep.page_content, metadata=metadata)
+        kept.append(rep)
+    stats = {
+        "input": len(docs),
+        "kept": len(kept),
+        "collapsed": len(docs) - len(kept),
+        "clusters_with_duplicates": sum(1 for c in clusters if len(c) > 1),
+        "cross_source_clusters": sum(
+            1 for c in clusters if len({docs[i].metadata.get("source") for i in c}) > 1),
+    }
+    return kept, stats
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import os
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+
+# 컬럼형 문서 저장소 파일 (인덱스 디렉터리 안에 저장)
+#   docs_text.bin / docs_text_offsets.npy : 리뷰 본문 UTF-8 힙 + 오프셋(int64, n+1)
+#   docs_id.bin   / docs_id_offsets.npy   : 리뷰 ID 힙 + 오프셋
+#   docs_source.npy    : 출처 코드(uint8) → meta.json의 doc_sources 목록 인덱스
+#   docs_rating.npy    : 별점(float32)
+#   docs_date.npy      : 날짜(int32, YYYYMMDD, 모르면 0)
+#   docs_row_index.npy : 원본 CSV 행 번호(int32)
+#   docs_source_mask.npy : (선택) 근접 중복 병합 시 합쳐진 출처 비트마스크(uint64, 비트 = 출처 코드)
+#   docs_tokens.bin / docs_tokens_offsets.npy : (선택) 명사 토큰(공백 구분) 힙 + 오프셋 → BM25 재구성용
+TEXT_HEAP, TEXT_OFFSETS = "docs_text.bin", "docs_text_offsets.npy"
+ID_HEAP, ID_OFFSETS = "docs_id.bin", "docs_id_offsets.npy"
+SOURCE_FILE, RATING_FILE, DATE_FILE, ROW_FILE = "docs_source.npy", "docs_rating.npy", "docs_date.npy", "docs_row_index.npy"
+SOURCE_MASK_FILE = "docs_source_mask.npy"
+TOKENS_HEAP, TOKENS_OFFSETS = "docs_tokens.bin", "docs_tokens_offsets.npy"
+DOCSTORE_FILES = (TEXT_HEAP, TEXT_OFFSETS, ID_HEAP, ID_OFFSETS, SOURCE_FILE, RATING_FILE, DATE_FILE, ROW_FILE)
+MAX_SOURCES = 64
+
+
+def has_columnar_docstore(index_dir: str) -> bool:
+    return all(os.path.exists(os.path.join(index_dir, name)) for name in DOCSTORE_FILES)
+
+
+def dates_to_int(values: Sequence[Any]) -> np.ndarray:
+    """날짜 문자열 목록을 YYYYMMDD 정수 배열로 변환합니다. 해석할 수 없는 값("1달 전" 등)은 0."""
+    parsed = pd.to_datetime(pd.Series(list(values), dtype=object), errors="coerce", utc=True, format="mixed")
+    out = (parsed.dt.year * 10000 + parsed.dt.month * 100 + parsed.dt.day).fillna(0)
+    return out.to_numpy(dtype=np.int32)
+
+
+def _save_array(directory: str, name: str, array: np.ndarray) -> None:
+    # 다른 프로세스가 기존 파일을 mmap 중일 수 있으므로 덮어쓰지 않고 새 파일로 교체합니다.
+    path = os.path.join(directory, name)
+    with open(path + ".tmp", "wb") as f:
+        np.save(f, array)
+    os.replace(path + ".tmp", path)
+
+
+def _write_heap(directory: str, heap_name: str, offsets_name: str, values: Sequence[str]) -> None:
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    path = os.path.join(directory, heap_name)
+    with open(path + ".tmp", "wb") as f:
+        for b in encoded:
+            f.write(b)
+    os.replace(path + ".tmp", path)
+    _save_array(directory, offsets_name, offsets)
+
+
+def _open_heap(directory: str, heap_name: str) -> np.ndarray:
+    path = os.path.join(directory, heap_name)
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode="r")
+
+
+def write_columnar_docstore(directory: str, documents: Sequence[Document]) -> List[str]:
+    """
+    인덱스 위치 순서대로 정렬된 documents를 컬럼형 파일로 기록하고, 출처 목록(코드 → 이름)을 돌려줍니다.
+    """
+    os.makedirs(directory, exist_ok=True)
+    metas = [doc.metadata or {} for doc in documents]
+    sources: List[str] = sorted({str(m.get("source", "")) for m in metas}
+                                | {str(s) for m in metas for s in m.get("sources", [])})
+    if len(sources) > MAX_SOURCES:
+        raise ValueError(f"출처 종류가 너무 많습니다({len(sources)}개, 최대 {MAX_SOURCES}개).")
+    code_of = {name: code for code, name in enumerate(sources)}
+
+    def _mask(m: Dict[str, Any]) -> int:
+        mask = 1 << code_of[str(m.get("source", ""))]
+        for name in m.get("sources", []):
+            mask |= 1 << code_of[str(name)]
+        return mask
+
+    _write_heap(directory, TEXT_HEAP, TEXT_OFFSETS, [doc.page_content for doc in documents])
+    _write_heap(directory, ID_HEAP, ID_OFFSETS, [str(m.get("id", doc.id or "")) for m, doc in zip(metas, documents)])
+    _save_array(directory, SOURCE_FILE, np.array([code_of[str(m.get("source", ""))] for m in metas], dtype=np.uint8))
+    _save_array(directory, RATING_FILE, np.array([float(m.get("rating") or 0.0) for m in metas], dtype=np.float32))
+    # 구글맵처럼 상대 날짜("1달 전")만 있는 출처는 크롤링 시점으로 추정한 date_est를 사용
+    _save_array(directory, DATE_FILE, dates_to_int([m.get("date_est") or m.get("date") for m in metas]))
+    _save_array(directory, ROW_FILE, np.array([int(m.get("row_index") or 0) for m in metas], dtype=np.int32))
+    _save_array(directory, SOURCE_MASK_FILE, np.array([_mask(m) for m in metas], dtype=np.uint64))
+    _write_heap(directory, TOKENS_HEAP, TOKENS_OFFSETS, [" ".join(m.get("tokens") or []) for m in metas])
+    return sources
+
+
+class ColumnarDocstore(Docstore):
+    """
+    메모리 매핑된 컬럼형 문서 저장소 (읽기 전용).
+    문서는 FAISS 인덱스 위치(str(i))로 조회하며, 조회할 때만 해당 위치의 본문/메타데이터를 디코딩합니다.
+    """
+
+    def __init__(self, directory: str, sources: Sequence[str]):
+        self.directory = directory
+        self.sources = list(sources)
+        self._text = _open_heap(directory, TEXT_HEAP)
+        self._text_offsets = np.load(os.path.join(directory, TEXT_OFFSETS), mmap_mode="r")
+        self._ids = _open_heap(directory, ID_HEAP)
+        self._id_offsets = np.load(os.path.join(directory, ID_OFFSETS), mmap_mode="r")
+        self.source_codes = np.load(os.path.join(directory, SOURCE_FILE), mmap_mode="r")
+        self.ratings = np.load(os.path.join(directory, RATING_FILE), mmap_mode="r")
+        self.dates = np.load(os.path.join(directory, DATE_FILE), mmap_mode="r")
+        self.row_indices = np.load(os.path.join(directory, ROW_FILE), mmap_mode="r")
+        mask_path = os.path.join(directory, SOURCE_MASK_FILE)
+        if os.path.exists(mask_path):
+            self.source_masks = np.load(mask_path, mmap_mode="r")
+        else:
+            self.source_masks = np.left_shift(np.uint64(1), self.source_codes.astype(np.uint64))
+        if os.path.exists(os.path.join(directory, TOKENS_OFFSETS)):
+            self._tokens = _open_heap(directory, TOKENS_HEAP)
+            self._token_offsets = np.load(os.path.join(directory, TOKENS_OFFSETS), mmap_mode="r")
+        else:
+            self._tokens = self._token_offsets = None
+
+    def __len__(self) -> int:
+        return int(self._text_offsets.shape[0]) - 1
+
+    def text(self, pos: int) -> str:
+        return bytes(self._text[self._text_offsets[pos]:self._text_offsets[pos + 1]]).decode("utf-8")
+
+    def doc_id(self, pos: int) -> str:
+        return bytes(self._ids[self._id_offsets[pos]:self._id_offsets[pos + 1]]).decode("utf-8")
+
+    def tokens(self, pos: int) -> List[str]:
+        if self._token_offsets is None:
+            return []
+        return bytes(self._tokens[self._token_offsets[pos]:self._token_offsets[pos + 1]]).decode("utf-8").split()
+
+    def metadata(self, pos: int) -> Dict[str, Any]:
+        date = int(self.dates[pos])
+        meta = {
+            "source": self.sources[int(self.source_codes[pos])],
+            "row_index": int(self.row_indices[pos]),
+            "rating": float(self.ratings[pos]),
+            "date": f"{date // 10000:04d}-{date // 100 % 100:02d}-{date % 100:02d}" if date else "N/A",
+            "id": self.doc_id(pos),
+        }
+        mask = int(self.source_masks[pos])
+        if mask & (mask - 1):  # 출처가 둘 이상 합쳐진 대표 리뷰
+            meta["sources"] = [name for code, name in enumerate(self.sources) if mask >> code & 1]
+        return meta
+
+    def get(self, pos: int) -> Document:
+        doc_id = self.doc_id(pos)
+        return Document(id=doc_id, page_content=self.text(pos), metadata=self.metadata(pos))
+
+    def search(self, search: str) -> Union[str, Document]:
+        try:
+            pos = int(search)
+        except (TypeError, ValueError):
+            return f"ID {search} not found."
+        if not 0 <= pos < len(self):
+            return f"ID {search} not found."
+        return self.get(pos)
+
+    def delete(self, ids: List) -> None:
+        raise NotImplementedError("ColumnarDocstore는 읽기 전용입니다. load_store(..., writable=True)로 불러오세요.")
+
+    def iter_documents(self) -> Iterator[Document]:
+        # 다시 저장할 때 BM25를 재구성할 수 있도록 토큰도 메타데이터에 담아 돌려줍니다.
+        for pos in range(len(self)):
+            doc = self.get(pos)
+            doc.metadata["tokens"] = self.tokens(pos)
+            yield doc
+
+
+class PositionalIds(Mapping):
+    """index_to_docstore_id 대용: FAISS 위치 i → 문서 저장소 키 str(i). 딕셔너리를 만들지 않습니다."""
+
+    def __init__(self, size: int):
+        self._size = size
+
+    def __getitem__(self, i: int) -> str:
+        if not isinstance(i, (int, np.integer)) or not 0 <= i < self._size:
+            raise KeyError(i)
+        return str(int(i))
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self._size))
+
+    def __len__(self) -> int:
+        return self._size
+
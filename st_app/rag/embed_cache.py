@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_CACHE_PATH = os.path.join("st_app", "db", "embedding_cache.sqlite3")
+DEFAULT_MAX_ENTRIES = 200_000
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """캐시 키 계산용 정규화: NFC 유니코드 정규화 + 공백 축약 + 앞뒤 공백 제거."""
+    return _WS_RE.sub(" ", unicodedata.normalize("NFC", str(text))).strip()
+
+
+def cache_key(text: str, model: str) -> bytes:
+    """정규화된 텍스트와 모델 이름으로 만든 콘텐츠 주소(sha256 앞 16바이트)."""
+    h = hashlib.sha256()
+    h.update(model.encode("utf-8"))
+    h.update(b"\0")
+    h.update(normalize_text(text).encode("utf-8"))
+    return h.digest()[:16]
+
+
+class EmbeddingCache:
+    """
+    SQLite 기반 영속 임베딩 캐시.
+    벡터는 float32 바이트 블록으로 저장하며, 항목 수가 max_entries를 넘으면
+    가장 오래 사용되지 않은 항목부터 제거합니다(LRU).
+    항목마다 저장 시각(created_at)을 기록해, 조회 시 max_age(초)를 주면 그보다 오래된 항목은 없는 것으로 봅니다.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max(1, int(max_entries))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key BLOB PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " dim INTEGER NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " created_at REAL NOT NULL DEFAULT 0)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(embeddings)")}
+        if "created_at" not in columns:
+            # 예전 형식의 캐시 파일: 저장 시각을 알 수 없으므로 마지막 사용 시각으로 채웁니다.
+            self._conn.execute("ALTER TABLE embeddings ADD COLUMN created_at REAL NOT NULL DEFAULT 0")
+            self._conn.execute("UPDATE embeddings SET created_at = last_used")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+
+    def get_many(self, texts: Sequence[str], model: str,
+                 max_age: Optional[float] = None) -> List[Optional[np.ndarray]]:
+        """texts 순서대로 캐시된 벡터(없거나 max_age초보다 오래됐으면 None)를 돌려줍니다."""
+        return [entry[0] if entry is not None else None for entry in self.get_entries(texts, model, max_age)]
+
+    def get_entries(self, texts: Sequence[str], model: str,
+                    max_age: Optional[float] = None) -> List[Optional[Tuple[np.ndarray, float]]]:
+        """get_many와 같지만 (벡터, 저장 시각 time.time())을 돌려줍니다."""
+        keys = [cache_key(t, model) for t in texts]
+        found: Dict[bytes, Tuple[np.ndarray, float]] = {}
+        oldest = time.time() - max_age if max_age is not None else None
+        with self._lock:
+            # SQLite 변수 개수 제한(999)을 피하기 위해 나눠서 조회
+            for i in range(0, len(keys), 500):
+                chunk = list(set(keys[i:i + 500]))
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector, created_at FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob, created_at in rows:
+                    if oldest is not None and created_at < oldest:
+                        continue
+                    found[bytes(key)] = (np.frombuffer(blob, dtype=np.float32), float(created_at))
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, k) for k in found],
+                )
+                self._conn.commit()
+            result = [found.get(k) for k in keys]
+            hit_count = sum(v is not None for v in result)
+            self.hits += hit_count
+            self.misses += len(result) - hit_count
+        return result
+
+    def put_many(self, texts: Sequence[str], model: str, vectors: Sequence[Sequence[float]]) -> None:
+        if len(texts) != len(vectors):
+            raise ValueError(f"texts({len(texts)})와 vectors({len(vectors)})의 길이가 다릅니다.")
+        now = time.time()
+        rows = []
+        for text, vec in zip(texts, vectors):
+            arr = np.asarray(vec, dtype=np.float32)
+            rows.append((cache_key(text, model), model, int(arr.shape[0]), arr.tobytes(), now, now))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dim, vector, last_used, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+            self._evict_locked()
+
+    def _evict_locked(self) -> None:
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        overflow = count - self.max_entries
+        if overflow <= 0:
+            return
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN ("
+            " SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+            (overflow,),
+        )
+        self._conn.commit()
+        self.evictions += overflow
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            count, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": count,
+            "vector_bytes": size,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """환경변수 설정에 따라 캐시를 엽니다. EMBED_CACHE_PATH가 비어 있으면("off") 캐시를 쓰지 않습니다."""
+    path = os.getenv("EMBED_CACHE_PATH", DEFAULT_CACHE_PATH)
+    if not path or path.lower() == "off":
+        return None
+    max_entries = int(os.getenv("EMBED_CACHE_MAX_ENTRIES") or DEFAULT_MAX_ENTRIES)
+    return EmbeddingCache(path, max_entries=max_entries)
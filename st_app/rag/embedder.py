@@ -2,131 +2,367 @@ from __future__ import annotations
 
 import os
 import glob
+import hashlib
+import time
+import random
+import itertools
+import argparse
+import re
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-import requests
+import httpx
 import json
 import numpy as np
-from typing import List, Tuple, Optional
+from typing import Dict, Iterable, Iterator, List, Tuple, Optional
 from dotenv import load_dotenv
 
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain.docstore.document import Document
 from langchain_community.docstore import InMemoryDocstore
-import faiss # faiss-cpu 라이브러리 직접 사용
+
+from st_app.rag.http_client import get_async_http_client, get_http_client
+from st_app.rag.embed_cache import EmbeddingCache, cache_key, get_embedding_cache, normalize_text
+from st_app.rag.checkpoint import BuildCheckpoint, DEFAULT_CHECKPOINT_DIR, DEFAULT_CHUNK_SIZE
+from st_app.rag.index_factory import (
+    DEFAULT_INDEX_TYPE, INDEX_TYPES, create_index, default_search_params, supports_remove,
+)
+from st_app.rag.index_io import ReviewStore, load_store, read_meta, save_store
+from st_app.rag.local_embedder import DEFAULT_LOCAL_DIM, LocalHashEmbeddings
+from st_app.rag.dedup import DEFAULT_THRESHOLD as DEFAULT_DEDUP_THRESHOLD, dedup_documents
+
+DEFAULT_EMBED_BATCH_SIZE = 64   # 한 요청에 담을 문서 수 (Upstage는 요청당 최대 100개)
+DEFAULT_EMBED_MAX_WORKERS = 4   # 동시에 보낼 수 있는 요청 수 상한
+DEFAULT_EMBED_MAX_RETRIES = 5   # 일시적 오류(429/5xx/네트워크) 재시도 횟수
+RETRY_BASE_DELAY = 1.0          # 지수 백오프 시작 대기 시간(초)
+RETRY_MAX_DELAY = 30.0
+TRANSIENT_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+# 임베딩 제공자: upstage(원격 API) / local(해시 n-gram, 오프라인)
+EMBEDDING_PROVIDERS = ("upstage", "local")
+DEFAULT_EMBEDDING_PROVIDER = "upstage"
 
 class UpstageEmbeddingsMinimal:
     def __init__(self, api_key: str, base_url: str = "https://api.upstage.ai/v1",
-                 model_query: str = "solar-embedding-1-large-query"):
+                 model_query: str = "solar-embedding-1-large-query",
+                 model_passage: str = "solar-embedding-1-large-passage"):
         self.api_key = api_key
         self.base_url = base_url.rstrip("/")
         self.model_query = model_query
+        self.model_passage = model_passage
 
     def __call__(self, text: str):
         return self.embed_query(text)
 
-    def embed_query(self, text: str):
-        import requests
-        resp = requests.post(
+    # 요청은 프로세스 공용 keep-alive 클라이언트로 보내 TCP/TLS 연결을 재사용합니다.
+    def _post_embeddings(self, payload, timeout: float):
+        resp = get_http_client().post(
             f"{self.base_url}/embeddings",
             headers={"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"},
-            json={"input": text, "model": self.model_query},
-            timeout=30,
+            json=payload,
+            timeout=timeout,
         )
         resp.raise_for_status()
-        return resp.json()["data"][0]["embedding"]
+        return resp.json()["data"]
 
-    # (선택) 문서 임베딩이 필요할 때 사용—지금은 build_index에서 직접 호출하므로 없어도 됨
-    def embed_documents(self, texts: List[str]):
-        import requests
-        resp = requests.post(
+    # 비동기 그래프 실행(ainvoke)용: 공용 AsyncClient로 보내 기다리는 동안 이벤트 루프를 막지 않습니다.
+    async def _apost_embeddings(self, payload, timeout: float):
+        resp = await get_async_http_client().post(
             f"{self.base_url}/embeddings",
             headers={"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"},
-            json={"input": texts, "model": self.model_query},
-            timeout=60,
+            json=payload,
+            timeout=timeout,
         )
         resp.raise_for_status()
-        return [d["embedding"] for d in resp.json()["data"]]
+        return resp.json()["data"]
+
+    def embed_query(self, text: str):
+        return self._post_embeddings({"input": text, "model": self.model_query}, timeout=30)[0]["embedding"]
+
+    async def aembed_query(self, text: str):
+        data = await self._apost_embeddings({"input": text, "model": self.model_query}, timeout=30)
+        return data[0]["embedding"]
+
+    # 여러 질문을 쿼리 모델로 한 요청에 임베딩 (배치 검색용)
+    def embed_queries(self, texts: List[str]):
+        data = self._post_embeddings({"input": texts, "model": self.model_query}, timeout=60)
+        return [d["embedding"] for d in data]
+
+    # 문서(passage) 임베딩: 여러 문서를 한 요청으로 묶어 보냅니다.
+    def embed_documents(self, texts: List[str]):
+        data = self._post_embeddings({"input": texts, "model": self.model_passage}, timeout=60)
+        return [d["embedding"] for d in data]
 
 # 이 함수는 FAISS.load_local 또는 쿼리 임베딩 시 필요하므로 유지합니다.
-def get_embedding_model() -> UpstageEmbeddingsMinimal:
+def get_embedding_model(provider: Optional[str] = None, dim: Optional[int] = None):
+    """
+    provider(미지정 시 EMBEDDING_PROVIDER 환경변수 → upstage)에 맞는 임베딩 객체를 돌려줍니다.
+    두 제공자 모두 embed_query / embed_documents / model_query / model_passage를 갖습니다.
+    local은 API 키가 필요 없으며, 차원은 dim → LOCAL_EMBED_DIM → 기본값 순으로 정합니다.
+    """
     load_dotenv()
+    provider = provider or os.getenv("EMBEDDING_PROVIDER") or DEFAULT_EMBEDDING_PROVIDER
+    if provider not in EMBEDDING_PROVIDERS:
+        raise RuntimeError(f"지원하지 않는 임베딩 제공자입니다: {provider} (선택: {', '.join(EMBEDDING_PROVIDERS)})")
+    if provider == "local":
+        return LocalHashEmbeddings(dim=dim or int(os.getenv("LOCAL_EMBED_DIM") or DEFAULT_LOCAL_DIM))
     api_key = os.getenv("UPSTAGE_API_KEY") or os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise RuntimeError("UPSTAGE_API_KEY 또는 OPENAI_API_KEY 중 하나는 반드시 설정해야 합니다.")
     base_url = os.getenv("UPSTAGE_BASE_URL") or os.getenv("OPENAI_BASE_URL") or "https://api.upstage.ai/v1"
     return UpstageEmbeddingsMinimal(api_key=api_key, base_url=base_url, model_query="solar-embedding-1-large-query")
 
+def embedding_model_for_index(index_dir: str):
+    """
+    인덱스를 만들 때 쓴 제공자(meta.json의 embedding_provider)로 쿼리 임베딩 객체를 만듭니다.
+    예전 인덱스처럼 기록이 없으면 upstage로 간주합니다.
+    """
+    meta = read_meta(index_dir)
+    provider = meta.get("embedding_provider") or DEFAULT_EMBEDDING_PROVIDER
+    configured = os.getenv("EMBEDDING_PROVIDER")
+    if configured and configured != provider:
+        print(f"EMBEDDING_PROVIDER={configured}이지만 인덱스는 '{provider}'로 만들어져 '{provider}'를 사용합니다.")
+    return get_embedding_model(provider, dim=(meta.get("embedding_params") or {}).get("dim"))
+
+def _embedding_meta(embedder) -> Dict[str, object]:
+    if isinstance(embedder, LocalHashEmbeddings):
+        return {
+            "embedding_provider": "local",
+            "embedding_model": embedder.model_query,
+            "embedding_params": {"dim": embedder.dim, "ngram_range": list(embedder.ngram_range)},
+        }
+    return {
+        "embedding_provider": "upstage",
+        "embedding_model": f"{embedder.model_passage}/{embedder.model_query}",
+        "embedding_params": {},
+    }
+
+def _is_transient(exc: Exception) -> bool:
+    if isinstance(exc, httpx.TransportError):  # 연결 실패/타임아웃
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in TRANSIENT_STATUS_CODES
+    return False
+
+def _retry_delay(exc: Exception, attempt: int) -> float:
+    # 서버가 Retry-After를 주면 따르고, 아니면 지터를 섞은 지수 백오프
+    response = getattr(exc, "response", None)
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), RETRY_MAX_DELAY)
+        except ValueError:
+            pass
+    return min(RETRY_BASE_DELAY * (2 ** attempt), RETRY_MAX_DELAY) * random.uniform(0.5, 1.0)
+
+def embed_with_retry(embedder: UpstageEmbeddingsMinimal, texts: List[str],
+                     max_retries: int = DEFAULT_EMBED_MAX_RETRIES) -> List[List[float]]:
+    """embed_documents 호출이 일시적 오류로 실패하면 백오프 후 재시도합니다."""
+    for attempt in range(max_retries + 1):
+        try:
+            return embedder.embed_documents(texts)
+        except Exception as e:
+            if attempt >= max_retries or not _is_transient(e):
+                raise
+            delay = _retry_delay(e, attempt)
+            print(f"임베딩 요청 실패({e}), {delay:.1f}초 후 재시도합니다... ({attempt + 1}/{max_retries})")
+            time.sleep(delay)
+    raise RuntimeError("unreachable")
+
+def embed_documents_batched(embedder: UpstageEmbeddingsMinimal, texts: List[str],
+                            batch_size: int = DEFAULT_EMBED_BATCH_SIZE,
+                            max_workers: int = DEFAULT_EMBED_MAX_WORKERS) -> List[List[float]]:
+    """
+    texts를 batch_size 단위로 묶어 embed_documents로 임베딩합니다.
+    동시에 진행 중인 요청은 max_workers개로 제한되며, 결과는 입력 순서를 유지합니다.
+    """
+    if not texts:
+        return []
+    batch_size = max(1, int(batch_size))
+    max_workers = max(1, int(max_workers))
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+
+    started = time.perf_counter()
+    results: List[Optional[List[List[float]]]] = [None] * len(batches)
+    done_docs = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # executor.map은 입력 순서대로 결과를 돌려주므로 문서-벡터 정렬이 보장됩니다.
+        for i, vectors in enumerate(pool.map(lambda batch: embed_with_retry(embedder, batch), batches)):
+            if len(vectors) != len(batches[i]):
+                raise RuntimeError(f"배치 {i}: 요청 {len(batches[i])}건, 응답 {len(vectors)}건")
+            results[i] = vectors
+            done_docs += len(vectors)
+            if (i + 1) % 10 == 0 or (i + 1) == len(batches):
+                elapsed = time.perf_counter() - started
+                print(f"... {done_docs}/{len(texts)}개 문서 임베딩 완료 ({done_docs / max(elapsed, 1e-9):.1f} docs/sec) ...")
+
+    elapsed = time.perf_counter() - started
+    print(f"임베딩 처리량: {len(texts)}건 / {elapsed:.2f}s = {len(texts) / max(elapsed, 1e-9):.1f} docs/sec "
+          f"(batch_size={batch_size}, max_workers={max_workers}, 요청 {len(batches)}회)")
+    return [vec for batch in results for vec in batch]  # type: ignore[union-attr]
+
+def embed_documents_cached(embedder: UpstageEmbeddingsMinimal, texts: List[str],
+                           cache: Optional[EmbeddingCache],
+                           batch_size: int = DEFAULT_EMBED_BATCH_SIZE,
+                           max_workers: int = DEFAULT_EMBED_MAX_WORKERS) -> List[List[float]]:
+    """
+    캐시에 있는 벡터는 재사용하고, 새로 생겼거나 바뀐 텍스트만 API로 임베딩한 뒤 캐시에 기록합니다.
+    """
+    if cache is None:
+        return embed_documents_batched(embedder, texts, batch_size=batch_size, max_workers=max_workers)
+
+    model = embedder.model_passage
+    cached = cache.get_many(texts, model)
+    # 같은 정규화 텍스트가 여러 번 나오면 한 번만 요청합니다.
+    missing: Dict[bytes, List[int]] = {}
+    for i, vec in enumerate(cached):
+        if vec is None:
+            missing.setdefault(cache_key(texts[i], model), []).append(i)
+    print(f"임베딩 캐시: {len(texts) - sum(len(v) for v in missing.values())}건 재사용, {len(missing)}건 새로 임베딩")
+
+    if missing:
+        positions = list(missing.values())
+        missing_texts = [texts[idx[0]] for idx in positions]
+        fresh = embed_documents_batched(embedder, missing_texts, batch_size=batch_size, max_workers=max_workers)
+        cache.put_many(missing_texts, model, fresh)
+        for idx, vec in zip(positions, fresh):
+            for i in idx:
+                cached[i] = vec
+    return [vec.tolist() if isinstance(vec, np.ndarray) else vec for vec in cached]  # type: ignore[misc]
+
 def build_or_load_faiss(index_dir: str):
     try:
-        embeddings = get_embedding_model()
+        embeddings = embedding_model_for_index(index_dir)
     except RuntimeError as e:
         print(e)
         return None, None
 
     if os.path.exists(os.path.join(index_dir, "index.faiss")):
         try:
-            store = FAISS.load_local(index_dir, embeddings, allow_dangerous_deserialization=True)
+            store = load_store(index_dir, embeddings)
             return store, embeddings
         except Exception as e:
             print(f"Could not load FAISS index: {e}")
             return None, None
     return None, None
 
-def create_documents_from_csvs(csv_paths: list[str]) -> list[Document]:
-    documents = []
-    column_map = {
-        "diningcode": "text",
-        "googlemap": "content",
-        "kakaomap": "review"
-    }
+_ABSOLUTE_DATE_RE = re.compile(r"(\d{4})\s*[-./년]\s*(\d{1,2})\s*[-./월]\s*(\d{1,2})")
+
+
+def normalize_review_date(date: object) -> str:
+    """
+    절대 날짜("2025-07-01", "2025.07.24.")는 YYYY-MM-DD로 맞추고,
+    상대 날짜("1달 전")나 결측은 크롤링 시점마다 달라지므로 빈 문자열로 돌려줍니다.
+    """
+    match = _ABSOLUTE_DATE_RE.search(str(date or ""))
+    if match is None:
+        return ""
+    year, month, day = (int(g) for g in match.groups())
+    return f"{year:04d}-{month:02d}-{day:02d}"
+
+
+def make_review_id(source: str, date: object, text: str) -> str:
+    """
+    출처/절대 날짜/정규화 본문으로 만든 안정적인 리뷰 ID.
+    CSV 행 순서가 바뀌거나 다시 크롤링해도 같은 리뷰는 같은 ID를 갖습니다.
+    상대 날짜만 있는 출처(googlemap)는 날짜 없이 출처 + 본문으로 만듭니다.
+    """
+    h = hashlib.sha1(f"{source}|{normalize_review_date(date)}|{normalize_text(text)}".encode("utf-8")).hexdigest()[:16]
+    return f"{source}-{h}"
+
+# 출처별 (리뷰 본문 컬럼, 별점 컬럼)
+SOURCE_COLUMNS: Dict[str, Tuple[str, str]] = {
+    "diningcode": ("text", "score"),
+    "googlemap": ("content", "rating"),
+    "kakaomap": ("review", "star"),
+}
+DEFAULT_CSV_CHUNKSIZE = 50_000
+
+def iter_documents_from_csvs(csv_paths: list[str], chunksize: int = DEFAULT_CSV_CHUNKSIZE) -> Iterator[Document]:
+    """
+    CSV를 chunksize행씩 읽어 Document를 하나씩 내보내는 제너레이터.
+    필요한 컬럼만 읽고, 결측/빈 리뷰 제거와 메타데이터 추출은 컬럼 단위(벡터화)로 처리합니다.
+    """
+    seen_ids: Dict[str, int] = {}
 
     for csv_path in csv_paths:
-        review_column = None
         file_name = os.path.basename(csv_path)
-        
-        for name, col in column_map.items():
-            if name in file_name:
-                review_column = col
-                break
-        
-        if not review_column:
+        source_name = next((name for name in SOURCE_COLUMNS if name in file_name), None)
+        if not source_name:
             print(f"Warning: Skipping {file_name} as it does not match known sources.")
             continue
+        review_column, rating_column = SOURCE_COLUMNS[source_name]
+        wanted = {review_column, rating_column, "date", "date_est", "user", "id", "tokens"}
 
         try:
-            df = pd.read_csv(csv_path)
+            reader = pd.read_csv(csv_path, usecols=lambda c: c in wanted, chunksize=chunksize)
             print(f"Processing {file_name}, using column: '{review_column}'")
         except Exception as e:
             print(f"Warning: Could not read {csv_path}. Error: {e}")
             continue
 
-        for index, row in df.iterrows():
-            review_text = row.get(review_column)
-            if pd.isna(review_text):
-                continue
-            cleaned_text = str(review_text).strip()
-            if not cleaned_text:
-                continue
-
-            metadata = {
-                "source": file_name,
-                "row_index": index,
-                "rating": row.get("rating", 0.0),
-                "date": row.get("date", "N/A"),
-                "user": row.get("user", "N/A"),
-            }
-            if 'id' in row and pd.notna(row['id']):
-                metadata['id'] = row['id']
-
-            documents.append(Document(page_content=cleaned_text, metadata=metadata))
-    return documents
+        try:
+            for chunk in reader:
+                if review_column not in chunk.columns:
+                    print(f"Warning: {file_name}에 '{review_column}' 컬럼이 없습니다.")
+                    break
+                texts = chunk[review_column].dropna().astype(str).str.strip()
+                texts = texts[texts != ""]
+                if texts.empty:
+                    continue
+                rows = chunk.loc[texts.index]
+                n = len(texts)
+
+                def _column(name: str, default: object) -> list:
+                    if name not in rows.columns:
+                        return [default] * n
+                    return rows[name].astype(object).where(rows[name].notna(), default).tolist()
+
+                ratings = (pd.to_numeric(rows[rating_column], errors="coerce").fillna(0.0).astype(float).tolist()
+                           if rating_column in rows.columns else [0.0] * n)
+                dates = _column("date", "N/A")
+                date_ests = _column("date_est", None)
+                users = _column("user", "N/A")
+                csv_ids = _column("id", None)
+                # 전처리 단계에서 추출한 명사 토큰 → BM25 키워드 검색에 사용
+                token_lists = (rows["tokens"].fillna("").astype(str).str.findall(r"'([^']+)'").tolist()
+                               if "tokens" in rows.columns else [[] for _ in range(n)])
+
+                for row_index, text, rating, date, date_est, user, csv_id, tokens in zip(
+                        texts.index.tolist(), texts.tolist(), ratings, dates, date_ests, users, csv_ids,
+                        token_lists):
+                    if csv_id is not None:
+                        review_id = str(csv_id)
+                    else:
+                        review_id = make_review_id(source_name, date, text)
+                        # 같은 날(상대 날짜면 날짜 무관) 같은 내용의 리뷰가 여러 건이면 등장 순서로 구분합니다.
+                        seen_ids[review_id] = seen_ids.get(review_id, 0) + 1
+                        if seen_ids[review_id] > 1:
+                            review_id = f"{review_id}-{seen_ids[review_id]}"
+                    metadata = {
+                        "source": file_name,
+                        "row_index": row_index,
+                        "rating": rating,
+                        "date": date,
+                        "user": user,
+                        "id": review_id,
+                        "tokens": tokens,
+                    }
+                    if date_est is not None:
+                        # 상대 날짜("1달 전")만 있는 출처의 추정 날짜 (메타데이터 날짜 필터에 사용)
+                        metadata["date_est"] = date_est
+                    yield Document(page_content=text, metadata=metadata)
+        except Exception as e:
+            print(f"Warning: Could not read {csv_path}. Error: {e}")
+            continue
+
+def create_documents_from_csvs(csv_paths: list[str]) -> list[Document]:
+    return list(iter_documents_from_csvs(csv_paths))
 
 def get_embedding_vector_direct(text: str, api_key: str) -> List[float]:
     """
-    requests를 사용해 Upstage API에서 직접 임베딩 벡터를 가져옵니다.
+    공용 HTTP 클라이언트로 Upstage API에서 직접 임베딩 벡터를 가져옵니다.
     """
-    response = requests.post(
+    response = get_http_client().post(
         "https://api.upstage.ai/v1/embeddings",
         headers={
             "Authorization": f"Bearer {api_key}",
@@ -137,71 +373,244 @@ def get_embedding_vector_direct(text: str, api_key: str) -> List[float]:
     response.raise_for_status()
     return response.json()["data"][0]["embedding"]
 
-def build_index():
+def _default_paths() -> Tuple[str, str]:
+    script_dir = os.path.dirname(__file__)
+    csv_dir = os.path.abspath(os.path.join(script_dir, "..", "..", "database"))
+    index_dir = os.path.abspath(os.path.join(script_dir, "..", "db", "faiss_index"))
+    return csv_dir, index_dir
+
+def _review_csv_paths(csv_dir: str) -> list[str]:
+    csv_paths = sorted(glob.glob(os.path.join(csv_dir, "preprocessed_reviews_*.csv")))
+    if not csv_paths:
+        print(f"'{csv_dir}'에서 CSV 파일을 찾을 수 없습니다.")
+    return csv_paths
+
+def _embed_passages(passage_embedder, documents: Iterable[Document], batch_size: int, max_workers: int,
+                    checkpoint: BuildCheckpoint, resume: bool = False
+                    ) -> Optional[Tuple[list[Document], List[List[float]]]]:
+    """
+    문서 스트림을 checkpoint.chunk_size개씩 끊어 임베딩하고, 청크가 끝날 때마다 디스크에 기록합니다.
+    resume=True이면 ID가 일치하는 기존 청크는 건너뛰므로, 실패해도 잃는 작업은 청크 하나뿐입니다.
+    반환값은 (임베딩된 문서 목록, 벡터 목록)입니다.
+    """
+    if not resume:
+        checkpoint.clear()
+    elif checkpoint.completed_chunks():
+        print(f"체크포인트 '{checkpoint.directory}'에서 재개합니다. (저장된 청크 {checkpoint.completed_chunks()}개)")
+
+    # 로컬 임베딩은 다시 계산하는 편이 캐시 조회보다 빠르므로 캐시를 쓰지 않습니다.
+    cache = None if isinstance(passage_embedder, LocalHashEmbeddings) else get_embedding_cache()
+    embedded_docs: list[Document] = []
+    vectors: List[List[float]] = []
+    chunk_no = 0
+    doc_iter = iter(documents)
+    try:
+        while True:
+            chunk = list(itertools.islice(doc_iter, checkpoint.chunk_size))
+            if not chunk:
+                break
+            ids = [doc.metadata["id"] for doc in chunk]
+            saved = checkpoint.load(chunk_no, ids) if resume else None
+            if saved is None:
+                saved = embed_documents_cached(
+                    passage_embedder,
+                    [doc.page_content for doc in chunk],
+                    cache,
+                    batch_size=batch_size,
+                    max_workers=max_workers,
+                )
+                checkpoint.save(chunk_no, ids, saved)
+            embedded_docs.extend(chunk)
+            vectors.extend(saved)
+            chunk_no += 1
+    except Exception as e:
+        print(f"청크 {chunk_no} 임베딩 중 오류 발생: {e}")
+        print(f"완료된 청크는 '{checkpoint.directory}'에 저장되어 있습니다. --resume 옵션으로 이어서 실행하세요.")
+        return None
+    finally:
+        if cache is not None:
+            print(f"임베딩 캐시 통계: {cache.stats()}")
+            cache.close()
+    return embedded_docs, vectors
+
+def build_index(batch_size: Optional[int] = None, max_workers: Optional[int] = None,
+                incremental: bool = False, resume: bool = False,
+                checkpoint_dir: str = DEFAULT_CHECKPOINT_DIR, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                index_type: Optional[str] = None, index_params: Optional[Dict[str, int]] = None,
+                dedup: bool = True, provider: Optional[str] = None):
     """
     LangChain을 우회하여 직접 API를 호출하고 FAISS 인덱스를 생성합니다.
+    문서는 batch_size개씩 묶어 최대 max_workers개의 요청을 동시에 보내 임베딩합니다.
+    (미지정 시 EMBED_BATCH_SIZE / EMBED_MAX_WORKERS 환경변수 → 기본값 순)
+    incremental=True이면 기존 인덱스를 불러와 달라진 리뷰만 반영합니다(update_index).
+    임베딩 결과는 chunk_size개마다 checkpoint_dir에 기록되며, resume=True이면 이어서 진행합니다.
+    index_type(flat/ivf_flat/hnsw/ivf_pq, 미지정 시 FAISS_INDEX_TYPE 환경변수)에 맞는 인덱스를 만들어
+    학습이 필요하면 자동으로 학습한 뒤 저장합니다. 종류와 파라미터는 meta.json에 기록됩니다.
+    dedup=True이면 임베딩 전에 출처를 가로지르는 근접 중복 리뷰를 하나로 합칩니다(DEDUP_THRESHOLD).
+    CSV는 청크 단위로 읽지만 dedup과 문서 저장소 구성은 전체 문서 목록을 메모리에 둡니다.
+    provider(upstage/local, 미지정 시 EMBEDDING_PROVIDER)로 임베딩 제공자를 고르며 meta.json에 기록됩니다.
     """
-    print("API 키를 환경변수에서 로드합니다...")
-    load_dotenv()
-    api_key = os.getenv("UPSTAGE_API_KEY")
-    if not api_key:
-        print("UPSTAGE_API_KEY가 설정되지 않았습니다.")
+    print("임베딩 설정을 환경변수에서 로드합니다...")
+    try:
+        embedder = get_embedding_model(provider)
+    except RuntimeError as e:
+        print(e)
+        return
+    batch_size = batch_size or int(os.getenv("EMBED_BATCH_SIZE") or DEFAULT_EMBED_BATCH_SIZE)
+    max_workers = max_workers or int(os.getenv("EMBED_MAX_WORKERS") or DEFAULT_EMBED_MAX_WORKERS)
+    index_type = index_type or os.getenv("FAISS_INDEX_TYPE") or DEFAULT_INDEX_TYPE
+    if index_type not in INDEX_TYPES:
+        print(f"지원하지 않는 인덱스 종류입니다: {index_type} (선택: {', '.join(INDEX_TYPES)})")
         return
 
-    script_dir = os.path.dirname(__file__)
-    csv_dir = os.path.abspath(os.path.join(script_dir, "..", "..", "database"))
-    csv_paths = glob.glob(os.path.join(csv_dir, "preprocessed_reviews_*.csv"))
-    
+    csv_dir, index_dir = _default_paths()
+    checkpoint = BuildCheckpoint(checkpoint_dir, chunk_size)
+    csv_paths = _review_csv_paths(csv_dir)
     if not csv_paths:
-        print(f"'{csv_dir}'에서 CSV 파일을 찾을 수 없습니다.")
         return
 
-    documents = create_documents_from_csvs(csv_paths)
+    documents: Iterable[Document] = iter_documents_from_csvs(csv_paths)
+    if dedup:
+        # 근접 중복 판정(군집마다 가장 긴 리뷰를 대표로)은 전체 문서를 봐야 하므로 이 단계에서 한 번 모읍니다.
+        # 따라서 dedup을 켜면(기본) 로더의 스트리밍과 무관하게 문서 목록 전체가 메모리에 올라갑니다.
+        threshold = float(os.getenv("DEDUP_THRESHOLD") or DEFAULT_DEDUP_THRESHOLD)
+        documents, dedup_stats = dedup_documents(documents, threshold=threshold)
+        print(f"근접 중복 제거: {dedup_stats['input']}건 → {dedup_stats['kept']}건 "
+              f"({dedup_stats['collapsed']}건 병합, 출처 간 군집 {dedup_stats['cross_source_clusters']}개)")
+
+    if incremental:
+        if os.path.exists(os.path.join(index_dir, "index.faiss")):
+            # 증분 모드는 추가/삭제 대상을 가리기 위해 전체 ID 목록이 필요하므로 한 번에 읽습니다.
+            update_index(embedder, list(documents), index_dir,
+                         batch_size=batch_size, max_workers=max_workers,
+                         checkpoint=checkpoint, resume=resume)
+            return
+        print("기존 인덱스가 없어 전체 빌드로 진행합니다.")
+
+    print("리뷰 문서를 임베딩합니다. 시간이 다소 걸릴 수 있습니다...")
+    embedded = _embed_passages(embedder, documents, batch_size, max_workers, checkpoint, resume=resume)
+    if embedded is None:
+        return
+    documents, embeddings_list = embedded
     if not documents:
         print("처리할 문서가 없습니다.")
         return
 
-    print(f"총 {len(documents)}개의 문서를 임베딩합니다. 시간이 다소 걸릴 수 있습니다...")
-    
-    embeddings_list = []
-    for i, doc in enumerate(documents):
-        try:
-            vector = get_embedding_vector_direct(doc.page_content, api_key)
-            embeddings_list.append(vector)
-            if (i + 1) % 100 == 0:
-                print(f"... {i+1}/{len(documents)}개 문서 임베딩 완료 ...")
-        except Exception as e:
-            print(f"문서 {i} (출처: {doc.metadata.get('source')}) 임베딩 중 오류 발생: {e}")
-            return
+    print(f"총 {len(documents)}개 문서의 임베딩을 완료했습니다. FAISS 인덱스를 구성합니다...")
 
-    print("모든 문서의 임베딩을 완료했습니다. FAISS 인덱스를 구성합니다...")
-
-    embedding_dim = len(embeddings_list[0])
-    index = faiss.IndexFlatL2(embedding_dim)
-    
-    docstore = InMemoryDocstore({str(i): doc for i, doc in enumerate(documents)})
-    index_to_docstore_id = {i: str(i) for i in range(len(documents))}
-    
     embeddings_array = np.array(embeddings_list, dtype="float32")
-    index.add(embeddings_array)
+    index, build_params = create_index(index_type, embeddings_array, **(index_params or {}))
+    search_params = default_search_params(index_type, build_params)
+    print(f"인덱스 종류: {index_type}, 빌드 파라미터: {build_params}, 검색 파라미터: {search_params}")
 
-    # LangChain FAISS 객체로 최종 조립. 쿼리 임베딩을 위해 embed_query 함수를 전달합니다.
-    # solar-embedding-1-large-query 모델을 사용하도록 새 임베딩 객체를 만듭니다.
-    query_embedder = UpstageEmbeddingsMinimal(
-        api_key=api_key,
-        base_url=os.getenv("UPSTAGE_BASE_URL") or "https://api.upstage.ai/v1",
-        model_query="solar-embedding-1-large-query",
-    )
+    # docstore 키는 위치(str(i))가 아닌 안정적인 리뷰 ID를 사용합니다 → 증분 갱신 시 추가/삭제 대상 비교가 가능
+    doc_ids = [doc.metadata["id"] for doc in documents]
+    docstore = InMemoryDocstore({doc_id: doc for doc_id, doc in zip(doc_ids, documents)})
+    index_to_docstore_id = {i: doc_id for i, doc_id in enumerate(doc_ids)}
+    index.add(embeddings_array)
 
-    final_faiss_store = FAISS(query_embedder.embed_query, index, docstore, index_to_docstore_id)
+    # LangChain FAISS 객체로 최종 조립. 쿼리 임베딩을 위해 임베딩 객체를 전달합니다.
+    final_faiss_store = ReviewStore(embedder, index, docstore, index_to_docstore_id)
 
-    index_dir = os.path.abspath(os.path.join(script_dir, "..", "db", "faiss_index"))
-    os.makedirs(index_dir, exist_ok=True)
     print(f"FAISS 인덱스를 '{index_dir}'에 저장합니다...")
-    final_faiss_store.save_local(index_dir)
-    
+    save_store(final_faiss_store, index_dir, {
+        "note": "명동교자 본점 리뷰 기반 인덱스 (자동 생성)",
+        **_embedding_meta(embedder),
+        "source_dir": "database/",
+        "index_type": index_type,
+        "index_params": build_params,
+        "search_params": search_params,
+        "tombstones": [],
+        "dedup": dedup,
+    })
+    checkpoint.clear()
+
     print("FAISS 인덱스 생성이 완료되었습니다.")
 
-if __name__ == "__main__":
-    build_index()
+def update_index(embedder, documents: list[Document], index_dir: str,
+                 batch_size: int = DEFAULT_EMBED_BATCH_SIZE,
+                 max_workers: int = DEFAULT_EMBED_MAX_WORKERS,
+                 checkpoint: Optional[BuildCheckpoint] = None, resume: bool = False) -> None:
+    """
+    저장된 인덱스를 불러와 새 리뷰는 벡터를 추가하고, CSV에서 사라진 리뷰는 인덱스에서 제거한 뒤 저장합니다.
+    삭제 후 위치가 다시 매겨지지 않는 인덱스(HNSW, IVF/PQ)는 벡터를 남겨두고 meta.json의 tombstones에 기록해 검색에서 제외합니다.
+    IVF/PQ 인덱스는 기존 학습 결과(중심점/코드북)를 그대로 사용합니다.
+    """
+    # 다른 임베딩으로 만든 벡터와 섞이면 검색이 무의미해지므로 제공자/모델이 같을 때만 갱신합니다.
+    meta, current_meta = read_meta(index_dir), _embedding_meta(embedder)
+    built_provider = meta.get("embedding_provider") or DEFAULT_EMBEDDING_PROVIDER
+    if built_provider != current_meta["embedding_provider"] or (
+            built_provider == "local" and meta.get("embedding_model") != current_meta["embedding_model"]):
+        print(f"기존 인덱스는 '{meta.get('embedding_model')}' 임베딩으로 만들어져 증분 갱신할 수 없습니다. "
+              f"전체 빌드를 실행하세요.")
+        return
+    store = load_store(index_dir, embedder, writable=True)
+    tombstones = store.tombstones
+    existing_ids = set(store.index_to_docstore_id.values())
+    live_ids = existing_ids - tombstones
+    current = {doc.metadata["id"]: doc for doc in documents}
+
+    removed = [doc_id for doc_id in live_ids if doc_id not in current]
+    revived = [doc_id for doc_id in current if doc_id in tombstones]
+    added = [doc for doc_id, doc in current.items() if doc_id not in existing_ids]
+    print(f"증분 갱신: 기존 {len(live_ids)}건, 추가 {len(added) + len(revived)}건, 삭제 {len(removed)}건")
+    if not added and not removed and not revived:
+        print("변경된 리뷰가 없습니다.")
+        return
+
+    if removed and supports_remove(store.index):
+        store.delete(removed)
+    elif removed:
+        tombstones.update(removed)
+    tombstones.difference_update(revived)
 
+    if added:
+        checkpoint = checkpoint or BuildCheckpoint()
+        embedded = _embed_passages(embedder, added, batch_size, max_workers, checkpoint, resume=resume)
+        if embedded is None:
+            print("임베딩 실패로 증분 갱신을 중단합니다. 기존 인덱스는 그대로 유지됩니다.")
+            return
+        added, vectors = embedded
+        store.add_embeddings(
+            [(doc.page_content, vec) for doc, vec in zip(added, vectors)],
+            metadatas=[doc.metadata for doc in added],
+            ids=[doc.metadata["id"] for doc in added],
+        )
+
+    print(f"FAISS 인덱스를 '{index_dir}'에 저장합니다... (총 {store.index.ntotal}건, tombstone {len(tombstones)}건)")
+    save_store(store, index_dir, {"tombstones": sorted(tombstones)})
+    if checkpoint is not None:
+        checkpoint.clear()
+    print("FAISS 인덱스 증분 갱신이 완료되었습니다.")
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="리뷰 CSV로부터 FAISS 인덱스를 생성합니다.")
+    parser.add_argument("-b", "--batch-size", type=int, default=None,
+                        help=f"요청당 문서 수. 기본값: EMBED_BATCH_SIZE 또는 {DEFAULT_EMBED_BATCH_SIZE}")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help=f"동시 요청 수 상한. 기본값: EMBED_MAX_WORKERS 또는 {DEFAULT_EMBED_MAX_WORKERS}")
+    parser.add_argument("-i", "--incremental", action="store_true",
+                        help="기존 인덱스에 새 리뷰만 추가하고 사라진 리뷰는 삭제합니다.")
+    parser.add_argument("-r", "--resume", action="store_true",
+                        help="이전 빌드가 실패했을 때 마지막으로 완료된 청크 다음부터 이어서 진행합니다.")
+    parser.add_argument("--checkpoint-dir", type=str, default=DEFAULT_CHECKPOINT_DIR,
+                        help=f"청크 체크포인트 저장 위치. 기본값: {DEFAULT_CHECKPOINT_DIR}")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"체크포인트 청크당 문서 수. 기본값: {DEFAULT_CHUNK_SIZE}")
+    parser.add_argument("-t", "--index-type", type=str, default=None, choices=INDEX_TYPES,
+                        help=f"FAISS 인덱스 종류. 기본값: FAISS_INDEX_TYPE 또는 {DEFAULT_INDEX_TYPE}")
+    parser.add_argument("--nlist", type=int, default=None, help="(IVF) 클러스터 수. 기본값: 문서 수로 자동 결정")
+    parser.add_argument("--hnsw-m", type=int, default=None, help="(HNSW) 노드당 이웃 수")
+    parser.add_argument("--pq-m", type=int, default=None, help="(IVF-PQ) 서브벡터 수. 벡터 차원의 약수여야 함")
+    parser.add_argument("--no-dedup", action="store_true", help="출처 간 근접 중복 리뷰 병합을 끕니다.")
+    parser.add_argument("-p", "--provider", type=str, default=None, choices=EMBEDDING_PROVIDERS,
+                        help=f"임베딩 제공자. 기본값: EMBEDDING_PROVIDER 또는 {DEFAULT_EMBEDDING_PROVIDER}")
+    return parser
+
+if __name__ == "__main__":
+    args = create_parser().parse_args()
+    index_params = {k: v for k, v in {"nlist": args.nlist, "hnsw_m": args.hnsw_m, "pq_m": args.pq_m}.items() if v}
+    build_index(batch_size=args.batch_size, max_workers=args.workers, incremental=args.incremental,
+                resume=args.resume, checkpoint_dir=args.checkpoint_dir, chunk_size=args.chunk_size,
+                index_type=args.index_type, index_params=index_params, dedup=not args.no_dedup,
+                provider=args.provider)
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import re
+from typing import Dict, List, Optional, Sequence, TypedDict
+
+import numpy as np
+import pandas as pd
+
+from st_app.rag.docstore import ColumnarDocstore, dates_to_int
+
+DEFAULT_RECENT_DAYS = 90
+
+
+class ReviewFilter(TypedDict, total=False):
+    sources: List[str]        # 출처 이름 일부("kakaomap" 등). 근접 중복으로 합쳐진 출처도 일치로 봅니다.
+    min_rating: float
+    max_rating: float
+    date_from: str            # YYYY-MM-DD (포함)
+    date_to: str              # YYYY-MM-DD (포함)
+    recent_days: int          # 가장 최근 리뷰 날짜(출처 조건이 있으면 그 출처 안에서)로부터 N일 이내
+
+
+def _date_int(value: object) -> int:
+    return int(dates_to_int([value])[0])
+
+
+class FieldIndex:
+    """
+    메타데이터 필터용으로 미리 계산한 필드별 색인. 위치는 FAISS 인덱스 위치와 같습니다.
+      출처: 출처별 문서 위치 목록(정렬됨)
+      별점/날짜: 값으로 정렬한 위치 순서 → 범위 조건은 이진 탐색 한 번으로 위치 구간이 됩니다.
+    가장 좁은 조건의 위치 목록에서 시작해 나머지 조건만 그 위치들에 대해 확인하므로
+    필터 비용은 전체 문서 수가 아닌 후보 수에 비례합니다.
+    excluded는 검색에서 항상 빼야 하는 위치(tombstone, 더미 문서)입니다.
+    """
+
+    def __init__(self, source_names: Sequence[str], source_masks: np.ndarray, ratings: np.ndarray,
+                 dates: np.ndarray, excluded: Optional[np.ndarray] = None):
+        self.n = int(len(ratings))
+        self.source_names = list(source_names)
+        self.source_masks = np.asarray(source_masks, dtype=np.uint64)
+        self.ratings = np.asarray(ratings, dtype=np.float32)
+        self.dates = np.asarray(dates, dtype=np.int32)
+        self.source_lists: Dict[str, np.ndarray] = {
+            name: np.flatnonzero((self.source_masks >> np.uint64(code)) & np.uint64(1)).astype(np.int64)
+            for code, name in enumerate(self.source_names)
+        }
+        self.rating_order = np.argsort(self.ratings, kind="stable").astype(np.int64)
+        self.rating_sorted = self.ratings[self.rating_order]
+        self.date_order = np.argsort(self.dates, kind="stable").astype(np.int64)
+        self.date_sorted = self.dates[self.date_order]
+        self.excluded = np.unique(np.asarray(excluded if excluded is not None else [], dtype=np.int64))
+
+    @classmethod
+    def from_store(cls, store, excluded_ids: Sequence[str] = ()) -> "FieldIndex":
+        """컬럼형 문서 저장소면 배열을 그대로 쓰고, 아니면(예전 pickle 인덱스) 문서를 한 번 훑어 만듭니다."""
+        excluded_ids = set(excluded_ids) | {"dummy"}
+        docstore = store.docstore
+        if isinstance(docstore, ColumnarDocstore):
+            excluded = [pos for pos in range(len(docstore)) if docstore.doc_id(pos) in excluded_ids] \
+                if len(excluded_ids) > 1 else []
+            return cls(docstore.sources, docstore.source_masks, docstore.ratings, docstore.dates, np.array(excluded))
+
+        metas, excluded = [], []
+        for pos in range(store.index.ntotal):
+            doc = docstore.search(store.index_to_docstore_id[pos])
+            meta = getattr(doc, "metadata", None) or {}
+            metas.append(meta)
+            if str(meta.get("id", "")) in excluded_ids:
+                excluded.append(pos)
+        names = sorted({str(m.get("source", "")) for m in metas} | {str(s) for m in metas for s in m.get("sources", [])})
+        code_of = {name: code for code, name in enumerate(names)}
+        masks = np.zeros(len(metas), dtype=np.uint64)
+        for pos, meta in enumerate(metas):
+            for name in {str(meta.get("source", ""))} | {str(s) for s in meta.get("sources", [])}:
+                masks[pos] |= np.uint64(1) << np.uint64(code_of[name])
+        ratings = np.array([float(m.get("rating") or 0.0) for m in metas], dtype=np.float32)
+        dates = dates_to_int([m.get("date_est") or m.get("date") for m in metas])
+        return cls(names, masks, ratings, dates, np.array(excluded))
+
+    def _source_bits(self, sources: Sequence[str]) -> np.uint64:
+        bits = 0
+        for code, name in enumerate(self.source_names):
+            if any(s and s.lower() in name.lower() for s in sources):
+                bits |= 1 << code
+        return np.uint64(bits)
+
+    def select(self, flt: Optional[ReviewFilter]) -> Optional[np.ndarray]:
+        """
+        조건을 모두 만족하고 excluded가 아닌 위치(정렬됨)를 돌려줍니다.
+        조건이 하나도 없으면 None(전체)을 돌려줍니다 — 이 경우 excluded만 따로 적용하면 됩니다.
+        """
+        flt = flt or {}
+        lo_rating, hi_rating = flt.get("min_rating"), flt.get("max_rating")
+        date_from = _date_int(flt["date_from"]) if flt.get("date_from") else None
+        date_to = _date_int(flt["date_to"]) if flt.get("date_to") else None
+        source_bits = self._source_bits(flt["sources"]) if flt.get("sources") else None
+
+        # 조건별 후보 위치 목록 → 가장 짧은 목록 하나만 만들고 나머지 조건은 그 위치에서 직접 확인
+        candidates: List[np.ndarray] = []
+        if source_bits is not None:
+            lists = [self.source_lists[name] for code, name in enumerate(self.source_names)
+                     if int(source_bits) >> code & 1]
+            candidates.append(np.unique(np.concatenate(lists)) if lists else np.zeros(0, dtype=np.int64))
+        if flt.get("recent_days"):
+            # 출처마다 수집 시점이 달라 "최근"의 기준은 해당 출처의 가장 최근 리뷰 날짜로 잡습니다.
+            scope = self.dates[candidates[0]] if candidates else self.date_sorted
+            latest = int(scope.max()) if len(scope) else 0
+            if latest:
+                since = pd.Timestamp(str(latest)) - pd.Timedelta(days=int(flt["recent_days"]))
+                date_from = max(date_from or 0, int(since.strftime("%Y%m%d")))
+        if date_from is not None or date_to is not None:
+            date_from = max(date_from or 1, 1)   # 날짜를 모르는 리뷰(0)는 날짜 조건에서 제외
+        if lo_rating is not None or hi_rating is not None:
+            start = np.searchsorted(self.rating_sorted, lo_rating, "left") if lo_rating is not None else 0
+            end = np.searchsorted(self.rating_sorted, hi_rating, "right") if hi_rating is not None else self.n
+            candidates.append(self.rating_order[start:end])
+        if date_from is not None or date_to is not None:
+            start = np.searchsorted(self.date_sorted, date_from, "left")
+            end = np.searchsorted(self.date_sorted, date_to, "right") if date_to is not None else self.n
+            candidates.append(self.date_order[start:end])
+        if not candidates:
+            return None
+
+        positions = min(candidates, key=len)
+        keep = np.ones(len(positions), dtype=bool)
+        if source_bits is not None:
+            keep &= (self.source_masks[positions] & source_bits) != 0
+        if lo_rating is not None:
+            keep &= self.ratings[positions] >= lo_rating
+        if hi_rating is not None:
+            keep &= self.ratings[positions] <= hi_rating
+        if date_from is not None:
+            keep &= self.dates[positions] >= date_from
+        if date_to is not None:
+            keep &= self.dates[positions] <= date_to
+        positions = np.sort(positions[keep])
+        if len(self.excluded):
+            positions = positions[~np.isin(positions, self.excluded, assume_unique=True)]
+        return positions
+
+
+# 질문에서 필터 조건을 뽑아내는 간단한 규칙 (LLM 호출 없이)
+# 출처 이름은 전체 이름이나 "카카오 리뷰"처럼 리뷰/후기가 붙은 경우만 인정합니다("카카오페이", "구글에서 검색", "다이닝 공간"은 출처가 아님).
+_SOURCE_PATTERNS = {
+    "kakaomap": re.compile(r"카카오\s*(?:맵|지도|리뷰|후기)|카맵"),
+    "googlemap": re.compile(r"구글\s*(?:맵|지도|리뷰|후기)"),
+    "diningcode": re.compile(r"다이닝\s*(?:코드|리뷰|후기)"),
+}
+# 앞에 숫자가 붙은 "15점"은 별점이 아님
+_RATING_RE = re.compile(r"(?<![\d.])(?:별점\s*)?([1-5](?:\.\d)?)\s*점\s*(이상|이하|미만|초과|대)?")
+_YEAR_MONTH_RE = re.compile(r"(20\d{2})\s*년(?:\s*(1[0-2]|0?[1-9])\s*월)?")
+
+
+def parse_review_filters(query: str) -> ReviewFilter:
+    """
+    "최근 카카오맵 1점 리뷰" → {"sources": ["kakaomap"], "min_rating": 1, "max_rating": 1, "recent_days": 90}
+    인식하지 못한 조건은 넣지 않으므로, 빈 dict이면 필터 없이 검색합니다.
+    """
+    text = query or ""
+    flt: ReviewFilter = {}
+    sources = [name for name, pattern in _SOURCE_PATTERNS.items() if pattern.search(text)]
+    if sources:
+        flt["sources"] = sources
+
+    m = _RATING_RE.search(text)
+    if m:
+        value, op = float(m.group(1)), m.group(2)
+        if op == "이상":
+            flt["min_rating"] = value
+        elif op == "초과":
+            flt["min_rating"] = value + 0.5
+        elif op == "이하":
+            flt["max_rating"] = value
+        elif op == "미만":
+            flt["max_rating"] = value - 0.5
+        elif op == "대":
+            # "3점대" = [3, 4): 별점은 소수 한 자리까지이므로 3.0~3.9
+            flt["min_rating"] = float(int(value))
+            flt["max_rating"] = int(value) + 0.9
+        else:
+            flt["min_rating"] = flt["max_rating"] = value
+    elif any(w in text for w in ("별점 낮은", "낮은 별점", "악평", "혹평")):
+        flt["max_rating"] = 2.0
+    elif any(w in text for w in ("별점 높은", "높은 별점", "호평")):
+        flt["min_rating"] = 4.0
+
+    m = _YEAR_MONTH_RE.search(text)
+    if m:
+        year = int(m.group(1))
+        if m.group(2):
+            month = int(m.group(2))
+            end = pd.Timestamp(year=year, month=month, day=1) + pd.offsets.MonthEnd(1)
+            flt["date_from"] = f"{year:04d}-{month:02d}-01"
+            flt["date_to"] = end.strftime("%Y-%m-%d")
+        else:
+            flt["date_from"], flt["date_to"] = f"{year:04d}-01-01", f"{year:04d}-12-31"
+    elif "최근" in text or "요즘" in text:
+        flt["recent_days"] = DEFAULT_RECENT_DAYS
+    return flt
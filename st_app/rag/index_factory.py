@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, Optional, Tuple
+
+import faiss
+import numpy as np
+
+# 지원하는 인덱스 종류
+#   flat     : 전수 검색(정확). 작은 코퍼스의 기준값
+#   ivf_flat : 역색인 + 원본 벡터. nprobe로 정확도/속도 조절
+#   hnsw     : 그래프 기반. efSearch로 정확도/속도 조절, 삭제(remove_ids) 미지원
+#   ivf_pq   : 역색인 + Product Quantization. 메모리가 가장 작음
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+DEFAULT_INDEX_TYPE = "flat"
+
+DEFAULT_HNSW_M = 32
+DEFAULT_EF_CONSTRUCTION = 200
+DEFAULT_EF_SEARCH = 64
+DEFAULT_PQ_NBITS = 8
+# 필터 후보가 이 수 이하이면 IDSelector 대신 후보 벡터만 꺼내 정확 검색
+EXACT_SUBSET_MAX = 256
+
+
+def default_nlist(n: int) -> int:
+    # 경험칙 4·√n, 단 클러스터당 학습 벡터가 39개 이상 되도록 제한
+    return max(1, min(int(4 * math.sqrt(max(n, 1))), n // 39 or 1))
+
+
+def default_nprobe(nlist: int) -> int:
+    return max(1, min(nlist, int(round(math.sqrt(nlist)))))
+
+
+def default_pq_m(dim: int) -> int:
+    # dim을 나누어떨어지게 하는 서브벡터 수 중 서브벡터 차원이 16 이상이 되는 가장 큰 값
+    for m in range(max(1, dim // 16), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def create_index(index_type: str, vectors: np.ndarray, *, nlist: Optional[int] = None,
+                 hnsw_m: int = DEFAULT_HNSW_M, ef_construction: int = DEFAULT_EF_CONSTRUCTION,
+                 pq_m: Optional[int] = None, pq_nbits: int = DEFAULT_PQ_NBITS
+                 ) -> Tuple[faiss.Index, Dict[str, Any]]:
+    """
+    index_type에 맞는 (학습까지 끝난, 비어 있는) L2 인덱스와 사용한 빌드 파라미터를 돌려줍니다.
+    학습이 필요한 종류(IVF/PQ)는 vectors로 자동 학습합니다. 벡터 추가는 호출 측에서 합니다.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"지원하지 않는 인덱스 종류입니다: {index_type} (선택: {', '.join(INDEX_TYPES)})")
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, dim = vectors.shape
+    params: Dict[str, Any] = {}
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+        params.update(hnsw_m=hnsw_m, ef_construction=ef_construction)
+    else:
+        nlist = nlist or default_nlist(n)
+        quantizer = faiss.IndexFlatL2(dim)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_L2)
+        else:
+            pq_m = pq_m or default_pq_m(dim)
+            if dim % pq_m != 0:
+                raise ValueError(f"pq_m({pq_m})은 벡터 차원({dim})을 나누어떨어지게 해야 합니다.")
+            # 코드북(2^nbits개 중심) 학습에는 중심당 39개 이상의 벡터가 권장되므로 작은 코퍼스에서는 비트 수를 낮춥니다.
+            pq_nbits = max(1, min(pq_nbits, int(math.log2(max(n // 39, 2)))))
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, pq_nbits)
+            params.update(pq_m=pq_m, pq_nbits=pq_nbits)
+        params["nlist"] = nlist
+        index.train(vectors)
+        enable_reconstruct(index)
+
+    return index, params
+
+
+def default_search_params(index_type: str, build_params: Dict[str, Any]) -> Dict[str, int]:
+    if index_type in ("ivf_flat", "ivf_pq"):
+        return {"nprobe": default_nprobe(int(build_params.get("nlist", 1)))}
+    if index_type == "hnsw":
+        return {"ef_search": DEFAULT_EF_SEARCH}
+    return {}
+
+
+def apply_search_params(index: faiss.Index, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> None:
+    """저장된 인덱스 종류에 맞는 검색 파라미터(nprobe/efSearch)를 설정합니다. 해당 없는 값은 무시합니다."""
+    ivf = _as_ivf(index)
+    if ivf is not None and nprobe:
+        ivf.nprobe = int(nprobe)
+    hnsw = _as_hnsw(index)
+    if hnsw is not None and ef_search:
+        hnsw.hnsw.efSearch = int(ef_search)
+
+
+def detect_index_type(index: faiss.Index) -> str:
+    if _as_hnsw(index) is not None:
+        return "hnsw"
+    ivf = _as_ivf(index)
+    if ivf is not None:
+        return "ivf_pq" if isinstance(ivf, faiss.IndexIVFPQ) else "ivf_flat"
+    return "flat"
+
+
+def supports_remove(index: faiss.Index) -> bool:
+    # 삭제 후 위치가 0..ntotal-1로 다시 매겨지는 인덱스(Flat)만 실제로 지웁니다.
+    #  - HNSW 그래프는 벡터 삭제를 지원하지 않음
+    #  - IVF의 remove_ids는 남은 벡터의 원래 레이블을 그대로 두므로, 위치로 문서를 찾는
+    #    index_to_docstore_id/컬럼형 문서 저장소와 어긋남
+    # → 둘 다 tombstone으로 처리
+    return _as_hnsw(index) is None and _as_ivf(index) is None
+
+
+def _search_parameters(index: faiss.Index, selector: faiss.IDSelector, k: int,
+                       exhaustive: bool = False) -> faiss.SearchParameters:
+    hnsw = _as_hnsw(index)
+    if hnsw is not None:
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=max(int(hnsw.hnsw.efSearch), k))
+    ivf = _as_ivf(index)
+    if ivf is not None:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=int(ivf.nlist if exhaustive else ivf.nprobe))
+    return faiss.SearchParameters(sel=selector)
+
+
+def enable_reconstruct(index: faiss.Index) -> None:
+    """
+    IVF 인덱스에 위치 → (리스트, 오프셋) 배열(direct map)을 만들어 reconstruct를 쓸 수 있게 합니다.
+    인덱스를 바꾸는 작업이므로 만들 때(create_index)와 불러올 때(load_store), 검색에 공유되기 전에 한 번만 호출합니다.
+    IVF는 remove_ids 대신 tombstone을 쓰므로(supports_remove) 이후 add()로 붙는 위치도 기록되는 Array 형식을 씁니다.
+    """
+    ivf = _as_ivf(index)
+    if ivf is not None and ivf.direct_map.no():
+        ivf.set_direct_map_type(faiss.DirectMap.Array)
+
+
+def reconstruct_positions(index: faiss.Index, positions: np.ndarray) -> np.ndarray:
+    """위치들의 벡터를 꺼냅니다. 인덱스는 바꾸지 않으므로 IVF는 enable_reconstruct가 먼저 호출되어 있어야 합니다."""
+    ivf = _as_ivf(index)
+    if ivf is not None and ivf.direct_map.no():
+        raise RuntimeError("IVF 인덱스에 direct map이 없습니다. 인덱스를 공유하기 전에 enable_reconstruct를 호출하세요.")
+    return index.reconstruct_batch(np.ascontiguousarray(positions, dtype=np.int64))
+
+
+def _exact_subset_search(index: faiss.Index, queries: np.ndarray, k: int,
+                         positions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    vectors = reconstruct_positions(index, positions)
+    # 제곱 L2 거리 (FAISS METRIC_L2와 같은 값)
+    dists = (np.sum(queries ** 2, axis=1)[:, None] + np.sum(vectors ** 2, axis=1)[None, :]
+             - 2.0 * queries @ vectors.T)
+    top = min(k, len(positions))
+    order = np.argsort(dists, axis=1, kind="stable")[:, :top]
+    out_d = np.full((len(queries), k), np.inf, dtype=np.float32)
+    out_i = np.full((len(queries), k), -1, dtype=np.int64)
+    out_d[:, :top] = np.take_along_axis(dists, order, axis=1)
+    out_i[:, :top] = positions[order]
+    return out_d, out_i
+
+
+def filtered_search(index: faiss.Index, queries: np.ndarray, k: int, allowed: Optional[np.ndarray] = None,
+                    excluded: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    allowed(허용 위치, 정렬됨)와 excluded(제외 위치)를 IDSelector로 넘겨 FAISS 검색 안에서 거릅니다.
+    후보가 EXACT_SUBSET_MAX개 이하이면 후보 벡터만 정확 검색합니다.
+    근사 인덱스(IVF/HNSW)가 후보를 놓쳐 min(k, 후보 수)개를 못 채우면 IVF는 모든 리스트를,
+    HNSW는 후보 정확 검색을 다시 수행하므로 항상 가능한 만큼 k개를 채웁니다.
+    """
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    has_excluded = excluded is not None and len(excluded) > 0
+    if allowed is None and not has_excluded:
+        return index.search(queries, k)
+    if allowed is not None and has_excluded:
+        allowed = allowed[~np.isin(allowed, excluded)]
+    total = len(allowed) if allowed is not None else index.ntotal - len(excluded)
+    if total <= 0:
+        return (np.full((len(queries), k), np.inf, dtype=np.float32),
+                np.full((len(queries), k), -1, dtype=np.int64))
+    if allowed is not None and len(allowed) <= EXACT_SUBSET_MAX:
+        return _exact_subset_search(index, queries, k, allowed)
+
+    # 파이썬 쪽에서 selector 참조를 유지해야 검색 중 해제되지 않습니다.
+    if allowed is not None:
+        selector = faiss.IDSelectorBatch(np.ascontiguousarray(allowed, dtype=np.int64))
+        inner = None
+    else:
+        inner = faiss.IDSelectorBatch(np.ascontiguousarray(excluded, dtype=np.int64))
+        selector = faiss.IDSelectorNot(inner)
+    dists, ids = index.search(queries, k, params=_search_parameters(index, selector, k))
+    need = min(k, total)
+    short = (ids >= 0).sum(axis=1) < need
+    if short.any():
+        if _as_ivf(index) is not None:
+            params = _search_parameters(index, selector, k, exhaustive=True)
+            dists[short], ids[short] = index.search(queries[short], k, params=params)
+        else:
+            subset = allowed if allowed is not None else np.setdiff1d(np.arange(index.ntotal), excluded)
+            dists[short], ids[short] = _exact_subset_search(index, queries[short], k, subset)
+    return dists, ids
+
+
+def index_memory_bytes(index: faiss.Index) -> int:
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def _as_ivf(index: faiss.Index):
+    try:
+        return faiss.downcast_index(faiss.extract_index_ivf(index))
+    except RuntimeError:
+        return None
+
+
+def _as_hnsw(index: faiss.Index):
+    downcast = faiss.downcast_index(index)
+    return downcast if isinstance(downcast, faiss.IndexHNSW) else None
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, Optional, Set
+
+import faiss
+from langchain_community.docstore import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from st_app.rag.bm25 import BM25_FILE, BM25Index
+from st_app.rag.filters import FieldIndex
+from st_app.rag.docstore import ColumnarDocstore, PositionalIds, has_columnar_docstore, write_columnar_docstore
+from st_app.rag.index_factory import apply_search_params, detect_index_type, enable_reconstruct
+
+META_FILE = "meta.json"
+INDEX_FILE = "index.faiss"
+LEGACY_DOCSTORE_FILE = "index.pkl"   # LangChain save_local이 만드는 pickle docstore
+META_VERSION = 3
+
+
+class ReviewStore(FAISS):
+    """
+    LangChain FAISS 스토어 + 저장된 인덱스의 메타데이터(meta.json).
+    meta에는 인덱스 종류/빌드·검색 파라미터와, 삭제를 지원하지 않는 인덱스(HNSW)의 tombstone ID가 담깁니다.
+    bm25는 같은 문서 위치를 쓰는 키워드 역색인입니다(토큰이 없던 예전 인덱스는 None).
+    """
+
+    def __init__(self, *args: Any, meta: Optional[Dict[str, Any]] = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.meta: Dict[str, Any] = meta or {}
+        self.bm25: Optional[BM25Index] = None
+        self._field_index: Optional[FieldIndex] = None
+
+    @property
+    def tombstones(self) -> Set[str]:
+        return set(self.meta.get("tombstones", []))
+
+    @property
+    def field_index(self) -> FieldIndex:
+        """출처/별점/날짜 필터용 색인 (처음 필요할 때 한 번 만듭니다)."""
+        if self._field_index is None or self._field_index.n != self.index.ntotal:
+            self._field_index = FieldIndex.from_store(self, self.tombstones)
+        return self._field_index
+
+
+def read_meta(index_dir: str) -> Dict[str, Any]:
+    path = os.path.join(index_dir, META_FILE)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except Exception as e:
+        print(f"'{path}'를 읽지 못했습니다: {e}")
+        return {}
+
+
+def save_store(store: FAISS, index_dir: str, meta: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    FAISS 인덱스와 컬럼형 문서 저장소, meta.json(인덱스 종류, 파라미터, 문서 수 등)을 기록합니다.
+    문서는 인덱스 위치 순서로 저장되므로 검색 결과 위치로 바로 조회할 수 있습니다.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    documents = []
+    for i in range(store.index.ntotal):
+        doc = store.docstore.search(store.index_to_docstore_id[i])
+        if not isinstance(doc, Document):
+            raise ValueError(f"인덱스 위치 {i}의 문서를 찾을 수 없습니다: {doc}")
+        documents.append(doc)
+    sources = write_columnar_docstore(index_dir, documents)
+    bm25 = BM25Index.build([(doc.metadata or {}).get("tokens") or [] for doc in documents])
+    bm25.save(index_dir)
+    tmp_index = os.path.join(index_dir, INDEX_FILE + ".tmp")
+    faiss.write_index(store.index, tmp_index)
+    os.replace(tmp_index, os.path.join(index_dir, INDEX_FILE))
+    legacy = os.path.join(index_dir, LEGACY_DOCSTORE_FILE)
+    if os.path.exists(legacy):
+        os.remove(legacy)
+
+    merged: Dict[str, Any] = dict(getattr(store, "meta", {}) or {})
+    merged.update(meta or {})
+    merged.update({
+        "docstore": "columnar",
+        "doc_sources": sources,
+        "version": META_VERSION,
+        "index_type": merged.get("index_type") or detect_index_type(store.index),
+        "ntotal": int(store.index.ntotal),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "generated_by": "st_app/rag/embedder.py",
+    })
+    tmp_path = os.path.join(index_dir, META_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(merged, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, os.path.join(index_dir, META_FILE))
+    if isinstance(store, ReviewStore):
+        store.meta = merged
+        store.bm25 = bm25
+        store._field_index = None
+    return merged
+
+
+def load_store(index_dir: str, embeddings: Any, writable: bool = False) -> ReviewStore:
+    """
+    저장된 인덱스를 불러옵니다. 인덱스 종류는 파일에서 그대로 복원되며,
+    검색 파라미터는 meta.json 값 → 환경변수(FAISS_NPROBE / FAISS_EF_SEARCH) 순으로 덮어씁니다.
+
+    문서 저장소는 메모리 매핑된 컬럼형 파일을 위치로 지연 조회하므로, 문서 수와 무관하게 시작 비용이 일정합니다.
+    writable=True이면(증분 갱신용) 리뷰 ID로 추가/삭제할 수 있는 InMemoryDocstore로 풀어서 불러옵니다.
+    예전 형식(index.pkl)만 있으면 LangChain load_local로 불러옵니다.
+    """
+    meta = read_meta(index_dir)
+    if has_columnar_docstore(index_dir):
+        index = faiss.read_index(os.path.join(index_dir, INDEX_FILE))
+        columnar = ColumnarDocstore(index_dir, meta.get("doc_sources") or [])
+        if len(columnar) != index.ntotal:
+            raise ValueError(f"문서 수({len(columnar)})와 인덱스 벡터 수({index.ntotal})가 다릅니다.")
+        if writable:
+            docs = list(columnar.iter_documents())
+            store = ReviewStore(embeddings, index, InMemoryDocstore({doc.id: doc for doc in docs}),
+                                {i: doc.id for i, doc in enumerate(docs)})
+        else:
+            store = ReviewStore(embeddings, index, columnar, PositionalIds(index.ntotal))
+    else:
+        store = ReviewStore.load_local(index_dir, embeddings, allow_dangerous_deserialization=True)
+    store.meta = meta
+    bm25 = BM25Index.load(index_dir)
+    if bm25 is not None and bm25.n_docs != store.index.ntotal:
+        print(f"'{BM25_FILE}'의 문서 수({bm25.n_docs})가 인덱스({store.index.ntotal})와 달라 키워드 검색을 끕니다.")
+        bm25 = None
+    store.bm25 = bm25
+    search_params = dict(store.meta.get("search_params") or {})
+    if os.getenv("FAISS_NPROBE"):
+        search_params["nprobe"] = int(os.environ["FAISS_NPROBE"])
+    if os.getenv("FAISS_EF_SEARCH"):
+        search_params["ef_search"] = int(os.environ["FAISS_EF_SEARCH"])
+    apply_search_params(store.index, search_params.get("nprobe"), search_params.get("ef_search"))
+    # 검색 중(MMR, 후보 정확 검색)에 공유 인덱스를 바꾸지 않도록 direct map은 여기서 미리 만듭니다.
+    enable_reconstruct(store.index)
+    return store
@@ -1,8 +1,15 @@
 import os
-from typing import Optional
+import threading
+from typing import Dict, Optional, Tuple
 
 from langchain_openai import ChatOpenAI
 
+from st_app.rag.http_client import get_async_http_client, get_http_client, http_timeout, max_retries
+
+# 같은 설정의 클라이언트는 한 번만 만들어 공유합니다. 키: (api_key, base_url, model, temperature)
+_LLM_CACHE: Dict[Tuple[str, Optional[str], str, float], ChatOpenAI] = {}
+_LLM_LOCK = threading.Lock()
+
 
 def get_llm(model: Optional[str] = None, temperature: float = 0.3) -> ChatOpenAI:
     """
@@ -12,6 +19,9 @@ def get_llm(model: Optional[str] = None, temperature: float = 0.3) -> ChatOpenAI
 
     모델 이름은 다음 우선순위를 따릅니다.
     - 인자 model → OPENAI_MODEL → UPSTAGE_MODEL → (기본) solar-1-mini-chat
+
+    같은 (키, base_url, 모델, temperature) 조합은 캐시된 인스턴스를 돌려주며,
+    모든 인스턴스는 프로세스 공용 keep-alive HTTP 클라이언트(st_app/rag/http_client.py)를 사용합니다.
     """
     upstage_key = os.getenv("UPSTAGE_API_KEY")
     openai_key = os.getenv("OPENAI_API_KEY")
@@ -44,5 +54,20 @@ def get_llm(model: Optional[str] = None, temperature: float = 0.3) -> ChatOpenAI
     if (not base_url) and (api_key_to_use == upstage_key):
         base_url = "https://api.upstage.ai/v1"
 
-    return ChatOpenAI(api_key=api_key_to_use, base_url=base_url, model=model_name, temperature=temperature)
+    cache_key = (api_key_to_use, base_url, model_name, float(temperature))
+    with _LLM_LOCK:
+        llm = _LLM_CACHE.get(cache_key)
+        if llm is None:
+            llm = ChatOpenAI(
+                api_key=api_key_to_use,
+                base_url=base_url,
+                model=model_name,
+                temperature=temperature,
+                timeout=http_timeout().read,
+                max_retries=max_retries(),
+                http_client=get_http_client(),
+                http_async_client=get_async_http_client(),
+            )
+            _LLM_CACHE[cache_key] = llm
+        return llm
 
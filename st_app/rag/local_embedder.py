@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import zlib
+from typing import List, Tuple
+
+import numpy as np
+
+from st_app.rag.embed_cache import normalize_text
+
+DEFAULT_LOCAL_DIM = 512
+DEFAULT_NGRAM_RANGE = (1, 3)
+
+
+class LocalHashEmbeddings:
+    """
+    네트워크 없이 CPU에서 계산하는 해시 문자 n-gram 임베딩 (UpstageEmbeddingsMinimal 대체용).
+    정규화한 본문의 문자 n-gram을 crc32로 dim개 버킷에 부호와 함께 더한 뒤 L2 정규화합니다.
+    같은 입력은 항상 같은 벡터가 되므로 인덱스 빌드/벤치마크를 그대로 재현할 수 있습니다.
+    쿼리와 문서를 같은 방식으로 임베딩합니다.
+    """
+
+    def __init__(self, dim: int = DEFAULT_LOCAL_DIM, ngram_range: Tuple[int, int] = DEFAULT_NGRAM_RANGE):
+        if dim <= 0:
+            raise ValueError(f"dim은 양수여야 합니다: {dim}")
+        self.dim = int(dim)
+        self.ngram_range = (int(ngram_range[0]), int(ngram_range[1]))
+        # 임베딩 캐시/메타데이터에서 다른 모델과 구분하기 위한 이름
+        self.model_query = self.model_passage = f"local-hash-{self.dim}-{self.ngram_range[0]}{self.ngram_range[1]}"
+
+    def __call__(self, text: str):
+        return self.embed_query(text)
+
+    def _grams(self, text: str) -> List[str]:
+        # 단어 경계를 n-gram에 남기기 위해 공백을 구분 문자로 바꿔 앞뒤에 붙입니다.
+        compact = f" {normalize_text(text).lower()} ".replace(" ", "▁")
+        low, high = self.ngram_range
+        return [compact[i:i + n] for n in range(low, high + 1) for i in range(len(compact) - n + 1)]
+
+    def embed_vector(self, text: str) -> np.ndarray:
+        grams = self._grams(text)
+        if not grams:
+            return np.zeros(self.dim, dtype=np.float32)
+        hashes = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint32, count=len(grams))
+        # 하위 비트는 버킷, 최상위 비트는 부호 → 충돌한 n-gram끼리 서로 상쇄되어 편향이 줄어듭니다.
+        signs = np.where(hashes >> 31, -1.0, 1.0)
+        vec = np.bincount(hashes % self.dim, weights=signs, minlength=self.dim).astype(np.float32)
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm > 0 else vec
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_vector(text).tolist()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        # 수십 µs짜리 CPU 계산이라 스레드로 넘기지 않고 바로 계산합니다.
+        return self.embed_query(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_vector(t).tolist() for t in texts]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
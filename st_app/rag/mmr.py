@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_MMR_LAMBDA = 0.7    # 1이면 관련도만, 0이면 다양성만
+DEFAULT_MMR_FETCH_K = 20    # MMR 후보 수
+
+
+def _rescale(scores: np.ndarray, lo: float, hi: float) -> np.ndarray:
+    """scores를 [lo, hi]로 선형 변환합니다. 순서는 유지되고, 값이 모두 같으면 hi."""
+    low, span = float(scores.min()), float(scores.max() - scores.min())
+    if span <= 0:
+        return np.full(len(scores), hi, dtype=np.float32)
+    return (lo + (scores - low) / span * (hi - lo)).astype(np.float32)
+
+
+def mmr_select(query_vector: np.ndarray, candidate_vectors: np.ndarray, k: int,
+               lambda_mult: float = DEFAULT_MMR_LAMBDA,
+               relevance: Optional[Sequence[float]] = None) -> List[int]:
+    """
+    Maximal Marginal Relevance로 후보 중 k개의 순서(후보 인덱스)를 고릅니다.
+      score(d) = λ·rel(d) − (1−λ)·max_{s∈선택됨} cos(d, s)
+    rel(d)은 기본적으로 cos(q, d)입니다. relevance(후보별 점수, 예: 하이브리드 검색의 RRF 점수)를 주면
+    그 순서를 그대로 쓰되 후보들의 cos(q, d) 범위로 다시 맞춰, λ가 다양성 항과 같은 척도에서 동작하게 합니다.
+    질의-후보 유사도는 행렬-벡터 곱 한 번으로 구하고, 각 단계에서는 방금 고른 문서와의 유사도 한 줄만
+    행렬-벡터 곱으로 구해 '선택된 문서와의 최대 유사도' 벡터를 np.maximum으로 갱신합니다.
+    m×m 유사도 행렬 전체를 만들지 않으므로 비용은 O(k·m·d)입니다(4096차원에서 전체 행렬보다 수 배 빠름).
+    """
+    m = len(candidate_vectors)
+    if m == 0 or k <= 0:
+        return []
+    candidates = np.asarray(candidate_vectors, dtype=np.float32)
+    query = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+    norms = np.maximum(np.sqrt(np.einsum("ij,ij->i", candidates, candidates)), 1e-12)
+    cosine = (candidates @ query) / (norms * max(float(np.linalg.norm(query)), 1e-12))
+    if relevance is None:
+        relevance = cosine
+    else:
+        relevance = _rescale(np.asarray(relevance, dtype=np.float32), float(cosine.min()), float(cosine.max()))
+
+    selected: List[int] = []
+    redundancy = np.zeros(m, dtype=np.float32)
+    scores = lambda_mult * relevance
+    for step in range(min(k, m)):
+        best = int(np.argmax(scores))
+        selected.append(best)
+        if step + 1 == min(k, m):
+            break
+        similarity = (candidates @ candidates[best]) / (norms * norms[best])
+        redundancy = similarity if step == 0 else np.maximum(redundancy, similarity)
+        scores = lambda_mult * relevance - (1.0 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+    return selected
@@ -25,6 +25,31 @@ ROUTER_SYSTEM_PROMPT = """
 
 
 
+# 라우팅 + chat 응답을 한 번의 호출로 (ROUTER_COMBINED). chat이면 answer에 최종 답변까지 담습니다.
+ROUTER_COMBINED_PROMPT = """
+너는 사용자의 발화를 다음 중 하나로 분류한다.
+- chat: 일반 대화/잡담/감상
+- subject_info: 대상(가게/제품) 자체 정보 문의 (대표 메뉴, 위치, 영업시간, 가격, 대기줄 등)
+- rag_review: 리뷰 내용을 바탕으로 한 정보 요청/검색 (예: "짜다는 리뷰 많아?", "면발 평가 어때?", "친절하다는 리뷰 보여줘")
+
+route가 chat이면 너는 친절한 한국어 비서로서 사용자에게 할 최종 답변을 answer에 간결하고 정확하게 쓴다.
+route가 chat이 아니면 answer는 null로 둔다.
+
+반드시 아래 '정확한 JSON 한 줄'로만 출력한다. 다른 말은 절대 하지 마라.
+형식: {{"route":"<chat|subject_info|rag_review>","subject":"<문자열 또는 null>","answer":"<chat일 때 답변, 아니면 null>"}}
+
+예시:
+입력: "명동교자 대표 메뉴 뭐야?"
+출력: {{"route":"subject_info","subject":"명동교자 본점","answer":null}}
+
+입력: "짜다는 리뷰 많아?"
+출력: {{"route":"rag_review","subject":"명동교자 본점","answer":null}}
+
+입력: "안녕?"
+출력: {{"route":"chat","subject":null,"answer":"안녕하세요! 무엇을 도와드릴까요?"}}
+""".strip()
+
+
 SUBJECT_INFO_PROMPT = (
     """
 당신은 주어진 대상의 기본 정보를 요약하여 한국어로 답하는 비서입니다.
@@ -42,3 +67,14 @@ RAG_REVIEW_PROMPT = (
 """.strip()
 )
 
+
+
+HISTORY_SUMMARY_PROMPT = (
+    """
+너는 대화 요약기다. 사용자와 비서가 나눈 이전 대화를 이어지는 대화에 필요한 내용만 남겨 한국어로 요약한다.
+규칙:
+- 언급된 대상(가게/제품), 사용자의 요청과 선호, 이미 답한 핵심 내용을 남긴다.
+- 인사나 잡담은 버리고, 기존 요약이 있으면 새 대화와 합쳐 하나의 요약으로 다시 쓴다.
+- {max_tokens}토큰 이내의 짧은 문단 하나로만 출력한다.
+""".strip()
+)
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from st_app.rag.embed_cache import EmbeddingCache, normalize_text
+
+DEFAULT_QUERY_CACHE_SIZE = 1024
+DEFAULT_QUERY_CACHE_TTL = 24 * 60 * 60   # 초
+
+# "짜다는 리뷰 많아?"와 "짜다는 리뷰 많아"를 같은 질문으로 봅니다.
+_TRAILING_PUNCT_RE = re.compile(r"[\s?!.~…]+$")
+
+
+def normalize_query(text: str) -> str:
+    """쿼리 캐시 키: 유니코드/공백 정규화 + 소문자화 + 끝의 문장부호 제거."""
+    return _TRAILING_PUNCT_RE.sub("", normalize_text(text).lower())
+
+
+class CachedQueryEmbeddings:
+    """
+    embed_query 앞에 두는 쿼리 임베딩 캐시.
+    정규화된 질문을 키로 메모리 LRU(max_entries, ttl_seconds)를 먼저 보고,
+    persist(EmbeddingCache)가 있으면 디스크를 다음으로 확인한 뒤에야 실제 임베더를 호출합니다.
+    디스크 항목도 저장 시각 기준으로 ttl_seconds가 지나면 쓰지 않고 다시 임베딩합니다.
+    정규화는 조회 키에만 쓰고 임베딩은 원래 질문으로 하므로, 캐시를 켜도 처음 보는 질문의 벡터는 달라지지 않습니다.
+    문서 임베딩(embed_documents)은 캐시하지 않고 그대로 넘깁니다.
+    """
+
+    def __init__(self, base, max_entries: int = DEFAULT_QUERY_CACHE_SIZE,
+                 ttl_seconds: float = DEFAULT_QUERY_CACHE_TTL, persist: Optional[EmbeddingCache] = None):
+        self.base = base
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self.persist = persist
+        self._entries: "OrderedDict[str, Tuple[List[float], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    @property
+    def model_query(self) -> str:
+        return self.base.model_query
+
+    @property
+    def model_passage(self) -> str:
+        return self.base.model_passage
+
+    def __call__(self, text: str):
+        return self.embed_query(text)
+
+    def _get_memory(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            vector, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expired += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def _put_memory(self, key: str, vector: List[float], age: float = 0.0) -> None:
+        """age: 디스크에서 읽은 항목이 저장된 뒤 지난 시간(초). 남은 TTL만큼만 메모리에 둡니다."""
+        with self._lock:
+            self._entries[key] = (vector, time.monotonic() + self.ttl_seconds - age)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _from_disk(self, entry: Optional[Tuple[np.ndarray, float]], key: str) -> Optional[List[float]]:
+        if entry is None:
+            return None
+        stored, created_at = entry
+        vector = stored.tolist()
+        with self._lock:
+            self.disk_hits += 1
+        self._put_memory(key, vector, age=max(0.0, time.time() - created_at))
+        return vector
+
+    def embed_query(self, text: str) -> List[float]:
+        key = normalize_query(text)
+        vector = self._get_memory(key)
+        if vector is not None:
+            return vector
+
+        if self.persist is not None:
+            vector = self._from_disk(self.persist.get_entries([key], self.model_query, self.ttl_seconds)[0], key)
+            if vector is not None:
+                return vector
+
+        with self._lock:
+            self.misses += 1
+        vector = np.asarray(self.base.embed_query(text), dtype=np.float32).tolist()
+        self._put_memory(key, vector)
+        if self.persist is not None:
+            self.persist.put_many([key], self.model_query, [vector])
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """embed_query의 비동기 버전. 디스크 캐시 조회는 스레드에서, 실제 임베딩은 기반 임베더의 aembed_query로 기다립니다."""
+        key = normalize_query(text)
+        vector = self._get_memory(key)
+        if vector is not None:
+            return vector
+
+        if self.persist is not None:
+            entries = await asyncio.to_thread(self.persist.get_entries, [key], self.model_query, self.ttl_seconds)
+            vector = self._from_disk(entries[0], key)
+            if vector is not None:
+                return vector
+
+        with self._lock:
+            self.misses += 1
+        if hasattr(self.base, "aembed_query"):
+            raw = await self.base.aembed_query(text)
+        else:
+            raw = await asyncio.to_thread(self.base.embed_query, text)
+        vector = np.asarray(raw, dtype=np.float32).tolist()
+        self._put_memory(key, vector)
+        if self.persist is not None:
+            await asyncio.to_thread(self.persist.put_many, [key], self.model_query, [vector])
+        return vector
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        여러 질문을 한꺼번에 임베딩합니다. 캐시에 없는 질문만 모아(중복 제거)
+        embed_queries 한 번(기반 임베더에 없으면 embed_query 반복)으로 임베딩합니다.
+        """
+        keys = [normalize_query(t) for t in texts]
+        originals = {}
+        for key, text in zip(keys, texts):
+            originals.setdefault(key, text)   # 같은 키의 질문 중 처음 것을 임베딩
+        found: Dict[str, List[float]] = {}
+        for key in dict.fromkeys(keys):
+            vector = self._get_memory(key)
+            if vector is not None:
+                found[key] = vector
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+
+        if missing and self.persist is not None:
+            for key, entry in zip(missing, self.persist.get_entries(missing, self.model_query, self.ttl_seconds)):
+                vector = self._from_disk(entry, key)
+                if vector is not None:
+                    found[key] = vector
+            missing = [key for key in missing if key not in found]
+
+        if missing:
+            with self._lock:
+                self.misses += len(missing)
+            if hasattr(self.base, "embed_queries"):
+                fresh = self.base.embed_queries([originals[key] for key in missing])
+            else:
+                fresh = [self.base.embed_query(originals[key]) for key in missing]
+            fresh = [np.asarray(v, dtype=np.float32).tolist() for v in fresh]
+            for key, vector in zip(missing, fresh):
+                found[key] = vector
+                self._put_memory(key, vector)
+            if self.persist is not None:
+                self.persist.put_many(missing, self.model_query, fresh)
+        return [found[key] for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.base.embed_documents(texts)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": ((self.hits + self.disk_hits) / lookups) if lookups else 0.0,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def with_query_cache(embedder):
+    """
+    환경변수 설정에 따라 embedder를 쿼리 캐시로 감쌉니다.
+      QUERY_CACHE_SIZE (0이면 끔), QUERY_CACHE_TTL(초), QUERY_CACHE_PATH(지정 시 SQLite로 영속화)
+    """
+    size = int(os.getenv("QUERY_CACHE_SIZE") or DEFAULT_QUERY_CACHE_SIZE)
+    if size <= 0:
+        return embedder
+    ttl = float(os.getenv("QUERY_CACHE_TTL") or DEFAULT_QUERY_CACHE_TTL)
+    path = os.getenv("QUERY_CACHE_PATH")
+    persist = EmbeddingCache(path, max_entries=size * 10) if path and path.lower() != "off" else None
+    return CachedQueryEmbeddings(embedder, max_entries=size, ttl_seconds=ttl, persist=persist)
@@ -1,44 +1,316 @@
 from __future__ import annotations
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Sequence, Tuple, Optional
+import asyncio
 import os
+import time
+import numpy as np
 from dotenv import load_dotenv
 
 from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
 
-# embedder.py의 미니 임베더를 import (경로 맞춤)
-from st_app.rag.embedder import UpstageEmbeddingsMinimal
+# embedder.py의 임베딩 제공자 선택 함수를 import (경로 맞춤)
+from st_app.rag.embedder import embedding_model_for_index
+from st_app.rag.index_io import load_store
+from st_app.rag.query_cache import with_query_cache
+from st_app.rag.filters import FieldIndex, ReviewFilter
+from st_app.rag.index_factory import filtered_search, reconstruct_positions
+from st_app.rag.mmr import DEFAULT_MMR_FETCH_K, DEFAULT_MMR_LAMBDA, mmr_select
+from st_app.utils.metrics import LatencyRecorder
+
+# 하이브리드 검색(밀집 + BM25) 기본값
+DEFAULT_DENSE_WEIGHT = 1.0
+DEFAULT_BM25_WEIGHT = 1.0
+DEFAULT_RRF_K = 60
+DEFAULT_HYBRID_CANDIDATES = 30   # 각 검색기에서 가져와 합칠 후보 수
+DEFAULT_QUERY_EMBED_BATCH_SIZE = 64   # 배치 검색 시 한 임베딩 요청에 담을 질문 수 (Upstage 요청당 최대 100개)
+
+RETRIEVAL_LATENCY = LatencyRecorder()
 
 def _load_store(index_dir: str = "st_app/db/faiss_index") -> Optional[FAISS]:
     load_dotenv()
-    api_key = os.getenv("UPSTAGE_API_KEY") or os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        print("UPSTAGE_API_KEY/OPENAI_API_KEY 미설정")
+    try:
+        # 인덱스를 만든 제공자(upstage/local)와 같은 임베딩으로 쿼리를 임베딩해야 합니다.
+        # 같은 질문이 반복되면 네트워크 없이 캐시된 쿼리 벡터를 사용 (QUERY_CACHE_* 환경변수)
+        emb = with_query_cache(embedding_model_for_index(index_dir))
+    except RuntimeError as e:
+        print(e)
         return None
-    base_url = os.getenv("UPSTAGE_BASE_URL") or os.getenv("OPENAI_BASE_URL") or "https://api.upstage.ai/v1"
-    emb = UpstageEmbeddingsMinimal(api_key=api_key, base_url=base_url, model_query="solar-embedding-1-large-query")
     try:
-        store = FAISS.load_local(index_dir, embeddings=emb, allow_dangerous_deserialization=True)
+        # 저장된 인덱스 종류(Flat/IVF/HNSW/PQ)와 검색 파라미터(meta.json)를 그대로 복원
+        store = load_store(index_dir, emb)
         return store
     except Exception as e:
         print(f"FAISS 인덱스 로드 실패: {e}")
         return None
 
-def retrieve_reviews(store: Optional[FAISS], query: str, k: int = 4) -> Tuple[str, List[Dict]]:
-    if (store is None) or (not query.strip()):
-        return "", []
-    results: List[Tuple[Document, float]] = store.similarity_search_with_score(query, k=k)
-    snippets, citations = [], []
-    for doc, score in results:
-        snippet = doc.page_content.strip()
-        meta = doc.metadata or {}
-        if str(meta.get("id", "")) == "dummy":
+def query_cache_stats(store: Optional[FAISS]) -> Dict[str, float]:
+    """스토어의 쿼리 임베딩 캐시 적중 통계. 캐시를 쓰지 않으면 빈 dict."""
+    stats = getattr(getattr(store, "embedding_function", None), "stats", None)
+    return stats() if callable(stats) else {}
+
+def reciprocal_rank_fusion(rankings: Sequence[Tuple[Sequence[int], float]], rrf_k: int = DEFAULT_RRF_K
+                           ) -> List[Tuple[int, float]]:
+    """
+    여러 순위 목록(문서 위치, 가중치)을 RRF로 합칩니다: score(d) = Σ w / (rrf_k + rank(d)), rank는 1부터.
+    점수가 높은 순으로 (위치, 점수)를 돌려주며, 동점은 먼저 나온 목록의 순위를 따릅니다.
+    """
+    fused: Dict[int, float] = {}
+    for positions, weight in rankings:
+        if weight <= 0:
             continue
-        citations.append({
-            "id": str(meta.get("id", "")),
-            "source": str(meta.get("source", "")),
-            "score": float(score),
-            "snippet": snippet[:300],
-        })
-        snippets.append(snippet)
-    return "\n\n".join(snippets), citations
+        for rank, pos in enumerate(positions, start=1):
+            fused[int(pos)] = fused.get(int(pos), 0.0) + weight / (rrf_k + rank)
+    return sorted(fused.items(), key=lambda item: -item[1])
+
+def hybrid_settings() -> Dict[str, float]:
+    """HYBRID_DENSE_WEIGHT / HYBRID_BM25_WEIGHT(0이면 해당 검색 끔) / HYBRID_RRF_K / HYBRID_CANDIDATES"""
+    return {
+        "dense_weight": float(os.getenv("HYBRID_DENSE_WEIGHT") or DEFAULT_DENSE_WEIGHT),
+        "bm25_weight": float(os.getenv("HYBRID_BM25_WEIGHT") or DEFAULT_BM25_WEIGHT),
+        "rrf_k": int(os.getenv("HYBRID_RRF_K") or DEFAULT_RRF_K),
+        "candidates": int(os.getenv("HYBRID_CANDIDATES") or DEFAULT_HYBRID_CANDIDATES),
+    }
+
+def mmr_settings() -> Dict[str, float]:
+    """MMR_ENABLED(기본 켬) / MMR_LAMBDA(관련도 비중) / MMR_FETCH_K(후보 수)"""
+    return {
+        "enabled": (os.getenv("MMR_ENABLED") or "true").lower() not in ("0", "false", "no", "off"),
+        "lambda_mult": float(os.getenv("MMR_LAMBDA") or DEFAULT_MMR_LAMBDA),
+        "fetch_k": int(os.getenv("MMR_FETCH_K") or DEFAULT_MMR_FETCH_K),
+    }
+
+def retrieval_metrics() -> Dict[str, Dict[str, float]]:
+    """검색 단계별(filter/embed/dense/bm25/fuse/mmr/fetch/total, 배치 검색은 batch_*) 지연 통계(ms)."""
+    return RETRIEVAL_LATENCY.snapshot()
+
+def _embed_query(store: FAISS, query: str) -> np.ndarray:
+    emb = store.embedding_function
+    vector = emb.embed_query(query) if hasattr(emb, "embed_query") else emb(query)
+    return np.asarray([vector], dtype=np.float32)
+
+async def _aembed_query(store: FAISS, query: str) -> np.ndarray:
+    emb = store.embedding_function
+    if not hasattr(emb, "aembed_query"):
+        return await asyncio.to_thread(_embed_query, store, query)
+    return np.asarray([await emb.aembed_query(query)], dtype=np.float32)
+
+def _field_index(store: FAISS) -> FieldIndex:
+    field_index = getattr(store, "field_index", None)
+    if field_index is None:
+        # ReviewStore가 아닌 스토어는 한 번 만들어 붙여 둡니다.
+        field_index = FieldIndex.from_store(store, getattr(store, "tombstones", set()))
+        store.field_index = field_index
+    return field_index
+
+def _plan(store: FAISS, k: int, filters: Optional[ReviewFilter], mmr: Optional[bool],
+          lambda_mult: Optional[float], fetch_k: Optional[int]) -> Optional[Dict]:
+    """검색 설정과 필터 허용 위치를 한 번 정리합니다. 필터에 맞는 리뷰가 없으면 None."""
+    settings = hybrid_settings()
+    bm25 = getattr(store, "bm25", None)
+    use_bm25 = bm25 is not None and settings["bm25_weight"] > 0
+    with RETRIEVAL_LATENCY.timer("filter"):
+        field_index = _field_index(store)
+        allowed = field_index.select(filters)
+    if allowed is not None and len(allowed) == 0:
+        return None
+    diversity = mmr_settings()
+    use_mmr = diversity["enabled"] if mmr is None else mmr
+    fetch_k = max(k, int(diversity["fetch_k"] if fetch_k is None else fetch_k))
+    pool = max(k, int(settings["candidates"])) if use_bm25 else k
+    if use_mmr:
+        pool = max(pool, fetch_k)
+    return {
+        "settings": settings,
+        "bm25": bm25 if use_bm25 else None,
+        "use_dense": settings["dense_weight"] > 0 or not use_bm25,
+        "allowed": allowed,
+        "excluded": field_index.excluded,
+        "use_mmr": use_mmr,
+        "lambda_mult": diversity["lambda_mult"] if lambda_mult is None else lambda_mult,
+        "fetch_k": fetch_k,
+        "pool": min(pool, store.index.ntotal),
+    }
+
+def _rank_and_fetch(store: FAISS, query: str, k: int, plan: Dict, vector: Optional[np.ndarray],
+                    dense_dists: Optional[np.ndarray], dense_positions: Optional[np.ndarray]) -> Tuple[List[str], List[Dict]]:
+    """밀집 검색 결과 한 줄(없으면 None)에 BM25를 합치고 MMR 후 문서를 꺼내 (리뷰 본문 목록, 인용)을 만듭니다."""
+    settings, bm25 = plan["settings"], plan["bm25"]
+    use_bm25 = bm25 is not None
+    tombstones = getattr(store, "tombstones", set())
+    rankings: List[Tuple[Sequence[int], float]] = []
+    distances: Dict[int, float] = {}
+    bm25_scores: Dict[int, float] = {}
+    if dense_positions is not None:
+        dense = [(int(p), float(d)) for p, d in zip(dense_positions, dense_dists) if p >= 0]
+        distances = dict(dense)
+        rankings.append(([p for p, _ in dense], settings["dense_weight"] if use_bm25 else 1.0))
+    if use_bm25:
+        with RETRIEVAL_LATENCY.timer("bm25"):
+            positions, scores = bm25.search(query, plan["pool"], allowed=plan["allowed"], excluded=plan["excluded"])
+        bm25_scores = {int(p): float(sc) for p, sc in zip(positions, scores)}
+        rankings.append((positions.tolist(), settings["bm25_weight"]))
+    with RETRIEVAL_LATENCY.timer("fuse"):
+        fused = reciprocal_rank_fusion(rankings, int(settings["rrf_k"]))
+    fetch_k = plan["fetch_k"]
+    if plan["use_mmr"] and len(fused) > k:
+        with RETRIEVAL_LATENCY.timer("mmr"):
+            if vector is None:
+                vector = _embed_query(store, query)[0]
+            head = fused[:fetch_k]
+            vectors = reconstruct_positions(store.index, np.array([pos for pos, _ in head], dtype=np.int64))
+            # 하이브리드 검색이면 BM25가 합쳐진 RRF 점수를 관련도로 씁니다(밀집 코사인만 쓰면 키워드로만 찾은 리뷰가 밀려남).
+            # 코사인은 선택된 리뷰와의 중복(다양성) 항에만 씁니다.
+            relevance = [score for _, score in head] if use_bm25 else None
+            order = mmr_select(vector, vectors, k, plan["lambda_mult"], relevance=relevance)
+            chosen = set(order)
+            # 뒤쪽은 혹시 문서 조회에 실패할 때를 대비한 원래 순서의 예비 후보
+            fused = [head[i] for i in order] + [item for i, item in enumerate(head) if i not in chosen] + fused[fetch_k:]
+
+    snippets, citations = [], []
+    with RETRIEVAL_LATENCY.timer("fetch"):
+        for pos, fused_score in fused:
+            if len(citations) >= k:
+                break
+            doc = store.docstore.search(store.index_to_docstore_id[pos])
+            if not isinstance(doc, Document):
+                continue
+            snippet = doc.page_content.strip()
+            meta = doc.metadata or {}
+            if str(meta.get("id", "")) == "dummy" or str(meta.get("id", "")) in tombstones:
+                continue
+            citation = {
+                "id": str(meta.get("id", "")),
+                "source": str(meta.get("source", "")),
+                "snippet": snippet[:300],
+            }
+            if pos in distances:
+                citation["score"] = distances[pos]
+            if use_bm25:
+                citation["fused_score"] = fused_score
+                if pos in bm25_scores:
+                    citation["bm25_score"] = bm25_scores[pos]
+            if meta.get("sources"):
+                # 근접 중복 병합으로 여러 출처에 같은 리뷰가 있던 경우
+                citation["sources"] = list(meta["sources"])
+            citations.append(citation)
+            snippets.append(snippet)
+    return snippets, citations
+
+def retrieve_reviews(store: Optional[FAISS], query: str, k: int = 4,
+                     filters: Optional[ReviewFilter] = None, mmr: Optional[bool] = None,
+                     lambda_mult: Optional[float] = None, fetch_k: Optional[int] = None) -> Tuple[str, List[Dict]]:
+    """
+    retrieve_review_passages의 리뷰 본문을 빈 줄로 이어 (컨텍스트, 인용)으로 돌려줍니다.
+    """
+    passages, citations = retrieve_review_passages(store, query, k, filters, mmr, lambda_mult, fetch_k)
+    return "\n\n".join(passages), citations
+
+def retrieve_review_passages(store: Optional[FAISS], query: str, k: int = 4,
+                             filters: Optional[ReviewFilter] = None, mmr: Optional[bool] = None,
+                             lambda_mult: Optional[float] = None,
+                             fetch_k: Optional[int] = None) -> Tuple[List[str], List[Dict]]:
+    """
+    FAISS(밀집 벡터)와 BM25(명사 토큰) 결과를 RRF로 합쳐 상위 k개 리뷰를 돌려줍니다.
+    BM25 역색인이 없는 예전 인덱스이거나 HYBRID_BM25_WEIGHT=0이면 밀집 검색만 사용합니다.
+    인용의 score는 밀집 검색 L2 거리(키워드로만 찾은 문서는 없음), fused_score는 RRF 점수입니다.
+
+    filters(출처/별점 범위/날짜 범위)는 미리 계산한 필드 색인으로 허용 위치를 구해 FAISS IDSelector로 넘기므로
+    검색 안에서 걸러지며, 조건에 맞는 리뷰가 k개 이상이면 항상 k개를 돌려줍니다.
+    tombstone/더미 문서도 같은 방식으로 검색 단계에서 제외됩니다.
+
+    mmr=True(기본값은 MMR_ENABLED)이면 합친 결과 상위 fetch_k개의 벡터를 인덱스에서 꺼내
+    MMR(lambda_mult)로 서로 겹치지 않는 k개를 고릅니다. 같은 의견이 반복된 리뷰가 컨텍스트를 채우지 않게 합니다.
+    """
+    if (store is None) or (not query.strip()):
+        return [], []
+    started = time.perf_counter()
+    plan = _plan(store, k, filters, mmr, lambda_mult, fetch_k)
+    if plan is None:
+        RETRIEVAL_LATENCY.record("total", time.perf_counter() - started)
+        return [], []
+    vector = None
+    if plan["use_dense"]:
+        with RETRIEVAL_LATENCY.timer("embed"):
+            vector = _embed_query(store, query)
+    result = _search_and_fetch(store, query, k, plan, vector)
+    RETRIEVAL_LATENCY.record("total", time.perf_counter() - started)
+    return result
+
+async def aretrieve_review_passages(store: Optional[FAISS], query: str, k: int = 4,
+                                    filters: Optional[ReviewFilter] = None, mmr: Optional[bool] = None,
+                                    lambda_mult: Optional[float] = None,
+                                    fetch_k: Optional[int] = None) -> Tuple[List[str], List[Dict]]:
+    """
+    retrieve_review_passages의 비동기 버전(그래프 ainvoke/astream용). 결과는 같습니다.
+    질문 임베딩 요청을 기다리는 동안 이벤트 루프를 양보하고, FAISS/BM25/MMR 계산은 스레드에서 실행합니다.
+    """
+    if (store is None) or (not query.strip()):
+        return [], []
+    started = time.perf_counter()
+    plan = _plan(store, k, filters, mmr, lambda_mult, fetch_k)
+    if plan is None:
+        RETRIEVAL_LATENCY.record("total", time.perf_counter() - started)
+        return [], []
+    vector = None
+    if plan["use_dense"]:
+        with RETRIEVAL_LATENCY.timer("embed"):
+            vector = await _aembed_query(store, query)
+    result = await asyncio.to_thread(_search_and_fetch, store, query, k, plan, vector)
+    RETRIEVAL_LATENCY.record("total", time.perf_counter() - started)
+    return result
+
+def _search_and_fetch(store: FAISS, query: str, k: int, plan: Dict,
+                      vector: Optional[np.ndarray]) -> Tuple[List[str], List[Dict]]:
+    """질문 벡터(1, d)로 밀집 검색한 뒤 _rank_and_fetch. vector가 None이면 BM25만 씁니다."""
+    dists = positions = None
+    if vector is not None:
+        with RETRIEVAL_LATENCY.timer("dense"):
+            dists, positions = filtered_search(store.index, vector, plan["pool"],
+                                               allowed=plan["allowed"], excluded=plan["excluded"])
+        vector, dists, positions = vector[0], dists[0], positions[0]
+    return _rank_and_fetch(store, query, k, plan, vector, dists, positions)
+
+def _embed_queries(store: FAISS, queries: Sequence[str], batch_size: int) -> np.ndarray:
+    emb = store.embedding_function
+    if not hasattr(emb, "embed_queries"):
+        return np.vstack([_embed_query(store, q) for q in queries])
+    vectors: List[List[float]] = []
+    for i in range(0, len(queries), batch_size):
+        vectors.extend(emb.embed_queries(list(queries[i:i + batch_size])))
+    return np.asarray(vectors, dtype=np.float32)
+
+def retrieve_reviews_batch(store: Optional[FAISS], queries: Sequence[str], k: int = 4,
+                           filters: Optional[ReviewFilter] = None, mmr: Optional[bool] = None,
+                           lambda_mult: Optional[float] = None, fetch_k: Optional[int] = None,
+                           batch_size: Optional[int] = None) -> List[Tuple[str, List[Dict]]]:
+    """
+    여러 질문을 한 번에 검색합니다 (오프라인 평가, FAQ 미리 계산용). 결과는 질문 순서대로 retrieve_reviews와 같은 모양입니다.
+    질문은 batch_size개(QUERY_EMBED_BATCH_SIZE)씩 묶어 한 요청으로 임베딩하고,
+    밀집 검색은 (질문 수, 차원) 행렬로 index.search를 한 번만 호출해 FAISS 내부 스레드가 질문들을 나눠 처리합니다.
+    BM25/RRF/MMR/문서 조회는 질문마다 retrieve_reviews와 똑같이 수행합니다. filters는 모든 질문에 공통으로 적용됩니다.
+    """
+    results: List[Tuple[str, List[Dict]]] = [("", []) for _ in queries]
+    valid = [i for i, q in enumerate(queries) if q and q.strip()]
+    if store is None or not valid:
+        return results
+    started = time.perf_counter()
+    plan = _plan(store, k, filters, mmr, lambda_mult, fetch_k)
+    if plan is None:
+        return results
+    vectors = dists = positions = None
+    if plan["use_dense"]:
+        batch_size = max(1, int(batch_size or os.getenv("QUERY_EMBED_BATCH_SIZE") or DEFAULT_QUERY_EMBED_BATCH_SIZE))
+        with RETRIEVAL_LATENCY.timer("batch_embed"):
+            vectors = _embed_queries(store, [queries[i] for i in valid], batch_size)
+        with RETRIEVAL_LATENCY.timer("batch_dense"):
+            dists, positions = filtered_search(store.index, vectors, plan["pool"],
+                                               allowed=plan["allowed"], excluded=plan["excluded"])
+    for row, i in enumerate(valid):
+        if vectors is None:
+            passages, citations = _rank_and_fetch(store, queries[i], k, plan, None, None, None)
+        else:
+            passages, citations = _rank_and_fetch(store, queries[i], k, plan, vectors[row], dists[row], positions[row])
+        results[i] = ("\n\n".join(passages), citations)
+    RETRIEVAL_LATENCY.record("batch_total", time.perf_counter() - started)
+    return results
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from langchain_community.vectorstores import FAISS
+
+from st_app.rag.index_io import INDEX_FILE, LEGACY_DOCSTORE_FILE, META_FILE
+from st_app.rag.retriever import _load_store
+
+DEFAULT_INDEX_DIR = os.path.join("st_app", "db", "faiss_index")
+
+# 인덱스 변경 확인 주기(초). 0이면 매 호출마다 확인, "off"이면 처음 한 번만 로드하고 다시 보지 않습니다.
+DEFAULT_RELOAD_INTERVAL = 5.0
+
+Signature = Tuple[Tuple[str, int, int], ...]
+
+
+def index_signature(index_dir: str) -> Optional[Signature]:
+    """
+    인덱스 버전 식별값: meta.json(매니페스트)의 (mtime_ns, 크기).
+    save_store는 인덱스/문서 저장소/BM25 파일을 모두 교체한 뒤 meta.json을 마지막에 쓰므로,
+    meta.json이 바뀌었다는 것은 새 버전이 다 기록되었다는 뜻입니다.
+    meta.json이 없는 예전 인덱스는 index.faiss/index.pkl을 봅니다. 파일이 없으면 None.
+    """
+    names = [META_FILE] if os.path.exists(os.path.join(index_dir, META_FILE)) else [INDEX_FILE, LEGACY_DOCSTORE_FILE]
+    parts = []
+    for name in names:
+        try:
+            st = os.stat(os.path.join(index_dir, name))
+        except FileNotFoundError:
+            continue
+        parts.append((name, st.st_mtime_ns, st.st_size))
+    return tuple(parts) or None
+
+
+def _reload_interval() -> Optional[float]:
+    value = (os.getenv("STORE_RELOAD_INTERVAL") or "").strip().lower()
+    if value in ("off", "false", "no", "-1"):
+        return None
+    return float(value) if value else DEFAULT_RELOAD_INTERVAL
+
+
+class StoreManager:
+    """
+    프로세스에서 하나의 읽기 전용 FAISS 스토어를 공유하고, 인덱스가 다시 만들어지면 새 버전으로 바꿉니다.
+      - 지연 로드: 처음 get()할 때 로드합니다 (그래프 import가 인덱스 역직렬화를 기다리지 않음).
+      - 핫 리로드: interval초마다 meta.json을 stat해 바뀌었으면 새 스토어를 만든 뒤 참조 하나만 교체합니다.
+        이미 이전 스토어를 받아 간 검색은 그 스토어로 끝까지 수행됩니다. 인덱스 파일은 덮어쓰지 않고
+        os.replace로 교체되므로 이전 스토어의 메모리 매핑도 그대로 유효합니다.
+      - 다시 로드하는 동안 다른 스레드는 기다리지 않고 이전 스토어를 씁니다(처음 로드만 기다림).
+      - 새 버전 로드에 실패하면 이전 스토어를 계속 쓰고, 그 버전은 파일이 다시 바뀔 때까지 재시도하지 않습니다.
+    """
+
+    def __init__(self, index_dir: str, loader: Callable[[str], Optional[FAISS]] = _load_store,
+                 interval: Optional[float] = DEFAULT_RELOAD_INTERVAL):
+        self.index_dir = index_dir
+        self.loader = loader
+        self.interval = interval
+        self._store: Optional[FAISS] = None
+        self._signature: Optional[Signature] = None
+        self._failed: Optional[Signature] = None
+        self._loaded_once = False
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    @property
+    def signature(self) -> Optional[Signature]:
+        return self._signature
+
+    def get(self) -> Optional[FAISS]:
+        """현재 스토어(인덱스를 불러오지 못했으면 None)."""
+        if not self._loaded_once:
+            with self._lock:
+                if not self._loaded_once:
+                    self._load(index_signature(self.index_dir))
+                    self._loaded_once = True
+            return self._store
+        if self.interval is not None and time.monotonic() - self._checked_at >= self.interval:
+            self._checked_at = time.monotonic()
+            signature = index_signature(self.index_dir)
+            if signature != self._signature and signature != self._failed and self._lock.acquire(blocking=False):
+                try:
+                    signature = index_signature(self.index_dir)
+                    if signature != self._signature:
+                        self._load(signature)
+                finally:
+                    self._lock.release()
+        return self._store
+
+    async def aget(self) -> Optional[FAISS]:
+        """
+        get의 비동기 버전. 로드/변경 확인이 필요 없으면 바로 돌려주고,
+        필요할 때만(첫 로드, STORE_RELOAD_INTERVAL마다의 확인) 스레드에서 get을 실행해 이벤트 루프를 막지 않습니다.
+        """
+        if self._loaded_once and (self.interval is None or time.monotonic() - self._checked_at < self.interval):
+            return self._store
+        return await asyncio.to_thread(self.get)
+
+    def reload(self) -> Optional[FAISS]:
+        """변경 여부와 관계없이 지금 다시 로드합니다."""
+        with self._lock:
+            self._failed = None
+            self._load(index_signature(self.index_dir))
+            self._loaded_once = True
+        return self._store
+
+    def _load(self, signature: Optional[Signature]) -> None:
+        # 호출자가 self._lock을 잡고 있어야 합니다.
+        self._checked_at = time.monotonic()
+        started = time.perf_counter()
+        store = self.loader(self.index_dir)
+        if store is None:
+            self._failed = signature
+            if self._store is not None:
+                print(f"새 인덱스 로드에 실패해 이전 인덱스를 계속 사용합니다: {self.index_dir}")
+            return
+        old = self._store
+        if old is not None:
+            # 임베딩 모델이 같으면 쿼리 캐시를 새 스토어로 넘깁니다.
+            old_emb, new_emb = old.embedding_function, store.embedding_function
+            if getattr(old_emb, "model_query", None) == getattr(new_emb, "model_query", None):
+                store.embedding_function = old_emb
+        self._store = store   # 참조 교체 한 번 — 다른 스레드는 이전 또는 새 스토어 중 하나를 온전히 봅니다.
+        self._signature = signature
+        self._failed = None
+        if old is not None:
+            self.reloads += 1
+            print(f"인덱스가 바뀌어 다시 불러왔습니다 ({self.index_dir}, 문서 {store.index.ntotal}개, "
+                  f"{(time.perf_counter() - started) * 1000:.0f}ms)")
+
+
+_managers: Dict[str, StoreManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_store_manager(index_dir: str = DEFAULT_INDEX_DIR) -> StoreManager:
+    """인덱스 디렉터리별 프로세스 공용 StoreManager (Streamlit 세션/스레드가 함께 씁니다). STORE_RELOAD_INTERVAL 참고."""
+    key = os.path.abspath(index_dir)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = _managers[key] = StoreManager(index_dir, interval=_reload_interval())
+        return manager
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator
+
+import numpy as np
+
+DEFAULT_WINDOW = 1024   # 분위수 계산에 쓰는 최근 샘플 수
+
+
+class LatencyRecorder:
+    """
+    이름(엔드포인트/단계)별 지연 시간 기록기. 스레드 안전합니다.
+    누적 횟수·합계와 최근 window개 샘플의 p50/p95를 제공합니다.
+    """
+
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self.window = max(1, int(window))
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+        self._totals: Dict[str, float] = {}
+        self._errors: Dict[str, int] = {}
+
+    def record(self, name: str, seconds: float, error: bool = False) -> None:
+        with self._lock:
+            self._samples.setdefault(name, deque(maxlen=self.window)).append(seconds)
+            self._counts[name] = self._counts.get(name, 0) + 1
+            self._totals[name] = self._totals.get(name, 0.0) + seconds
+            if error:
+                self._errors[name] = self._errors.get(name, 0) + 1
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.record(name, time.perf_counter() - started, error=failed)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """{이름: {count, errors, mean_ms, p50_ms, p95_ms, max_ms}}"""
+        with self._lock:
+            items = [(name, np.array(samples), self._counts[name], self._totals[name], self._errors.get(name, 0))
+                     for name, samples in self._samples.items()]
+        out: Dict[str, Dict[str, float]] = {}
+        for name, samples, count, total, errors in items:
+            out[name] = {
+                "count": count,
+                "errors": errors,
+                "mean_ms": total / count * 1000,
+                "p50_ms": float(np.percentile(samples, 50)) * 1000,
+                "p95_ms": float(np.percentile(samples, 95)) * 1000,
+                "max_ms": float(samples.max()) * 1000,
+            }
+        return out
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+            self._totals.clear()
+            self._errors.clear()
+
+
+class ValueRecorder:
+    """
+    이름별 수치(토큰 수 등) 기록기. LatencyRecorder와 같은 방식으로
+    누적 횟수·합계와 최근 window개 샘플의 p50/p95를 제공합니다.
+    """
+
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self.window = max(1, int(window))
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+        self._totals: Dict[str, float] = {}
+
+    def record(self, name: str, value: float) -> None:
+        with self._lock:
+            self._samples.setdefault(name, deque(maxlen=self.window)).append(float(value))
+            self._counts[name] = self._counts.get(name, 0) + 1
+            self._totals[name] = self._totals.get(name, 0.0) + float(value)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """{이름: {count, total, mean, p50, p95, max}}"""
+        with self._lock:
+            items = [(name, np.array(samples), self._counts[name], self._totals[name])
+                     for name, samples in self._samples.items()]
+        return {
+            name: {
+                "count": count,
+                "total": total,
+                "mean": total / count,
+                "p50": float(np.percentile(samples, 50)),
+                "p95": float(np.percentile(samples, 95)),
+                "max": float(samples.max()),
+            }
+            for name, samples, count, total in items
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+            self._totals.clear()
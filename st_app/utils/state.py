@@ -9,7 +9,10 @@ class Message(TypedDict):
 class Citation(TypedDict, total=False):
     id: str
     source: str
-    score: float
+    sources: List[str]
+    score: float          # 밀집 검색 L2 거리 (작을수록 가까움)
+    bm25_score: float
+    fused_score: float    # 하이브리드 검색 RRF 점수 (클수록 관련)
     snippet: str
 
 
@@ -21,6 +24,11 @@ class GraphState(TypedDict):
     citations: List[Citation]
     response: str
     last_node: Optional[Literal["chat", "subject_info", "rag_review"]]
+    cache_hit: bool          # 시맨틱 답변 캐시에서 응답을 가져왔는지
+    started_at: float        # 라우터 진입 시각(perf_counter) — 캐시가 절약한 시간 계산용
+    prefetched: Optional[Dict[str, Any]]   # 라우터가 LLM 호출과 동시에 미리 검색한 리뷰 (rag_review 노드가 한 번 쓰고 비움)
+    history_summary: str     # history 앞부분(history_folded개 메시지)을 접은 롤링 요약 (st_app/graph/history.py)
+    history_folded: int
 
 
 def get_last_user_message(history: List[Message]) -> Optional[str]:
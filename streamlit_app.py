@@ -1,9 +1,16 @@
 import os
+import uuid
 from typing import Dict, List
 
 import streamlit as st
 
 from st_app.graph.router import build_graph
+from st_app.graph.intent import intent_stats
+from st_app.graph.speculative import speculation_stats
+from st_app.graph.history import history_stats
+from st_app.graph.streaming import response_latency_metrics, stream_turn
+from st_app.rag.answer_cache import answer_cache_stats
+from st_app.rag.context import prompt_token_metrics
 from st_app.utils.state import GraphState
 
 
@@ -37,10 +44,18 @@ def init_session() -> None:
     if "graph" not in st.session_state:
         st.session_state.graph = build_graph()
     if "thread_id" not in st.session_state:
-        import uuid
         st.session_state.thread_id = uuid.uuid4().hex
 
 
+def _render_citations(citations: List[Dict]) -> None:
+    if not citations:
+        return
+    with st.expander("참고 문서"):
+        for c in citations:
+            source = ", ".join(c.get("sources") or [c.get("source", "unknown")])
+            st.markdown(f"- 출처: {source} | id: {c.get('id', '')}")
+
+
 def main() -> None:
     st.set_page_config(page_title="RAG + Agent LangGraph 데모", page_icon="🤖")
     st.title("RAG + Agent LangGraph 데모")
@@ -54,6 +69,8 @@ def main() -> None:
         )
         if st.button("대화 초기화"):
             st.session_state.messages = []
+            # 새 thread_id로 시작해 이전 대화의 롤링 요약을 이어 쓰지 않게 함
+            st.session_state.thread_id = uuid.uuid4().hex
             st.rerun()
 
     _bootstrap_api_keys_from_secrets()
@@ -83,12 +100,24 @@ def main() -> None:
     }
 
     config = {"configurable": {"thread_id": st.session_state.thread_id}}
-    result_state: GraphState = st.session_state.graph.invoke(initial_state, config=config)
-    answer = result_state.get("response", "")
-    citations = result_state.get("citations", [])
-
     with st.chat_message("assistant"):
-        st.markdown(answer if answer else "(응답이 비어 있습니다)")
+        # 토큰이 도착하는 대로 그리고, 리뷰 인용은 검색이 끝나자마자 먼저 보여줌
+        answer_box = st.empty()
+        citation_box = st.empty()
+        streamed = ""
+        result_state: GraphState = initial_state
+        for kind, payload in stream_turn(st.session_state.graph, initial_state, config=config):
+            if kind == "token":
+                streamed += payload
+                answer_box.markdown(streamed + "▌")
+            elif kind == "citations":
+                with citation_box.container():
+                    _render_citations(payload)
+            elif kind == "final":
+                result_state = payload
+        answer = result_state.get("response", "")
+        answer_box.markdown(answer if answer else "(응답이 비어 있습니다)")
+
         # 디버그 정보: 사용된 라우트/노드/주제
         debug_route = result_state.get("route")
         debug_node = result_state.get("last_node")
@@ -98,11 +127,15 @@ def main() -> None:
                 "route": debug_route,
                 "last_node": debug_node,
                 "subject": debug_subject,
+                "answer_cache_hit": bool(result_state.get("cache_hit")),
+                "answer_cache": answer_cache_stats(),
+                "intent": intent_stats(),
+                "speculative_retrieval": speculation_stats(),
+                "history": history_stats(),
+                "prompt_tokens": {name: round(v["mean"], 1) for name, v in prompt_token_metrics().items()},
+                "latency_ms": {name: {"p50": round(v["p50_ms"]), "p95": round(v["p95_ms"])}
+                               for name, v in response_latency_metrics().items()},
             })
-        if citations:
-            with st.expander("참고 문서"):
-                for c in citations:
-                    st.markdown(f"- 출처: {c.get('source', 'unknown')} | id: {c.get('id', '')}")
 
     st.session_state.messages.append({"role": "assistant", "content": answer})
 
@@ -0,0 +1,109 @@
+from types import SimpleNamespace
+
+import pytest
+from st_app.rag import answer_cache
+from st_app.rag.answer_cache import (
+    SemanticAnswerCache, answer_cache_threshold, cache_filter_key, cache_terms_key,
+)
+from st_app.rag.bm25 import BM25Index
+from st_app.rag.local_embedder import LocalHashEmbeddings
+
+
+@pytest.fixture(scope="module")
+def embedder():
+    return LocalHashEmbeddings()
+
+
+@pytest.fixture
+def store():
+    bm25 = BM25Index.build([["직원", "친절"], ["직원", "불친절"], ["칼국수", "국물"], ["만두"]])
+    return SimpleNamespace(meta={"embedding_provider": "local"}, bm25=bm25)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _store(cache, embedder, question, response, version="v1", store=None):
+    cache.store(embedder.embed_query(question), "rag_review", "명동교자", response, [{"id": "r1"}], 1.0,
+                version, filters=cache_filter_key(question), terms=cache_terms_key(store, question))
+
+
+def _lookup(cache, embedder, question, version="v1", store=None):
+    return cache.lookup(embedder.embed_query(question), "명동교자", version=version,
+                        filters=cache_filter_key(question), terms=cache_terms_key(store, question),
+                        threshold=answer_cache_threshold(store) if store is not None else None)
+
+
+def test_same_question_hits_and_returns_copies(embedder):
+    """An identical question hits; the returned citations are copies of the stored ones."""
+    cache = SemanticAnswerCache(threshold=0.92)
+    _store(cache, embedder, "칼국수 맛있어?", "맛있어요")
+
+    hit = _lookup(cache, embedder, "칼국수 맛있어?")
+    assert hit["response"] == "맛있어요" and hit["route"] == "rag_review"
+    hit["citations"][0]["id"] = "changed"
+    assert _lookup(cache, embedder, "칼국수 맛있어?")["citations"] == [{"id": "r1"}]
+    assert cache.stats()["hits"] == 2
+
+
+def test_version_change_invalidates(embedder):
+    """A new index version empties the cache."""
+    cache = SemanticAnswerCache(threshold=0.92)
+    _store(cache, embedder, "칼국수 맛있어?", "맛있어요", version="v1")
+
+    assert _lookup(cache, embedder, "칼국수 맛있어?", version="v2") is None
+    assert cache.stats()["invalidations"] == 1
+    assert _lookup(cache, embedder, "칼국수 맛있어?", version="v1") is None
+
+
+def test_entries_expire_after_ttl(embedder, clock):
+    """Entries are served within the TTL and dropped after it."""
+    cache = SemanticAnswerCache(threshold=0.92, ttl_seconds=60)
+    _store(cache, embedder, "칼국수 맛있어?", "맛있어요")
+
+    clock[0] += 59
+    assert _lookup(cache, embedder, "칼국수 맛있어?") is not None
+    clock[0] += 2
+    assert _lookup(cache, embedder, "칼국수 맛있어?") is None
+    assert cache.stats()["expired"] == 1 and cache.stats()["entries"] == 0
+
+
+def test_review_filters_separate_namespaces(embedder):
+    """Questions that differ only in their review filters never share answers."""
+    cache = SemanticAnswerCache(threshold=0.5)
+    _store(cache, embedder, "카카오맵 1점 리뷰 보여줘", "1점 리뷰")
+
+    assert _lookup(cache, embedder, "카카오맵 5점 리뷰 보여줘") is None
+    assert _lookup(cache, embedder, "구글맵 1점 리뷰 보여줘") is None
+    assert _lookup(cache, embedder, "카카오맵 1점 리뷰 보여줘")["response"] == "1점 리뷰"
+
+
+def test_content_terms_separate_opposite_questions(embedder, store):
+    """Opposite questions that embed closely are kept apart by their content terms."""
+    assert cache_terms_key(store, "친절하다는 리뷰 있어?") == "친절"
+    assert cache_terms_key(store, "불친절하다는 리뷰 있어?") == "불친절"
+    assert cache_terms_key(SimpleNamespace(), "친절하다는 리뷰 있어?") == ""
+
+    cache = SemanticAnswerCache(threshold=0.5)
+    _store(cache, embedder, "친절하다는 리뷰 있어?", "친절해요", store=store)
+    assert _lookup(cache, embedder, "불친절하다는 리뷰 있어?", store=store) is None
+    assert _lookup(cache, embedder, "친절하다는 리뷰 있어?", store=store)["response"] == "친절해요"
+
+
+def test_threshold_depends_on_embedding_provider(embedder, monkeypatch):
+    """The local hash embedder needs a stricter threshold; ANSWER_CACHE_THRESHOLD overrides both."""
+    monkeypatch.delenv("ANSWER_CACHE_THRESHOLD", raising=False)
+    local = SimpleNamespace(meta={"embedding_provider": "local"})
+    assert answer_cache_threshold(local) > answer_cache_threshold(SimpleNamespace(meta={}))
+
+    # 내용어 없이도(BM25 색인이 없는 인덱스) 로컬 임계값이 반대 질문을 걸러냄
+    cache = SemanticAnswerCache()
+    _store(cache, embedder, "친절하다는 리뷰 있어?", "친절해요", store=local)
+    assert _lookup(cache, embedder, "불친절하다는 리뷰 있어?", store=local) is None
+
+    monkeypatch.setenv("ANSWER_CACHE_THRESHOLD", "0.5")
+    assert answer_cache_threshold(local) == 0.5
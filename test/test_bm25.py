@@ -0,0 +1,89 @@
+import math
+
+import numpy as np
+import pytest
+from st_app.rag.bm25 import DEFAULT_B, DEFAULT_K1, BM25Index
+from st_app.rag.retriever import reciprocal_rank_fusion
+
+
+DOCS = [
+    ["칼국수", "국물", "진하다"],
+    ["만두", "만두", "마늘", "김치"],
+    ["콩국수", "국물", "시원"],
+    ["웨이팅", "줄", "칼국수"],
+    ["직원", "친절"],
+]
+
+
+@pytest.fixture
+def index():
+    return BM25Index.build(DOCS)
+
+
+def _reference_score(query_terms, doc, docs, k1=DEFAULT_K1, b=DEFAULT_B):
+    avgdl = sum(len(d) for d in docs) / len(docs)
+    score = 0.0
+    for term in query_terms:
+        tf = doc.count(term)
+        if not tf:
+            continue
+        df = sum(1 for d in docs if term in d)
+        idf = math.log1p((len(docs) - df + 0.5) / (df + 0.5))
+        score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(doc) / avgdl))
+    return score
+
+
+def test_tokenize_query_prefers_longest_vocabulary_term(index):
+    """Query terms are matched longest-first against the vocabulary without a morphological analyzer."""
+    assert index.tokenize_query("콩국수 국물 어때?") == ["콩국수", "국물"]
+    assert index.tokenize_query("칼국수랑 만두 맛있어?") == ["칼국수", "만두"]
+    assert index.tokenize_query("주차 돼?") == []
+
+
+def test_search_matches_reference_bm25(index):
+    """Scores equal the textbook BM25 formula and are returned in descending order."""
+    positions, scores = index.search("칼국수 국물", k=10)
+
+    expected = {doc: _reference_score(["칼국수", "국물"], DOCS[doc], DOCS) for doc in range(len(DOCS))}
+    assert positions.tolist() == sorted((d for d, s in expected.items() if s > 0), key=lambda d: -expected[d])
+    np.testing.assert_allclose(scores, [expected[p] for p in positions], rtol=1e-5)
+
+
+def test_search_respects_k_allowed_and_excluded(index):
+    """Only top-k, allowed and non-excluded positions are returned."""
+    positions, _ = index.search("칼국수 국물", k=1)
+    assert len(positions) == 1
+
+    positions, _ = index.search("칼국수 국물", k=10, allowed=np.array([2, 3, 4]))
+    assert set(positions.tolist()) == {2, 3}
+
+    positions, _ = index.search("칼국수 국물", k=10, excluded=np.array([0]))
+    assert 0 not in positions.tolist()
+
+
+def test_search_without_known_terms_is_empty(index):
+    """A query with no vocabulary terms returns no results."""
+    positions, scores = index.search("주차 돼?", k=5)
+    assert len(positions) == 0 and len(scores) == 0
+
+
+def test_save_and_load_round_trip(index, tmp_path):
+    """A saved index loads back with identical search results."""
+    index.save(str(tmp_path))
+    loaded = BM25Index.load(str(tmp_path))
+
+    for query in ("칼국수 국물", "만두 김치", "친절"):
+        expected, loaded_result = index.search(query, k=5), loaded.search(query, k=5)
+        assert expected[0].tolist() == loaded_result[0].tolist()
+        np.testing.assert_allclose(expected[1], loaded_result[1])
+    assert BM25Index.load(str(tmp_path / "missing")) is None
+
+
+def test_reciprocal_rank_fusion_weights_and_ties():
+    """RRF sums weight / (k + rank) and skips rankings with zero weight."""
+    fused = dict(reciprocal_rank_fusion([([1, 2], 1.0), ([2, 3], 1.0), ([9], 0.0)], rrf_k=60))
+
+    assert fused[2] == pytest.approx(1 / 62 + 1 / 61)
+    assert fused[1] == pytest.approx(1 / 61)
+    assert 9 not in fused
+    assert max(fused, key=fused.get) == 2
@@ -0,0 +1,50 @@
+import pytest
+from st_app.rag.context import estimate_tokens, pack_context, split_sentences
+
+
+PASSAGES = [
+    "칼국수 국물이 진해요. 줄이 길어요!",
+    "줄이 길어요! 만두가 맛있어요.",
+    "직원이 친절해요.",
+]
+CITATIONS = [{"id": "a"}, {"id": "b"}, {"id": "c"}]
+
+
+def test_estimate_tokens():
+    """Hangul syllables count one each, latin/digit runs one per four characters, symbols one each."""
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("칼국수") == 3
+    assert estimate_tokens("abcdefgh 12345") == 4
+    assert estimate_tokens("맛집!") == 3
+
+
+def test_split_sentences_strips_more_suffix():
+    """Reviews are split on sentence punctuation and the crawler's trailing "... 더보기" is dropped."""
+    assert split_sentences("맛있어요. 또 올게요!\n최고 ... 더보기") == ["맛있어요.", "또 올게요!", "최고"]
+
+
+def test_redundant_sentences_are_dropped_once():
+    """A sentence repeated by a lower-ranked review is kept only the first time."""
+    context, kept, stats = pack_context(PASSAGES, CITATIONS, budget=1000, overlap=0.8)
+
+    assert context == "칼국수 국물이 진해요. 줄이 길어요!\n\n만두가 맛있어요.\n\n직원이 친절해요."
+    assert [c["id"] for c in kept] == ["a", "b", "c"]
+    assert stats["dropped_redundant"] == 1 and stats["sentences"] == 4
+    assert stats["context"] == estimate_tokens(context) < stats["context_raw"]
+
+
+def test_budget_keeps_top_ranked_and_drops_empty_citations():
+    """Sentences beyond the budget are skipped and reviews left without sentences lose their citation."""
+    budget = estimate_tokens("칼국수 국물이 진해요.") + 1
+    context, kept, stats = pack_context(PASSAGES, CITATIONS, budget=budget, overlap=0.8)
+
+    assert context == "칼국수 국물이 진해요."
+    assert kept == [{"id": "a"}]
+    assert stats["dropped_budget"] > 0
+
+
+@pytest.mark.parametrize("budget", [0, -1])
+def test_no_budget_means_empty_context(budget):
+    """With no budget nothing is packed."""
+    context, kept, _ = pack_context(PASSAGES, CITATIONS, budget=budget)
+    assert context == "" and kept == []
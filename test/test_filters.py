@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from st_app.rag.filters import DEFAULT_RECENT_DAYS, FieldIndex, parse_review_filters
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("최근 카카오맵 1점 리뷰", {"sources": ["kakaomap"], "min_rating": 1.0, "max_rating": 1.0,
+                           "recent_days": DEFAULT_RECENT_DAYS}),
+    ("구글 리뷰 중에 별점 4점 이상", {"sources": ["googlemap"], "min_rating": 4.0}),
+    ("다이닝코드에서 2점 미만 후기", {"sources": ["diningcode"], "max_rating": 1.5}),
+    ("3점대 리뷰 보여줘", {"min_rating": 3.0, "max_rating": 3.9}),
+    ("4.5점대 리뷰", {"min_rating": 4.0, "max_rating": 4.9}),
+    ("2023년 5월 리뷰", {"date_from": "2023-05-01", "date_to": "2023-05-31"}),
+    ("2024년 악평", {"max_rating": 2.0, "date_from": "2024-01-01", "date_to": "2024-12-31"}),
+])
+def test_parse_review_filters(text, expected):
+    """Sources, rating ranges and dates are parsed from the question."""
+    assert parse_review_filters(text) == expected
+
+
+@pytest.mark.parametrize("text", ["카카오페이 돼?", "구글에서 검색하면 나와?", "다이닝 공간 넓어?", "15점 만점에 몇 점?",
+                                  "웨이팅 25점 정도?", ""])
+def test_parse_review_filters_ignores_unrelated_words(text):
+    """Words that only contain a source prefix or a longer number are not filters."""
+    assert parse_review_filters(text) == {}
+
+
+@pytest.fixture
+def field_index():
+    names = ["googlemap", "kakaomap", "diningcode|kakaomap"]
+    masks = np.array([1, 2, 4 | 2, 1, 2, 4 | 2], dtype=np.uint64)
+    ratings = np.array([1.0, 5.0, 3.5, 3.0, 4.0, 2.0], dtype=np.float32)
+    dates = np.array([20240101, 20240510, 0, 20231215, 20240601, 20240420], dtype=np.int32)
+    return FieldIndex(names, masks, ratings, dates, excluded=np.array([4]))
+
+
+def test_select_without_conditions_is_none(field_index):
+    """No condition means every position; exclusions are applied by the caller."""
+    assert field_index.select({}) is None
+    assert field_index.select(None) is None
+
+
+def test_select_combines_conditions_and_excludes(field_index):
+    """Positions satisfy every condition, are sorted, and never include excluded positions."""
+    assert field_index.select({"sources": ["kakaomap"]}).tolist() == [1, 2, 5]
+    assert field_index.select({"sources": ["diningcode"]}).tolist() == [2, 5]
+    assert field_index.select({"min_rating": 3.0, "max_rating": 3.9}).tolist() == [2, 3]
+    assert field_index.select({"sources": ["kakaomap"], "min_rating": 3.0}).tolist() == [1, 2]
+    assert field_index.select({"min_rating": 4.0}).tolist() == [1]
+
+
+def test_select_date_range_skips_unknown_dates(field_index):
+    """Reviews without a date (0) never match a date condition."""
+    assert field_index.select({"date_from": "2024-01-01", "date_to": "2024-05-31"}).tolist() == [0, 1, 5]
+    assert field_index.select({"date_to": "2024-12-31"}).tolist() == [0, 1, 3, 5]
+
+
+def test_select_recent_days_is_relative_to_source(field_index):
+    """Recency is measured from the latest review of the selected sources."""
+    assert field_index.select({"recent_days": 30}).tolist() == [1]
+    assert field_index.select({"sources": ["googlemap"], "recent_days": 30}).tolist() == [0, 3]
@@ -0,0 +1,103 @@
+import time
+
+import pytest
+from st_app.graph.history import HistoryManager, history_messages, message_tokens, truncate_to_tokens
+from st_app.rag.context import estimate_tokens
+
+
+def _conversation(turns):
+    messages = []
+    for t in range(turns):
+        messages += [{"role": "user", "content": f"질문 {t}"}, {"role": "assistant", "content": f"답변 {t}"}]
+    return messages + [{"role": "user", "content": "이번 질문"}]
+
+
+def _wait_for_refresh(manager, count, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        stats = manager.stats()
+        if stats["refreshes"] + stats["failures"] >= count and not stats["refreshing"]:
+            return
+        time.sleep(0.01)
+    raise AssertionError("요약 갱신이 끝나지 않았습니다")
+
+
+@pytest.fixture(autouse=True)
+def history_env(monkeypatch):
+    monkeypatch.setenv("HISTORY_KEEP_TURNS", "1")
+    monkeypatch.setenv("HISTORY_TOKEN_BUDGET", "1000")
+    monkeypatch.setenv("HISTORY_SUMMARY_TOKENS", "100")
+    monkeypatch.setenv("HISTORY_SUMMARY_STALE_TURNS", "1")
+
+
+def test_truncate_to_tokens():
+    """Text over the limit is cut with an ellipsis and stays within the limit."""
+    assert truncate_to_tokens("짧은 글", 10) == "짧은 글"
+    cut = truncate_to_tokens("가나다라마바사아자차", 5)
+    assert cut.endswith("…") and estimate_tokens(cut) <= 5
+
+
+def test_history_messages_fills_budget_from_latest(monkeypatch):
+    """Without a summary the most recent messages that fit the budget are kept in order."""
+    messages = _conversation(3)
+    monkeypatch.setenv("HISTORY_TOKEN_BUDGET", str(sum(message_tokens(m["content"]) for m in messages[-3:])))
+
+    assert history_messages({"history": messages}) == [(m["role"], m["content"]) for m in messages[-3:]]
+
+
+def test_history_messages_puts_summary_first_and_skips_folded():
+    """A summary replaces the folded messages and comes first as a system message."""
+    messages = _conversation(3)
+    result = history_messages({"history": messages, "history_summary": "요약", "history_folded": 4})
+
+    assert result[0] == ("system", "이전 대화 요약: 요약")
+    assert result[1:] == [(m["role"], m["content"]) for m in messages[4:]]
+
+
+def test_manager_summarizes_stale_turns_in_background():
+    """Stale turns are folded by the summarizer and later turns reuse the summary."""
+    calls = []
+
+    def summarizer(previous, messages):
+        calls.append((previous, [m["content"] for m in messages]))
+        return f"요약 {len(calls)}"
+
+    manager = HistoryManager(summarizer=summarizer)
+    state = {"history": _conversation(3)}
+    manager.prepare(state, conversation_id="c1")
+    assert state["history_summary"] == "" and state["history_folded"] == 0
+
+    _wait_for_refresh(manager, 1)
+    assert calls == [("", ["질문 0", "답변 0", "질문 1", "답변 1"])]
+
+    manager.prepare(state, conversation_id="c1")
+    assert state["history_summary"] == "요약 1" and state["history_folded"] == 4
+    assert history_messages(state)[0] == ("system", "이전 대화 요약: 요약 1")
+
+
+def test_manager_discards_summary_when_history_changes():
+    """Editing the summarized part of the conversation drops the old summary."""
+    manager = HistoryManager(summarizer=lambda previous, messages: "요약")
+    messages = _conversation(3)
+    manager.prepare({"history": messages}, conversation_id="c1")
+    _wait_for_refresh(manager, 1)
+
+    edited = [dict(m) for m in messages]
+    edited[0]["content"] = "다른 질문"
+    state = {"history": edited}
+    manager.prepare(state, conversation_id="c1")
+    assert state["history_summary"] == "" and manager.stats()["discarded"] == 1
+
+
+def test_manager_keeps_previous_summary_on_failure():
+    """A failing summarizer is counted and leaves the history unsummarized."""
+    def summarizer(previous, messages):
+        raise RuntimeError("LLM 오류")
+
+    manager = HistoryManager(summarizer=summarizer)
+    state = {"history": _conversation(3)}
+    manager.prepare(state, conversation_id="c1")
+    _wait_for_refresh(manager, 1)
+
+    manager.prepare(state, conversation_id="c1")
+    assert manager.stats()["failures"] >= 1 and state["history_summary"] == ""
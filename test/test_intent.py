@@ -0,0 +1,51 @@
+import pytest
+from st_app.graph.intent import DEFAULT_INTENT_THRESHOLD, IntentClassifier
+
+
+@pytest.fixture
+def classifier():
+    return IntentClassifier()
+
+
+@pytest.mark.parametrize("text", ["안녕?", "안녕하세요!", "하이~", "hi", "hello there", "반가워요", "반갑습니다",
+                                  "고마워요!"])
+def test_greetings_take_fast_chat_path(classifier, text):
+    """Greetings are routed to chat with enough confidence to skip the LLM router."""
+    route, confidence, fast, _ = classifier.decide(text, DEFAULT_INTENT_THRESHOLD)
+
+    assert route == "chat"
+    assert confidence >= DEFAULT_INTENT_THRESHOLD
+    assert fast
+
+
+@pytest.mark.parametrize("text", ["하이디라오랑 비교하면?", "하이볼 팔아?", "헬로키티 컵 있어?", "hikorea 할인 돼?"])
+def test_words_starting_with_greeting_are_not_fast_chat(classifier, text):
+    """Words that merely start with a greeting must not be treated as greetings."""
+    route, confidence, _ = classifier.classify(text)
+
+    assert not (route == "chat" and confidence >= DEFAULT_INTENT_THRESHOLD)
+
+
+@pytest.mark.parametrize("text", ["몇 시간 기다려야 해?", "몇시간 걸려?", "오픈런 해야 돼?", "카카오페이 돼?",
+                                  "구글에서 검색하면 나와?", "다이닝 공간 넓어?"])
+def test_ambiguous_questions_go_to_llm_router(classifier, text):
+    """Substrings of unrelated words ("몇 시간", "오픈런", "카카오페이") never decide a route without the LLM."""
+    _, _, fast, _ = classifier.decide(text, DEFAULT_INTENT_THRESHOLD)
+
+    assert not fast
+
+
+def test_single_signal_is_not_enough(classifier):
+    """One matching rule, however heavy, falls back to the LLM; two agreeing signals take the fast path."""
+    route, confidence, fast, _ = classifier.decide("몇 시에 문 열어?", DEFAULT_INTENT_THRESHOLD)
+    assert route == "subject_info" and confidence >= DEFAULT_INTENT_THRESHOLD and not fast
+
+    route, _, fast, _ = classifier.decide("영업시간이랑 주차 되는지 알려줘", DEFAULT_INTENT_THRESHOLD)
+    assert route == "subject_info" and fast
+    route, _, fast, _ = classifier.decide("카카오맵 1점 리뷰 보여줘", DEFAULT_INTENT_THRESHOLD)
+    assert route == "rag_review" and fast
+
+
+def test_threshold_off_always_uses_llm(classifier):
+    """Without a threshold the rules never decide."""
+    assert not classifier.decide("안녕?", None)[2]
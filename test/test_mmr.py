@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from st_app.rag.mmr import _rescale, mmr_select
+
+
+QUERY = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+# 0과 1은 거의 같은 문서, 2는 조금 덜 관련 있지만 다른 방향
+CANDIDATES = np.array([
+    [0.9, 0.1, 0.0],
+    [0.9, 0.11, 0.0],
+    [0.7, 0.0, 0.7],
+    [0.0, 1.0, 0.0],
+], dtype=np.float32)
+
+
+def _reference_mmr(query, candidates, k, lambda_mult):
+    unit = candidates / np.linalg.norm(candidates, axis=1, keepdims=True)
+    relevance = unit @ (query / np.linalg.norm(query))
+    selected = []
+    while len(selected) < min(k, len(candidates)):
+        best, best_score = None, -np.inf
+        for i in range(len(candidates)):
+            if i in selected:
+                continue
+            redundancy = max((float(unit[i] @ unit[s]) for s in selected), default=0.0)
+            score = lambda_mult * relevance[i] - (1 - lambda_mult) * redundancy
+            if score > best_score:
+                best, best_score = i, score
+        selected.append(best)
+    return selected
+
+
+def test_lambda_one_is_plain_relevance_order():
+    """With lambda=1 the order equals descending cosine similarity to the query."""
+    assert mmr_select(QUERY, CANDIDATES, k=4, lambda_mult=1.0) == [0, 1, 2, 3]
+
+
+def test_diversity_skips_near_duplicates():
+    """A near-duplicate of the first pick is passed over for a different document."""
+    selected = mmr_select(QUERY, CANDIDATES, k=2, lambda_mult=0.5)
+    assert selected == [0, 2]
+
+
+@pytest.mark.parametrize("lambda_mult", [0.0, 0.3, 0.7, 1.0])
+def test_matches_reference_implementation(lambda_mult):
+    """The incremental implementation agrees with the textbook MMR loop."""
+    rng = np.random.default_rng(0)
+    query = rng.normal(size=16).astype(np.float32)
+    candidates = rng.normal(size=(30, 16)).astype(np.float32)
+
+    assert mmr_select(query, candidates, k=10, lambda_mult=lambda_mult) == \
+        _reference_mmr(query, candidates, 10, lambda_mult)
+
+
+def test_relevance_overrides_cosine_order():
+    """Given relevance scores, their order decides the first pick and lambda=1 keeps their order."""
+    relevance = [0.1, 0.2, 0.3, 0.4]
+    assert mmr_select(QUERY, CANDIDATES, k=4, lambda_mult=1.0, relevance=relevance) == [3, 2, 1, 0]
+
+
+def test_rescale_keeps_order_and_handles_constant_scores():
+    """Scores are mapped onto [lo, hi]; identical scores all become hi."""
+    np.testing.assert_allclose(_rescale(np.array([1.0, 3.0, 2.0]), 0.2, 0.6), [0.2, 0.6, 0.4], rtol=1e-6)
+    np.testing.assert_allclose(_rescale(np.array([5.0, 5.0]), 0.2, 0.6), [0.6, 0.6])
+
+
+def test_edge_cases():
+    """Empty candidates or k<=0 select nothing and k larger than the pool returns every candidate once."""
+    assert mmr_select(QUERY, np.zeros((0, 3), dtype=np.float32), k=3) == []
+    assert mmr_select(QUERY, CANDIDATES, k=0) == []
+    assert sorted(mmr_select(QUERY, CANDIDATES, k=10)) == [0, 1, 2, 3]